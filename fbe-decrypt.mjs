@@ -13,7 +13,9 @@
 // OTHER TORTIOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
 // PERFORMANCE OF THIS SOFTWARE.
 
-import { open as fopen } from 'node:fs/promises';
+import { open as fopen, readFile, writeFile } from 'node:fs/promises';
+import { writeSync } from 'node:fs';
+import { serialize, deserialize } from 'node:v8';
 import { dirname, join as pathjoin } from 'node:path';
 import { createDecipheriv, createHmac, createHash } from 'node:crypto';
 
@@ -831,6 +833,7 @@ class FileSystemExt4 {
 	#last_extent_max;
 	#root;
 	#keys;
+	#first_ino;
 
 	static async open(file) {
 		const self = new FileSystemExt4();
@@ -858,6 +861,8 @@ class FileSystemExt4 {
 		if (inode_size < 128) {
 			throw new Error('inode size too small: ' + inode_size);
 		}
+		// Inodes below this are reserved (journal, resize inode...) and are always kept intact
+		self.#first_ino = (rev_level > 0)?superblock.readUInt32LE(0x54):11;
 		const feature_incompat = (rev_level > 0)?superblock.readUInt32LE(0x60):0;
 		if (feature_incompat & ~0x3E7DE) {
 			// Supported features:
@@ -902,7 +907,7 @@ class FileSystemExt4 {
 		if (!await self.#loadInode(2)) {
 			throw new Error('Root inode could not be loaded');
 		}
-		self.#root = await self.#createDirent('/');
+		self.#root = await self.#createDirent('/', 2);
 		return self;
 	}
 
@@ -919,7 +924,58 @@ class FileSystemExt4 {
 		this.#keys.set(hmac2.digest('hex').substr(0, 32), key);
 	}
 
-	async *decrypt(target) {
+	async selectPaths(patterns) {
+		// Resolve path patterns (relative to the partition root, '*' matches within a name)
+		// Directories leading to a match only get their entry names decrypted, so the
+		// matches can be found by path. Everything below a match is fully decrypted
+		const path_inodes = new Set();
+		const subtree_inodes = new Set();
+		const children = async (dirent) => {
+			const ret = [];
+			for await (const subdirent of dirent.open()) {
+				if (subdirent.name !== '.' && subdirent.name !== '..') {
+					ret.push(subdirent);
+				}
+			}
+			return ret;
+		};
+		const collect = async (dirent) => {
+			subtree_inodes.add(dirent.inode);
+			if (!dirent.isDirectory()) {
+				return;
+			}
+			for (const subdirent of await children(dirent)) {
+				if (!subtree_inodes.has(subdirent.inode)) {
+					await collect(subdirent);
+				}
+			}
+		};
+		const visit = async (dirent, fragments) => {
+			if (fragments.length === 0) {
+				await collect(dirent);
+				return;
+			}
+			if (!dirent.isDirectory()) {
+				return;
+			}
+			path_inodes.add(dirent.inode);
+			for (const subdirent of await children(dirent)) {
+				if (fragments[0].test(subdirent.name)) {
+					await visit(subdirent, fragments.slice(1));
+				}
+			}
+		};
+		for (const pattern of patterns) {
+			const fragments = pattern.split('/').filter((frag) => frag !== '' && frag !== '.').map((frag) => new RegExp('^' + frag.split('*').map((part) => part.replace(/[.+?^${}()|[\]\\]/g, '\\$&')).join('.*') + '$'));
+			await visit(this.#root, fragments);
+		}
+		return {
+			path_inodes: path_inodes,
+			subtree_inodes: subtree_inodes
+		};
+	}
+
+	async *decrypt(target, selection) {
 		const temp_buffer = Buffer.alloc(1024);
 		const buffer_c = Buffer.from('c');
 		for (const inode of range(1, this.#inodes_count + 1)) {
@@ -930,6 +986,21 @@ class FileSystemExt4 {
 			const loaded_inode = this.#loaded_inode;
 			const filetype = this.#inode.readUInt16LE(0) & 0xF000;
 			const flags = this.#inode.readUInt32LE(0x20);
+			if (selection && !selection.subtree_inodes.has(inode) && !(filetype === 0x4000 && selection.path_inodes.has(inode))) {
+				// Outside the selected paths: leave the inode encrypted, and don't write
+				// the contents of regular files at all
+				if (filetype === 0x8000 && inode >= this.#first_ino && !(flags & 0x10000000)) {
+					const filesize = this.#getFileSize();
+					const extents = !!(flags & 0x80000);
+					for (const block of range(0n, (filesize + this.#blocksize - 1n) / this.#blocksize)) {
+						const mapped = await this.#getFileBlock(block, extents);
+						if (mapped !== false) {
+							target.skipBlock(mapped);
+						}
+					}
+				}
+				continue;
+			}
 			if (!(flags & 0x800)) {
 				continue;
 			}
@@ -1683,7 +1754,7 @@ class FileSystemExt4 {
 		return 0;
 	}
 
-	async #createDirent(name) {
+	async #createDirent(name, index) {
 		const loaded_inode = this.#loaded_inode;
 		const mode = this.#inode.readUInt16LE(0);
 		const flags = this.#inode.readUInt32LE(0x20);
@@ -1738,6 +1809,7 @@ class FileSystemExt4 {
 				return (mode & 0xF000) === 0xA000;
 			},
 			name: name,
+			inode: index,
 			open: () => {
 				if ((mode & 0xF000) === 0x4000) {
 					const temp_buffer = Buffer.alloc(8);
@@ -1766,7 +1838,7 @@ class FileSystemExt4 {
 								await this.#readFile(name_buffer, 0, name_len, position + 8n);
 								position += BigInt(next);
 								if (await this.#loadInode(entry_inode)) {
-									return await this.#createDirent(derived_key && name_buffer.length > 15?decryptCts(name_buffer, derived_key.subarray(0, 32)).toString().replace(/\x00+$/, ''):name_buffer.toString());
+									return await this.#createDirent(derived_key && name_buffer.length > 15?decryptCts(name_buffer, derived_key.subarray(0, 32)).toString().replace(/\x00+$/, ''):name_buffer.toString(), entry_inode);
 								}
 							}
 						}
@@ -2060,12 +2132,18 @@ class ChangeLogger {
 	#blocks;
 	#blocksize;
 	#segment_count;
+	#skipped;
+	#skipped_count;
+	#skipped_sorted;
 
 	constructor(blocksize) {
 		this.#block_options = new Map();
 		this.#blocks = new Map();
 		this.#blocksize = blocksize;
 		this.#segment_count = 0;
+		this.#skipped = [];
+		this.#skipped_count = 0n;
+		this.#skipped_sorted = true;
 	}
 
 	write(buffer, offset, length, position) {
@@ -2118,6 +2196,113 @@ class ChangeLogger {
 		return this.#block_options.get(block) || [];
 	}
 
+	skipBlock(block) {
+		// Files are mostly contiguous, so extend the last range where possible
+		this.#skipped_count++;
+		const last = this.#skipped[this.#skipped.length - 1];
+		if (last && last[1] === block) {
+			last[1]++;
+			return;
+		}
+		this.#skipped.push([block, block + 1n]);
+		this.#skipped_sorted = false;
+	}
+
+	isSkipped(block) {
+		this.#sortSkipped();
+		const i = binarySearchArray(this.#skipped, ([start, end]) => (end > block));
+		return i < this.#skipped.length && this.#skipped[i][0] <= block && !this.#block_options.has(block);
+	}
+
+	get skippedCount() {
+		return this.#skipped_count;
+	}
+
+	exportPlan() {
+		// Everything the write phase needs, so block range workers don't have to walk the file system again
+		// File blocks are stored as extents of consecutive blocks with the same key and consecutive file blocks
+		const keys = [];
+		const key_indexes = new Map();
+		const extents = [];
+		let last = null;
+		const block_options = [...this.#block_options].sort(([a], [b]) => (a < b)?-1:(a > b)?1:0);
+		for (const [block, [key, fileblock]] of block_options) {
+			let key_index = key_indexes.get(key);
+			if (key_index === undefined) {
+				key_index = keys.length;
+				key_indexes.set(key, key_index);
+				keys.push(key);
+			}
+			if (last && last[2] === key_index && last[0] + last[1] === block && last[3] + last[1] === fileblock) {
+				last[1]++;
+				continue;
+			}
+			last = [block, 1n, key_index, fileblock];
+			extents.push(last);
+		}
+		this.#sortSkipped();
+		return {
+			blocksize: this.#blocksize,
+			keys: keys,
+			extents: extents,
+			segments: [...this.#blocks],
+			skipped: this.#skipped,
+			skipped_count: this.#skipped_count
+		};
+	}
+
+	static fromPlan(plan, ranges) {
+		// Only keep the changes inside ranges (all of them if ranges is null)
+		const sorted_ranges = ranges && [...ranges].sort(([a], [b]) => (a < b)?-1:(a > b)?1:0);
+		const inRanges = (start, end) => {
+			if (!sorted_ranges) {
+				return true;
+			}
+			const i = binarySearchArray(sorted_ranges, ([range_start, range_end]) => (range_end > start));
+			return i < sorted_ranges.length && sorted_ranges[i][0] < end;
+		};
+		const self = new ChangeLogger(plan.blocksize);
+		for (const [start, count, key_index, file_start] of plan.extents) {
+			if (!inRanges(start, start + count)) {
+				continue;
+			}
+			const key = plan.keys[key_index];
+			for (const i of range(0n, count)) {
+				if (inRanges(start + i, start + i + 1n)) {
+					self.#block_options.set(start + i, [key, file_start + i]);
+				}
+			}
+		}
+		for (const [block, segments] of plan.segments) {
+			if (inRanges(block, block + 1n)) {
+				self.#blocks.set(block, segments);
+				self.#segment_count += segments.length;
+			}
+		}
+		self.#skipped = plan.skipped;
+		self.#skipped_count = plan.skipped_count;
+		return self;
+	}
+
+	#sortSkipped() {
+		if (this.#skipped_sorted) {
+			return;
+		}
+		this.#skipped.sort(([a], [b]) => (a < b)?-1:(a > b)?1:0);
+		const merged = [];
+		for (const [start, end] of this.#skipped) {
+			const last = merged[merged.length - 1];
+			if (last && start <= last[1]) {
+				last[1] = (end > last[1])?end:last[1];
+			}
+			else {
+				merged.push([start, end]);
+			}
+		}
+		this.#skipped = merged;
+		this.#skipped_sorted = true;
+	}
+
 	get blockCount() {
 		return this.#block_options.size;
 	}
@@ -2420,163 +2605,290 @@ function decryptCts(cipher, key) {
 	return Buffer.concat([plaintext_prefix, decipher.update(cts_cipher)]).subarray(0, cipher.length);
 }
 
-// Qemu emulator stores images as Qcow2
-// It's possible to supply raw images instead using BlockDevFile.open(await fopen('image'))
-for await (const dev of using(await BlockDevQcow2.open('encryptionkey.img.qcow2'))) {
-	const gpt = await GPT.open(await BlockDevFile.open(new FileHandleBlockDev(dev), 512));
-	if (gpt.partitions.length < 1 || gpt.partitions[0].name !== 'metadata') {
-		throw new Error('metadata partition not found');
-	}
-	const ext4 = await FileSystemExt4.open(new FileHandleBlockDev(gpt.partitions[0].data));
-	const key_root = await navigatePath(ext4.root, 'vold', 'metadata_encryption', 'key');
-	if (key_root === null || !key_root.isDirectory()) {
-		throw new Error('vold/metadata_encryption/key not found');
-	}
-	const keymaster_key_blob = await navigatePath(key_root, 'keymaster_key_blob');
-	if (keymaster_key_blob === null || keymaster_key_blob.isDirectory()) {
-		throw new Error('keymaster_key_blob file not found');
+function parseOptions(args) {
+	// Options passed by the orchestrator (wa3.py)
+	// --progress-fd N: Report machine readable progress lines to file descriptor N
+	// --output PATH: Decrypted image path
+	// --block-range START:END: Only write blocks START through END - 1 (may be repeated)
+	//   The output file must already exist with its final size, as it is neither created nor truncated
+	//   This allows several processes to each write their own ranges of the same output file
+	// --include PATH: Only decrypt and write files below PATH (may be repeated)
+	//   PATH is relative to the userdata partition root, e.g. 'data/com.kakao.talk/databases'
+	//   and '*' matches any part of a single name. Other file contents are left out (zero-filled)
+	// --save-plan PATH: Derive the keys and walk the file system, then save what the write phase needs
+	//   to PATH instead of writing the output. The plan contains decryption keys
+	// --load-plan PATH: Skip key derivation and the file system walk, and write using a saved plan
+	//   Together with --block-range, this lets several processes share a single walk
+	const options = {
+		progressFd: null,
+		output: 'userdata-decrypted.img',
+		ranges: null,
+		includes: null,
+		savePlan: null,
+		loadPlan: null
+	};
+	for (let i = 0; i < args.length; i++) {
+		switch (args[i]) {
+			case '--progress-fd':
+				options.progressFd = Number(args[++i]);
+				break;
+			case '--output':
+				options.output = args[++i];
+				break;
+			case '--block-range': {
+				const [start, end] = args[++i].split(':').map(BigInt);
+				if (!(start < end)) {
+					throw new Error('Invalid block range: ' + args[i]);
+				}
+				(options.ranges = options.ranges || []).push([start, end]);
+				break;
+			}
+			case '--include':
+				(options.includes = options.includes || []).push(args[++i]);
+				break;
+			case '--save-plan':
+				options.savePlan = args[++i];
+				break;
+			case '--load-plan':
+				options.loadPlan = args[++i];
+				break;
+			default:
+				throw new Error('Unknown option: ' + args[i]);
+		}
 	}
-	const encrypted_key = await navigatePath(key_root, 'encrypted_key');
-	if (encrypted_key === null || encrypted_key.isDirectory()) {
-		throw new Error('encrypted_key file not found');
+	return options;
+}
+
+const options = parseOptions(process.argv.slice(2));
+
+function reportProgress(...fields) {
+	if (options.progressFd !== null) {
+		writeSync(options.progressFd, fields.join(' ') + '\n');
 	}
-	const decrypted_key = await decryptKey(encrypted_key.open(), keymaster_key_blob.open(), await prefixHashFile('Android secdiscardable SHA512', key_root, 'secdiscardable'));
-	for await (const encrypted_dev of using(await BlockDevQcow2.open('userdata-qemu.img.qcow2'))) {
-		// Perform metadata decryption
-		// For Android version 10, everything up to this point can be skipped,
-		// using the image directly instead
-		const decrypting_dev = new BlockDevDecrypt(await BlockDevFile.open(new FileHandleBlockDev(encrypted_dev), 4096), decrypted_key);
-		// FIXME: Also support the F2FS file system
-		const ext4_data = await FileSystemExt4.open(new FileHandleBlockDev(decrypting_dev));
-		ext4_data.addKey(await decryptKey((await navigatePath(ext4_data.root, 'unencrypted', 'key', 'encrypted_key')).open(), (await navigatePath(ext4_data.root, 'unencrypted', 'key', 'keymaster_key_blob')).open(), await prefixHashFile('Android secdiscardable SHA512', ext4_data.root, 'unencrypted', 'key', 'secdiscardable')));
-		ext4_data.addKey(await decryptKey((await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'de', '0', 'encrypted_key')).open(), (await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'de', '0', 'keymaster_key_blob')).open(), await prefixHashFile('Android secdiscardable SHA512', ext4_data.root, 'misc', 'vold', 'user_keys', 'de', '0', 'secdiscardable')));
-		let sp_handle = '';
-		const locksettings_db = await SQLiteDatabase.open((await navigatePath(ext4_data.root, 'system', 'locksettings.db')).open());
-		for await (const row of locksettings_db.getTableRows('locksettings')) {
-			const [_id, name, filter, value] = await iteratorToArrayAsync(row(), 4);
-			let name_string;
-			for await (const file of using(await name.open())) {
-				name_string = name.encoding_decoder(await readAsBuffer(file));
-			}
-			if (name_string !== 'sp-handle') {
-				continue;
+}
+
+// console.log is surprisingly time-consuming. This should throttle it
+let last_done = new Date();
+let should_do = null;
+function rateLimit(func) {
+	const now = new Date();
+	if (now - last_done < 100) {
+		should_do = func;
+		return;
+	}
+	last_done = now;
+	should_do = null;
+	func();
+}
+function rateLimitFlush() {
+	should_do && should_do();
+	should_do = null;
+}
+
+async function writeImage(decrypting_dev, change_logger) {
+	// Without block ranges, this process writes the entire image
+	const ranges = options.ranges || [[0n, decrypting_dev.blockCount]];
+	const total_blocks = ranges.reduce((total, [start, end]) => total + (end < decrypting_dev.blockCount?end:decrypting_dev.blockCount) - start, 0n);
+	for await (const outfile of using(await fopen(options.output, options.ranges?'r+':'w'))) {
+		const blankbuffer = Buffer.alloc(decrypting_dev.blockSize);
+		if (!options.ranges) {
+			await outfile.truncate(Number(decrypting_dev.blockCount * BigInt(decrypting_dev.blockSize)));
+		}
+		console.log();
+		let written = 0n;
+		for (const [start, end] of ranges) {
+			for (const i of range(start, end < decrypting_dev.blockCount?end:decrypting_dev.blockCount)) {
+				if (!change_logger.isSkipped(i)) {	// Contents of files outside --include are left out
+					const block = await decrypting_dev.readBlock(i, ...change_logger.getBlockOptions(i));
+					change_logger.apply(block, 0, block.length, BigInt(block.length) * i);
+					if (!block.equals(blankbuffer)) {	// Skip the write if 0-filled
+						await outfile.write(block, 0, block.length, Number(BigInt(block.length) * i));
+					}
+				}
+				written++;
+				rateLimit(() => {
+					console.log('\x1b[A\x1b[2KWritten', written, 'of', total_blocks, 'blocks');
+				});
+				if (!options.ranges && (i & 1023n) === 1023n) {
+					// Every block up to i is written, so the reader may hash up to here
+					reportProgress('written', i + 1n, decrypting_dev.blockCount, decrypting_dev.blockSize);
+				}
 			}
-			let value_string;
-			for await (const file of using(await value.open())) {
-				value_string = value.encoding_decoder(await readAsBuffer(file));
+			if (options.ranges) {
+				// Only report a range once it is durable, so it never has to be redone
+				await outfile.datasync();
+				reportProgress('range-done', start, end, decrypting_dev.blockSize);
 			}
-			sp_handle = (BigInt(value_string) & 0xFFFFFFFFFFFFFFFFn).toString(16);
-			break;
 		}
-		if (sp_handle === '') {
-			// Legacy system. No synthetic password means the CE key has a regular keymaster key
-			ext4_data.addKey(await decryptKey((await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'ce', '0', 'current', 'encrypted_key')).open(), (await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'ce', '0', 'current', 'keymaster_key_blob')).open(), await prefixHashFile('Android secdiscardable SHA512', ext4_data.root, 'misc', 'vold', 'user_keys', 'ce', '0', 'current', 'secdiscardable')));
+	}
+	rateLimitFlush();
+	reportProgress('done', decrypting_dev.blockCount, decrypting_dev.blockSize);
+}
+
+async function writePlan(path, decrypting_dev, default_key, change_logger) {
+	// The plan holds decryption keys, so only the owner may read it
+	await writeFile(path, serialize({
+		version: 1,
+		default_key: default_key,
+		block_count: decrypting_dev.blockCount,
+		...change_logger.exportPlan()
+	}), { mode: 0o600 });
+}
+
+if (options.loadPlan) {
+	// Block range worker: the planning process already derived the keys and walked the file system
+	const plan = deserialize(await readFile(options.loadPlan));
+	if (plan.version !== 1) {
+		throw new Error('Unsupported plan version: ' + plan.version);
+	}
+	for await (const encrypted_dev of using(await BlockDevQcow2.open('userdata-qemu.img.qcow2'))) {
+		const decrypting_dev = new BlockDevDecrypt(await BlockDevFile.open(new FileHandleBlockDev(encrypted_dev), 4096), plan.default_key);
+		if (decrypting_dev.blockCount !== plan.block_count || decrypting_dev.blockSize !== plan.blocksize) {
+			throw new Error('Plan does not match userdata-qemu.img.qcow2');
 		}
-		else {
-			const spblob = await readAsBuffer((await navigatePath(ext4_data.root, 'system_de', '0', 'spblob', sp_handle.padStart(16, '0') + '.spblob')).open());
-			if (spblob.length < 58 || spblob.readUInt16BE() !== 0x0300) {
-				// Must be version 3 LSKF
-				throw new Error('Incompatible spblob file');
-			}
-			// Storage of the device-bound key in persistent.sqlite was added in Android 12
-			// Prior to it, the key was stored in '/misc/keystore/user_0/1000_USRSKEY_synthetic_password_' + sp_handle.padStart(16, '0') instead
-			const persistent_sqlite = await SQLiteDatabase.open((await navigatePath(ext4_data.root, 'misc', 'keystore', 'persistent.sqlite')).open());
-			let synthetic_password_key_id = 0;
-			for await (const row of persistent_sqlite.getTableRows('keyentry')) {
-				const [id, key_type, domain, namespace, alias] = await iteratorToArrayAsync(row(), 5);
-				let alias_string;
-				for await (const file of using(await alias.open())) {
-					alias_string = alias.encoding_decoder(await readAsBuffer(file));
+		await writeImage(decrypting_dev, ChangeLogger.fromPlan(plan, options.ranges));
+	}
+}
+else {
+	// Qemu emulator stores images as Qcow2
+	// It's possible to supply raw images instead using BlockDevFile.open(await fopen('image'))
+	for await (const dev of using(await BlockDevQcow2.open('encryptionkey.img.qcow2'))) {
+		const gpt = await GPT.open(await BlockDevFile.open(new FileHandleBlockDev(dev), 512));
+		if (gpt.partitions.length < 1 || gpt.partitions[0].name !== 'metadata') {
+			throw new Error('metadata partition not found');
+		}
+		const ext4 = await FileSystemExt4.open(new FileHandleBlockDev(gpt.partitions[0].data));
+		const key_root = await navigatePath(ext4.root, 'vold', 'metadata_encryption', 'key');
+		if (key_root === null || !key_root.isDirectory()) {
+			throw new Error('vold/metadata_encryption/key not found');
+		}
+		const keymaster_key_blob = await navigatePath(key_root, 'keymaster_key_blob');
+		if (keymaster_key_blob === null || keymaster_key_blob.isDirectory()) {
+			throw new Error('keymaster_key_blob file not found');
+		}
+		const encrypted_key = await navigatePath(key_root, 'encrypted_key');
+		if (encrypted_key === null || encrypted_key.isDirectory()) {
+			throw new Error('encrypted_key file not found');
+		}
+		const decrypted_key = await decryptKey(encrypted_key.open(), keymaster_key_blob.open(), await prefixHashFile('Android secdiscardable SHA512', key_root, 'secdiscardable'));
+		for await (const encrypted_dev of using(await BlockDevQcow2.open('userdata-qemu.img.qcow2'))) {
+			// Perform metadata decryption
+			// For Android version 10, everything up to this point can be skipped,
+			// using the image directly instead
+			const decrypting_dev = new BlockDevDecrypt(await BlockDevFile.open(new FileHandleBlockDev(encrypted_dev), 4096), decrypted_key);
+			// FIXME: Also support the F2FS file system
+			const ext4_data = await FileSystemExt4.open(new FileHandleBlockDev(decrypting_dev));
+			ext4_data.addKey(await decryptKey((await navigatePath(ext4_data.root, 'unencrypted', 'key', 'encrypted_key')).open(), (await navigatePath(ext4_data.root, 'unencrypted', 'key', 'keymaster_key_blob')).open(), await prefixHashFile('Android secdiscardable SHA512', ext4_data.root, 'unencrypted', 'key', 'secdiscardable')));
+			ext4_data.addKey(await decryptKey((await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'de', '0', 'encrypted_key')).open(), (await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'de', '0', 'keymaster_key_blob')).open(), await prefixHashFile('Android secdiscardable SHA512', ext4_data.root, 'misc', 'vold', 'user_keys', 'de', '0', 'secdiscardable')));
+			let sp_handle = '';
+			const locksettings_db = await SQLiteDatabase.open((await navigatePath(ext4_data.root, 'system', 'locksettings.db')).open());
+			for await (const row of locksettings_db.getTableRows('locksettings')) {
+				const [_id, name, filter, value] = await iteratorToArrayAsync(row(), 4);
+				let name_string;
+				for await (const file of using(await name.open())) {
+					name_string = name.encoding_decoder(await readAsBuffer(file));
 				}
-				if (alias_string !== 'synthetic_password_' + sp_handle) {
+				if (name_string !== 'sp-handle') {
 					continue;
 				}
-				synthetic_password_key_id = id.value;
+				let value_string;
+				for await (const file of using(await value.open())) {
+					value_string = value.encoding_decoder(await readAsBuffer(file));
+				}
+				sp_handle = (BigInt(value_string) & 0xFFFFFFFFFFFFFFFFn).toString(16);
 				break;
 			}
-			// In version 1, the order of decryption is opposite:
-			// Using the inner key first, and the key from the database second
-			// In versions 2 and 3, the inner key comes second
-			let spblob_decrypt_1 = null;
-			for await (const row of persistent_sqlite.getTableRows('blobentry')) {
-				const [id, subcomponent_type, keyentryid, blob] = await iteratorToArrayAsync(row(), 4);
-				if (keyentryid.value !== synthetic_password_key_id) {
-					continue;
+			if (sp_handle === '') {
+				// Legacy system. No synthetic password means the CE key has a regular keymaster key
+				ext4_data.addKey(await decryptKey((await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'ce', '0', 'current', 'encrypted_key')).open(), (await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'ce', '0', 'current', 'keymaster_key_blob')).open(), await prefixHashFile('Android secdiscardable SHA512', ext4_data.root, 'misc', 'vold', 'user_keys', 'ce', '0', 'current', 'secdiscardable')));
+			}
+			else {
+				const spblob = await readAsBuffer((await navigatePath(ext4_data.root, 'system_de', '0', 'spblob', sp_handle.padStart(16, '0') + '.spblob')).open());
+				if (spblob.length < 58 || spblob.readUInt16BE() !== 0x0300) {
+					// Must be version 3 LSKF
+					throw new Error('Incompatible spblob file');
 				}
-				for await (const file of using(await blob.open())) {
-					spblob_decrypt_1 = await decryptKey(new FileHandleBuffer(spblob.subarray(2)), file, true);
+				// Storage of the device-bound key in persistent.sqlite was added in Android 12
+				// Prior to it, the key was stored in '/misc/keystore/user_0/1000_USRSKEY_synthetic_password_' + sp_handle.padStart(16, '0') instead
+				const persistent_sqlite = await SQLiteDatabase.open((await navigatePath(ext4_data.root, 'misc', 'keystore', 'persistent.sqlite')).open());
+				let synthetic_password_key_id = 0;
+				for await (const row of persistent_sqlite.getTableRows('keyentry')) {
+					const [id, key_type, domain, namespace, alias] = await iteratorToArrayAsync(row(), 5);
+					let alias_string;
+					for await (const file of using(await alias.open())) {
+						alias_string = alias.encoding_decoder(await readAsBuffer(file));
+					}
+					if (alias_string !== 'synthetic_password_' + sp_handle) {
+						continue;
+					}
+					synthetic_password_key_id = id.value;
+					break;
 				}
-				break;
-			}
-			if (spblob_decrypt_1 === null) {
-				throw new Error('Could not find handle to decrypt synthetic password blob');
-			}
-			// If a PIN is set, then 'default-password' would be replaced with an scrypt hash of the PIN
-			// The salt and parameters for scrypt would need to be read from '/system_de/0/spblob/' + sp_handle.padStart(16, '0') + '.pwd'
-			const inner_key = prefixHash('application-id', Buffer.concat([Buffer.from('default-password'.padEnd(32, '\0')), await prefixHashFile('secdiscardable-transform', ext4_data.root, 'system_de', '0', 'spblob', sp_handle.padStart(16, '0') + '.secdis')])).subarray(0, 32);
-			const spblob_decrypt_2 = await decryptKey(new FileHandleBuffer(spblob_decrypt_1), new FileHandleBuffer(Buffer.concat([Buffer.from('0020000000', 'hex'), inner_key])));
-			// Version 3 key derivation uses NIST SP800-108 in counter mode
-			// The following is a single iteration for the label 'fbe-key'
-			// Versions 1 and 2 simply use prefixHash('fbe-key', spblob_decrypt_2)
-			const fbe_hmac = createHmac('sha256', spblob_decrypt_2);
-			fbe_hmac.update(Buffer.from(
-				'00000001' + // Counter
-				'6662652d6b6579' + // 'fbe-key'
-				'00' +
-				'616e64726f69642d73796e7468657469632d70617373776f72642d706572736f6e616c697a6174696f6e2d636f6e74657874' + // 'android-synthetic-password-personalization-context'
-				'00000190' + // Context length (in bits)
-				'00000100', // Output length (in bits)
-				'hex'));
-			const fbe_key = fbe_hmac.digest();
-			// If /misc/vold/user_keys/ce/0/current/secdiscardable is present, it would need to be mixed with fbe_key as
-			// fbe_key = prefixHashFile('Android secdiscardable SHA512', secdiscardable) + fbe_hmac.digest()
-			// However, it is usually absent if no PIN is set
-			ext4_data.addKey(await decryptKey((await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'ce', '0', 'current', 'encrypted_key')).open(), new FileHandleBuffer(Buffer.concat([Buffer.from('0020000000', 'hex'), prefixHash('Android key wrapping key generation SHA512', fbe_key).subarray(0, 32)]))));
-		}
-
-		// console.log is surprisingly time-consuming. This should throttle it
-		let last_done = new Date();
-		let should_do = null;
-		function rateLimit(func) {
-			const now = new Date();
-			if (now - last_done < 100) {
-				should_do = func;
-				return;
+				// In version 1, the order of decryption is opposite:
+				// Using the inner key first, and the key from the database second
+				// In versions 2 and 3, the inner key comes second
+				let spblob_decrypt_1 = null;
+				for await (const row of persistent_sqlite.getTableRows('blobentry')) {
+					const [id, subcomponent_type, keyentryid, blob] = await iteratorToArrayAsync(row(), 4);
+					if (keyentryid.value !== synthetic_password_key_id) {
+						continue;
+					}
+					for await (const file of using(await blob.open())) {
+						spblob_decrypt_1 = await decryptKey(new FileHandleBuffer(spblob.subarray(2)), file, true);
+					}
+					break;
+				}
+				if (spblob_decrypt_1 === null) {
+					throw new Error('Could not find handle to decrypt synthetic password blob');
+				}
+				// If a PIN is set, then 'default-password' would be replaced with an scrypt hash of the PIN
+				// The salt and parameters for scrypt would need to be read from '/system_de/0/spblob/' + sp_handle.padStart(16, '0') + '.pwd'
+				const inner_key = prefixHash('application-id', Buffer.concat([Buffer.from('default-password'.padEnd(32, '\0')), await prefixHashFile('secdiscardable-transform', ext4_data.root, 'system_de', '0', 'spblob', sp_handle.padStart(16, '0') + '.secdis')])).subarray(0, 32);
+				const spblob_decrypt_2 = await decryptKey(new FileHandleBuffer(spblob_decrypt_1), new FileHandleBuffer(Buffer.concat([Buffer.from('0020000000', 'hex'), inner_key])));
+				// Version 3 key derivation uses NIST SP800-108 in counter mode
+				// The following is a single iteration for the label 'fbe-key'
+				// Versions 1 and 2 simply use prefixHash('fbe-key', spblob_decrypt_2)
+				const fbe_hmac = createHmac('sha256', spblob_decrypt_2);
+				fbe_hmac.update(Buffer.from(
+					'00000001' + // Counter
+					'6662652d6b6579' + // 'fbe-key'
+					'00' +
+					'616e64726f69642d73796e7468657469632d70617373776f72642d706572736f6e616c697a6174696f6e2d636f6e74657874' + // 'android-synthetic-password-personalization-context'
+					'00000190' + // Context length (in bits)
+					'00000100', // Output length (in bits)
+					'hex'));
+				const fbe_key = fbe_hmac.digest();
+				// If /misc/vold/user_keys/ce/0/current/secdiscardable is present, it would need to be mixed with fbe_key as
+				// fbe_key = prefixHashFile('Android secdiscardable SHA512', secdiscardable) + fbe_hmac.digest()
+				// However, it is usually absent if no PIN is set
+				ext4_data.addKey(await decryptKey((await navigatePath(ext4_data.root, 'misc', 'vold', 'user_keys', 'ce', '0', 'current', 'encrypted_key')).open(), new FileHandleBuffer(Buffer.concat([Buffer.from('0020000000', 'hex'), prefixHash('Android key wrapping key generation SHA512', fbe_key).subarray(0, 32)]))));
+			}
+
+			const change_logger = new ChangeLogger(decrypting_dev.blockSize);
+			let selection = null;
+			if (options.includes) {
+				selection = await ext4_data.selectPaths(options.includes);
+				console.log('Selected', selection.subtree_inodes.size, 'inodes below', options.includes.length, 'paths');
 			}
-			last_done = now;
-			should_do = null;
-			func();
-		}
-		function rateLimitFlush() {
-			should_do && should_do();
-			should_do = null;
-		}
-
-		const change_logger = new ChangeLogger(decrypting_dev.blockSize);
-		console.log();
-		console.log();
-		for await (const [inode, total] of ext4_data.decrypt(change_logger)) {
-			rateLimit(() => {
-				console.log('\x1b[A\x1b[A\x1b[2KDecrypting', inode, 'of', total, 'inodes');
-				console.log('\x1b[2KChanged', change_logger.blockCount, 'blocks and', change_logger.bufferCount, 'buffers');
-			});
-		}
-		rateLimitFlush();
-		for await (const outfile of using(await fopen('userdata-decrypted.img', 'w'))) {
-			const blankbuffer = Buffer.alloc(decrypting_dev.blockSize);
-			await outfile.truncate(Number(decrypting_dev.blockCount * BigInt(decrypting_dev.blockSize)));
 			console.log();
-			for (const i of range(0n, decrypting_dev.blockCount)) {
-				const block = await decrypting_dev.readBlock(i, ...change_logger.getBlockOptions(i));
-				change_logger.apply(block, 0, block.length, BigInt(block.length) * i);
-				if (!block.equals(blankbuffer)) {	// Skip the write if 0-filled
-					await outfile.write(block, 0, block.length, Number(BigInt(block.length) * i));
-				}
+			console.log();
+			for await (const [inode, total] of ext4_data.decrypt(change_logger, selection)) {
 				rateLimit(() => {
-					console.log('\x1b[A\x1b[2KWritten', i + 1n, 'of', decrypting_dev.blockCount, 'blocks');
+					console.log('\x1b[A\x1b[A\x1b[2KDecrypting', inode, 'of', total, 'inodes');
+					console.log('\x1b[2KChanged', change_logger.blockCount, 'blocks and', change_logger.bufferCount, 'buffers');
 				});
 			}
+			rateLimitFlush();
+			if (selection) {
+				reportProgress('selected', selection.subtree_inodes.size, change_logger.skippedCount, decrypting_dev.blockCount);
+			}
+			if (options.savePlan) {
+				await writePlan(options.savePlan, decrypting_dev, decrypted_key, change_logger);
+				reportProgress('planned', change_logger.blockCount, change_logger.bufferCount);
+			}
+			else {
+				await writeImage(decrypting_dev, change_logger);
+			}
 		}
-		rateLimitFlush();
 	}
 }
@@ -0,0 +1,138 @@
+"""PII 탐지 벤치마크 - 합성 메신저 테이블에서 기존 셀별 헬퍼와 PII_DETECTOR.scan_rows의 초당 셀 처리량 비교
+
+사용법: python tests/bench_pii_detector.py [--rows 20000] [--repeat 5]
+"""
+import argparse
+import contextlib
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wa3
+
+TEXT_SAMPLES = [
+    "안녕하세요 오늘 회의는 3시에 시작합니다",
+    "ㅋㅋㅋ 진짜? 내일 봐요",
+    "See you at the station, running late",
+    "Привет, как дела? Встретимся завтра",
+    "明天下午三点见面吧",
+    "今日はありがとうございました",
+    "사진 보냈어요 https://open.kakao.com/o/가나다라 확인해 주세요",
+    "link: http://x.com/?to=kim@naver.com&lang=ko",
+    "연락처 010-1234-5678 / park.minsu@gmail.com",
+    "call me +821098765432 after 6pm",
+    "여기서 만나요 37.56650,126.97800",
+    "invoice sent to billing@example.co.kr",
+    "ok",
+    "",
+]
+
+
+def build_messenger_rows(count, seed=0):
+    """WhatsApp msgstore 형태의 합성 행 (_id, key_remote_jid, data, timestamp, media_url, media_caption, thumb)"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, count + 1):
+        rows.append((
+            i,
+            f"8210{rng.randrange(10 ** 8):08d}@s.whatsapp.net",
+            rng.choice(TEXT_SAMPLES),
+            1700000000000 + i * 1000,
+            f"https://mmg.whatsapp.net/d/f/{rng.randrange(10 ** 12)}.enc" if i % 7 == 0 else None,
+            rng.choice(TEXT_SAMPLES) if i % 11 == 0 else None,
+            b"\xff\xd8\xff" * 8 if i % 13 == 0 else None,
+        ))
+    return rows
+
+
+# 단일 패스 탐지기 도입 전의 셀별 헬퍼 (호출마다 정규식을 만들고, 한글이 있으면 DEBUG 줄 출력)
+def old_has_korean_text(text):
+    if not text:
+        return False
+    text_str = str(text)
+    korean_pattern = re.compile(r'[가-힣]')
+    has_korean = bool(korean_pattern.search(text_str))
+    if has_korean:
+        korean_chars = korean_pattern.findall(text_str)
+        sample_text = ''.join(korean_chars[:10])
+        print(f"DEBUG: 한글 텍스트 발견: '{sample_text}'... (전체 길이: {len(text_str)})")
+    return has_korean
+
+
+def old_has_email_pattern(text):
+    if not text:
+        return False
+    email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+    return bool(email_pattern.search(str(text)))
+
+
+def old_count_korean_chars(text):
+    if not text:
+        return 0
+    korean_pattern = re.compile(r'[가-힣]')
+    return len(korean_pattern.findall(str(text)))
+
+
+def old_extract_emails(text):
+    if not text:
+        return []
+    email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+    return email_pattern.findall(str(text))
+
+
+def old_analyze(rows):
+    """기존 analyze_table_content의 셀 루프 → (한글 글자 수, 이메일 수)"""
+    korean_count = 0
+    email_count = 0
+    for row in rows:
+        for cell in row:
+            cell_str = str(cell) if cell is not None else ""
+            if old_has_korean_text(cell_str):
+                korean_count += old_count_korean_chars(cell_str)
+            if old_has_email_pattern(cell_str):
+                email_count += len(old_extract_emails(cell_str))
+    return korean_count, email_count
+
+
+def new_analyze(rows):
+    counts, _ = wa3.PII_DETECTOR.scan_rows(rows)
+    return counts['hangul'], counts['email']
+
+
+def best_time(function, rows, repeat):
+    """repeat회 중 가장 빠른 실행 시간과 결과 (DEBUG 출력은 /dev/null로)"""
+    best = None
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function(rows)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PII 탐지 처리량 벤치마크 (기존 헬퍼 대비)")
+    parser.add_argument('--rows', type=int, default=20000, help="합성 테이블 행 수")
+    parser.add_argument('--repeat', type=int, default=5, help="반복 횟수 (가장 빠른 값 사용)")
+    args = parser.parse_args()
+
+    rows = build_messenger_rows(args.rows)
+    cells = sum(len(row) for row in rows)
+    print(f"합성 메신저 테이블: {len(rows):,}행, {cells:,}셀")
+
+    old_time, old_result = best_time(old_analyze, rows, args.repeat)
+    new_time, new_result = best_time(new_analyze, rows, args.repeat)
+    print(f"기존 셀별 헬퍼:          {cells / old_time:>12,.0f} cells/s ({old_time:.3f}초)")
+    print(f"PII_DETECTOR.scan_rows:  {cells / new_time:>12,.0f} cells/s ({new_time:.3f}초) - 탐지기 {len(wa3.PII_DETECTOR.kinds)}종")
+    print(f"속도 향상: {old_time / new_time:.2f}배")
+    print(f"한글 글자 수 / 이메일 수: 기존 {old_result}, 신규 {new_result} - {'일치' if old_result == new_result else '불일치'}")
+    return 0 if old_result == new_result else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wa3
+
+# 단일 패스 탐지기 도입 전의 헬퍼 정규식
+OLD_KOREAN = re.compile(r'[가-힣]')
+OLD_EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+MIXED_CELLS = [
+    "http://x.com/?to=kim@naver.com",
+    "카톡 https://open.kakao.com/o/가나다라",
+    "https://m.site.kr/가입?email=lee.s@daum.net&name=홍길동",
+    "연락처 010-1234-5678 / park@gmail.com 으로 주세요",
+    "안녕하세요 반갑습니다",
+    "mailto:a.b@x.co|kr 그리고 c@d.org",
+    "www.example.com/경로/ 지도 37.56650,126.97800",
+    "no pii here",
+    "Привет 你好 한글 mixed@mail.ru",
+    "",
+]
+
+
+def make_logger():
+    return wa3.IntegratedDecryptionAndForensicsLogger(privileged_helper=False, artifact_store=None)
+
+
+def test_helpers_keep_old_semantics_on_mixed_cells():
+    logger = make_logger()
+    for cell in MIXED_CELLS:
+        assert logger.has_korean_text(cell) == bool(OLD_KOREAN.search(cell)), cell
+        assert logger.count_korean_chars(cell) == len(OLD_KOREAN.findall(cell)), cell
+        assert logger.has_email_pattern(cell) == bool(OLD_EMAIL.search(cell)), cell
+        assert logger.extract_emails(cell) == OLD_EMAIL.findall(cell), cell
+
+
+def test_scan_counts_match_old_helpers_on_mixed_cells():
+    for cell in MIXED_CELLS:
+        counts, found = wa3.PII_DETECTOR.scan(cell)
+        assert counts['hangul'] == len(OLD_KOREAN.findall(cell)), cell
+        assert counts['email'] == len(OLD_EMAIL.findall(cell)), cell
+        assert ('hangul' in found) == bool(OLD_KOREAN.search(cell)), cell
+
+
+def test_url_does_not_hide_nested_detections():
+    counts, found = wa3.PII_DETECTOR.scan("http://x.com/?to=kim@naver.com")
+    assert counts['url'] == 1 and counts['email'] == 1
+    assert wa3.PII_DETECTOR.findall("http://x.com/?to=kim@naver.com", 'email') == ["kim@naver.com"]
+    assert wa3.PII_DETECTOR.scan("카톡 https://open.kakao.com/o/가나다라")[0]['hangul'] == 6
+
+
+def test_url_inside_url_is_counted_once():
+    text = "http://www.x.com/a/www.y 그리고 https://t.co/x?tel=010-1234-5678"
+    counts, _ = wa3.PII_DETECTOR.scan(text)
+    assert counts['url'] == 2 and counts['phone'] == 1
+    assert wa3.PII_DETECTOR.findall(text, 'url') == ["http://www.x.com/a/www.y", "https://t.co/x?tel=010-1234-5678"]
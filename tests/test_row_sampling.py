@@ -0,0 +1,40 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wa3
+
+# 앱 DB에서 흔히 보이는 공백/하이픈/예약어/따옴표가 들어간 테이블 이름
+ODD_TABLE_NAMES = ["chat messages", "msg-store", "order", 'say "hi"']
+
+
+def build_connection(table, rows=500):
+    conn = sqlite3.connect(":memory:")
+    source = wa3.quote_identifier(table)
+    conn.execute(f"CREATE TABLE {source} (_id INTEGER PRIMARY KEY, body TEXT)")
+    conn.executemany(f"INSERT INTO {source} VALUES (?, ?)", ((i, f"메시지 {i}") for i in range(1, rows + 1)))
+    return conn
+
+
+@pytest.mark.parametrize("table", ODD_TABLE_NAMES)
+@pytest.mark.parametrize("strategy", ["head", "tail", "random", "reservoir"])
+def test_sampling_quotes_table_names(table, strategy):
+    conn = build_connection(table)
+    rows, used = wa3.sample_table_rows(conn.cursor(), table, 10, strategy, seed="seed")
+    assert used == strategy
+    assert len(rows) == 10
+    assert wa3.rowid_range(conn.cursor(), table) == (1, 500)
+
+
+@pytest.mark.parametrize("table", ODD_TABLE_NAMES)
+@pytest.mark.parametrize("exact", [False, True])
+def test_row_counts_quote_table_names(table, exact):
+    conn = build_connection(table)
+    logger = wa3.IntegratedDecryptionAndForensicsLogger(privileged_helper=False, artifact_store=None,
+                                                        exact_row_counts=exact)
+    rows, method = logger.count_table_rows(conn.cursor(), table, 2, False, {}, None)
+    assert (rows, method) == (500, 'exact' if exact else 'rowid')
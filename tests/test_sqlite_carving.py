@@ -0,0 +1,58 @@
+import os
+import re
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wa3
+
+
+def build_database(path):
+    """삭제된 행이 프리리스트/프리블록에 남도록 secure_delete를 끄고 만든 메신저 형태 DB"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA secure_delete=OFF")
+    conn.execute("CREATE TABLE messages (_id INTEGER PRIMARY KEY, key_remote_jid TEXT, data TEXT, "
+                 "timestamp INTEGER, thumb BLOB)")
+    conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                     ((i, f"8210{i % 97:04d}@s.whatsapp.net", f"메시지 {i} 안녕하세요 " + "가" * (i % 60),
+                       1700000000000 + i, bytes([i % 256]) * 4 if i % 5 == 0 else None)
+                      for i in range(1, 12001)))
+    conn.commit()
+    conn.execute("DELETE FROM messages WHERE _id BETWEEN 3001 AND 6000")
+    conn.executemany("DELETE FROM messages WHERE _id = ?", [(i,) for i in range(8000, 12001, 40)])
+    conn.commit()
+    conn.close()
+
+
+def carve(path, source):
+    logger = wa3.IntegratedDecryptionAndForensicsLogger(privileged_helper=False, artifact_store=None)
+    logger.log_file = os.path.join(os.path.dirname(path), "carve.log")
+    conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT name, rootpage, sql FROM sqlite_master WHERE type='table';")
+        table_schemas = {name: (root_page, bool(re.search(r'\bWITHOUT\s+ROWID\b', sql or '', re.IGNORECASE)))
+                         for name, root_page, sql in cur.fetchall()}
+        with wa3.SQLitePageFile(source) as pages:
+            return logger.recover_deleted_rows(cur, pages, table_schemas)
+    finally:
+        conn.close()
+
+
+def test_carving_from_file_and_bytearray_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(wa3, "RECOVERY_MAX_ROWS", 10 ** 6)
+    path = str(tmp_path / "msgstore.db")
+    build_database(path)
+    with open(path, 'rb') as f:
+        image_copy = bytearray(f.read())
+
+    from_file = carve(path, path)
+    from_memory = carve(path, image_copy)
+
+    rows, stats = from_file["messages"]
+    assert stats["recovered"] > 2900
+    assert from_memory["messages"][1] == stats
+    assert [record["values"] for record in from_memory["messages"][0]] == [record["values"] for record in rows]
+    blobs = [value for record in from_memory["messages"][0] for value in record["values"] if not isinstance(value, (str, int, float, type(None)))]
+    assert blobs and all(type(value) is bytes for value in blobs)
@@ -7,6 +7,9 @@ FBE 복호화 후 자동으로 데이터베이스 아티팩트를 분석하고 
 
 import subprocess
 import sys
+import argparse
+import base64
+import itertools
 import os
 import hashlib
 import time
@@ -20,6 +23,21 @@ import tempfile
 import statistics
 import re
 import logging
+import threading
+import queue
+import random
+import math
+import collections
+import errno
+import bisect
+import functools
+import io
+import mmap
+import struct
+import zlib
+import html
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -30,24 +48,2781 @@ try:
 except ImportError:
     PSUTIL_AVAILABLE = False
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
     format='[%(levelname)s] %(message)s',
     handlers=[logging.StreamHandler()]
 )
-logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__)
+
+# 해시 엔진 설정
+HASH_ALGORITHMS = ('sha256', 'sha1', 'md5')
+HASH_BUFFER_SIZE = 8 * 1024 * 1024  # 8MB 재사용 버퍼
+
+
+def sparse_extents(fd, start, end):
+    """[start, end) 구간을 SEEK_DATA/SEEK_HOLE로 (시작, 끝, 데이터 여부) 구간들로 나눔"""
+    pos = start
+    while pos < end:
+        try:
+            data = min(os.lseek(fd, pos, os.SEEK_DATA), end)
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                raise
+            data = end  # 이후는 모두 hole
+        if data > pos:
+            yield pos, data, False
+            pos = data
+            if pos >= end:
+                break
+        hole = min(os.lseek(fd, pos, os.SEEK_HOLE), end)
+        yield pos, hole, True
+        pos = hole
+
+
+def copy_file_sparse(src_path, dst_path):
+    """희소성을 유지하며 파일 복사 - 데이터 구간만 복사하고 hole은 그대로 둠"""
+    with open(src_path, 'rb', buffering=0) as src, open(dst_path, 'wb', buffering=0) as dst:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        size = os.fstat(src_fd).st_size
+        extents = sparse_extents(src_fd, 0, size) if hasattr(os, 'SEEK_DATA') else [(0, size, True)]
+        buffer = bytearray(HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        for start, end, is_data in extents:
+            if not is_data:
+                continue
+            pos = start
+            if hasattr(os, 'copy_file_range'):
+                # 커널 내 복사 (지원하지 않는 파일시스템이면 아래 읽기/쓰기로 처리)
+                try:
+                    while pos < end:
+                        n = os.copy_file_range(src_fd, dst_fd, end - pos, pos, pos)
+                        if not n:
+                            break
+                        pos += n
+                except OSError:
+                    pass
+            src.seek(pos)
+            dst.seek(pos)
+            while pos < end:
+                n = src.readinto(view[:min(len(buffer), end - pos)])
+                if not n:
+                    break
+                dst.write(view[:n])
+                pos += n
+        # 마지막 구간이 hole이면 크기를 맞춰야 함
+        os.ftruncate(dst_fd, size)
+    shutil.copystat(src_path, dst_path)
+
+
+class MultiDigestHasher:
+    """SHA-256/SHA-1/MD5를 한 번의 읽기로 동시에 계산하는 해시 엔진"""
+
+    def __init__(self, algorithms=HASH_ALGORITHMS, buffer_size=HASH_BUFFER_SIZE):
+        self.algorithms = tuple(algorithms)
+        self.buffer_size = buffer_size
+        self.bytes_hashed = 0
+        self._hashers = [hashlib.new(name) for name in self.algorithms]
+        # hashlib은 큰 버퍼 처리 시 GIL을 해제하므로 알고리즘별로 스레드에서 병렬 처리
+        self._pool = ThreadPoolExecutor(max_workers=len(self._hashers)) if len(self._hashers) > 1 else None
+        # 읽기와 해시 계산을 겹치기 위한 이중 버퍼
+        self._buffers = [bytearray(buffer_size), bytearray(buffer_size)]
+        self._views = [memoryview(b) for b in self._buffers]
+        self._zeros = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _submit(self, data, extra_hashers=()):
+        """데이터를 모든 해시에 비동기로 전달 (완료 대기용 future 목록 반환)"""
+        self.bytes_hashed += len(data)
+        hashers = self._hashers + list(extra_hashers)
+        if self._pool is None:
+            for h in hashers:
+                h.update(data)
+            return []
+        return [self._pool.submit(h.update, data) for h in hashers]
+
+    @staticmethod
+    def _wait(futures):
+        for future in futures:
+            future.result()
+
+    def update(self, data):
+        """메모리 데이터를 해시에 추가"""
+        self._wait(self._submit(data))
+
+    def update_from_file(self, f, length=None, progress_callback=None, extra_hashers=()):
+        """파일 객체에서 readinto로 읽어 해시에 추가 (length가 None이면 EOF까지)
+        
+        SEEK_DATA/SEEK_HOLE을 지원하는 파일은 데이터 구간만 읽고 빈 구간(hole)은
+        미리 만든 0 버퍼로 해시하므로 결과는 동일하고 디스크 읽기만 줄어듦.
+        extra_hashers의 hashlib 객체에도 같은 데이터를 전달 (예: 세그먼트 해시)
+        """
+        start = f.tell()
+        if hasattr(f, 'sparse_extents'):
+            # 가상 디스크 이미지처럼 할당 구간을 스스로 아는 파일 객체 (예: Qcow2Image)
+            end = f.size
+            extents = f.sparse_extents
+        else:
+            fd = self._sparse_fd(f)
+            if fd is None:
+                return self._update_dense(f, length, progress_callback, extra_hashers)
+            end = os.fstat(fd).st_size
+            extents = functools.partial(sparse_extents, fd)
+        if length is not None:
+            end = min(end, start + length)
+        try:
+            for extent_start, extent_end, is_data in extents(start, end):
+                if is_data:
+                    f.seek(extent_start)
+                    self._update_dense(f, extent_end - extent_start, progress_callback, extra_hashers)
+                else:
+                    self._update_zeros(extent_end - extent_start, progress_callback, extra_hashers)
+        finally:
+            f.seek(max(end, start))
+        return self.bytes_hashed
+
+    @staticmethod
+    def _sparse_fd(f):
+        """희소 파일 탐색이 가능한 경우 파일 디스크립터 반환"""
+        if not hasattr(os, 'SEEK_DATA'):
+            return None
+        try:
+            return f.fileno()
+        except (AttributeError, OSError):
+            return None
+
+    def _update_dense(self, f, length, progress_callback, extra_hashers):
+        """readinto로 순차 읽기 - 다음 버퍼 읽기와 이전 버퍼 해시를 겹쳐서 처리"""
+        remaining = length
+        pending = []
+        index = 0
+        while remaining is None or remaining > 0:
+            view = self._views[index]
+            if remaining is not None and remaining < self.buffer_size:
+                view = view[:remaining]
+            n = f.readinto(view)
+            # 이전 버퍼의 해시 계산이 끝나야 다음 읽기에서 해당 버퍼를 재사용할 수 있음
+            self._wait(pending)
+            if not n:
+                pending = []
+                break
+            pending = self._submit(view[:n], extra_hashers)
+            if remaining is not None:
+                remaining -= n
+            index ^= 1
+            if progress_callback:
+                progress_callback(self.bytes_hashed)
+        self._wait(pending)
+        return self.bytes_hashed
+
+    def _update_zeros(self, length, progress_callback, extra_hashers):
+        """빈 구간(hole)을 읽지 않고 0 버퍼로 해시"""
+        if self._zeros is None:
+            self._zeros = memoryview(bytes(self.buffer_size))
+        while length > 0:
+            n = min(length, self.buffer_size)
+            self._wait(self._submit(self._zeros[:n], extra_hashers))
+            length -= n
+            if progress_callback:
+                progress_callback(self.bytes_hashed)
+
+    def hexdigests(self):
+        """알고리즘별 16진수 해시값 딕셔너리"""
+        return {name: h.hexdigest() for name, h in zip(self.algorithms, self._hashers)}
+
+    @classmethod
+    def hash_file(cls, file_path, algorithms=HASH_ALGORITHMS, buffer_size=HASH_BUFFER_SIZE, progress_callback=None):
+        """파일 전체를 한 번만 읽어 여러 해시를 계산"""
+        with cls(algorithms, buffer_size) as hasher:
+            with open(file_path, 'rb', buffering=0) as f:
+                hasher.update_from_file(f, progress_callback=progress_callback)
+            return hasher.hexdigests()
+
+
+# 분할(Merkle) 해시 설정
+HASH_SEGMENT_SIZE = 64 * 1024 * 1024  # 64MB 세그먼트
+
+
+def _hash_segment(task):
+    """프로세스 풀 작업자: 파일의 한 세그먼트를 읽어 SHA-256 계산 (hole은 읽지 않음)"""
+    file_path, offset, length = task
+    with MultiDigestHasher(('sha256',), min(HASH_BUFFER_SIZE, max(length, 1))) as hasher:
+        with open(file_path, 'rb', buffering=0) as f:
+            f.seek(offset)
+            hasher.update_from_file(f, length=length)
+        return hasher.hexdigests()['sha256']
+
+
+def merkle_root(segment_digests):
+    """세그먼트 해시 목록의 Merkle 루트 - 노드는 sha256(0x01 || 왼쪽 || 오른쪽), 홀수 노드는 그대로 승격"""
+    level = [bytes.fromhex(d) for d in segment_digests]
+    if not level:
+        return hashlib.sha256(b'').hexdigest()
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level) - 1, 2):
+            next_level.append(hashlib.sha256(b'\x01' + level[i] + level[i + 1]).digest())
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return level[0].hex()
+
+
+def hash_file_segmented(file_path, segment_size=HASH_SEGMENT_SIZE, workers=None, progress_callback=None):
+    """파일을 고정 크기 세그먼트로 나누어 프로세스 풀에서 병렬 해시 계산"""
+    file_size = os.path.getsize(file_path)
+    tasks = [(file_path, offset, min(segment_size, file_size - offset))
+             for offset in range(0, file_size, segment_size)]
+    segments = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for digest in pool.map(_hash_segment, tasks):
+            segments.append(digest)
+            if progress_callback:
+                progress_callback(len(segments), len(tasks))
+    return segmented_hash_record(segments, segment_size, file_size)
+
+
+def segmented_hash_record(segments, segment_size, file_size):
+    """메타데이터 JSON에 기록할 분할 해시 정보"""
+    return {
+        'algorithm': 'sha256',
+        'segment_size': segment_size,
+        'segment_count': len(segments),
+        'file_size': file_size,
+        'tree': 'sha256(0x01 || left || right), odd node promoted',
+        'root': merkle_root(segments),
+        'segments': segments
+    }
+
+
+class DecryptionTailHasher(threading.Thread):
+    """복호화 진행에 맞춰 출력 파일을 이미 완성된 위치까지 따라가며 해시 계산
+    
+    실행기가 advance()로 '이 위치 이전은 더 이상 바뀌지 않음'을 알려주면 그 위치까지 해시하고,
+    finish()로 최종 크기를 받으면 나머지를 해시한 뒤 종료
+    """
+
+    def __init__(self, output_path, segment_size=None):
+        super().__init__(daemon=True)
+        self.output_path = output_path
+        self.segment_size = segment_size
+        self.hashed_bytes = 0
+        self.completed = False
+        self.error = None
+        self.hashes = None
+        self.segments = [] if segment_size else None
+        self._segment_hasher = None
+        self._hasher = MultiDigestHasher()
+        self._file = None
+        self._condition = threading.Condition()
+        self._target = 0
+        self._final = False
+        self._aborted = False
+
+    def advance(self, target):
+        """target 바이트 이전은 완성됨"""
+        with self._condition:
+            if target > self._target:
+                self._target = target
+                self._condition.notify()
+
+    def finish(self, total):
+        """출력 파일 전체(total 바이트)가 완성됨"""
+        with self._condition:
+            self._target = total
+            self._final = True
+            self._condition.notify()
+
+    def abort(self):
+        """복호화 실패 - 해시 계산 중단 (finish() 이후에는 무시)"""
+        with self._condition:
+            if not self._final:
+                self._aborted = True
+                self._condition.notify()
+
+    def run(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self._aborted and self._target <= self.hashed_bytes and not self._final:
+                        self._condition.wait()
+                    if self._aborted:
+                        return
+                    target, final = self._target, self._final
+                self._advance(target)
+                if final and self.hashed_bytes >= target:
+                    self.hashes = self._hasher.hexdigests()
+                    if self.segments is not None and self._segment_hasher:
+                        self.segments.append(self._segment_hasher.hexdigest())
+                    self.completed = True
+                    return
+        except Exception as e:
+            self.error = e
+        finally:
+            self._hasher.close()
+            if self._file:
+                self._file.close()
+
+    def _advance(self, target):
+        """출력 파일을 target 바이트 위치까지 해시"""
+        if target <= self.hashed_bytes:
+            return
+        if self._file is None:
+            self._file = open(self.output_path, 'rb', buffering=0)
+        self._file.seek(self.hashed_bytes)
+        while self.hashed_bytes < target:
+            length = target - self.hashed_bytes
+            extra = ()
+            if self.segments is not None:
+                # 세그먼트 경계에서 잘라서 세그먼트별 SHA-256도 함께 계산
+                if self._segment_hasher is None:
+                    self._segment_hasher = hashlib.sha256()
+                length = min(length, self.segment_size - self.hashed_bytes % self.segment_size)
+                extra = (self._segment_hasher,)
+            read = self._hasher.update_from_file(self._file, length=length, extra_hashers=extra) - self.hashed_bytes
+            if read < length:
+                raise IOError(f"출력 파일이 예상보다 짧습니다: {self.hashed_bytes + read} < {target}")
+            self.hashed_bytes += read
+            if self.segments is not None and self.hashed_bytes % self.segment_size == 0:
+                self.segments.append(self._segment_hasher.hexdigest())
+                self._segment_hasher = None
+
+
+# 복호화 스크립트 출력 처리
+ANSI_ESCAPE_PATTERN = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+DECRYPTION_STALL_TIMEOUT = 300  # 진행이 없을 때 중단까지 대기 시간 (초)
+PROGRESS_LOG_INTERVAL = 10  # 진행 이벤트 기록 간격 (초)
+
+
+class DecryptionProgressTracker:
+    """fbe-decrypt.mjs 출력 줄을 구조화된 진행 이벤트로 변환 (처리율, 남은 시간 계산)"""
+
+    # console.log는 BigInt를 '123n' 형태로 출력함
+    PATTERNS = (
+        ('inodes', re.compile(r'Decrypting (\d+)n? of (\d+)n? inodes')),
+        ('blocks', re.compile(r'Written (\d+)n? of (\d+)n? blocks')),
+    )
+    CHANGED_PATTERN = re.compile(r'Changed (\d+)n? blocks and (\d+)n? buffers')
+    RATE_WINDOW = 30  # 처리율 계산 구간 (초)
+
+    def __init__(self):
+        self.phase = None
+        self.last_event = None
+        self.phases = {}
+        self.changed = None
+        self._samples = collections.deque()
+
+    def feed(self, line, now=None):
+        """출력 한 줄 처리 - 진행 줄이면 이벤트 딕셔너리, 아니면 None 반환
+        
+        'Changed N blocks and M buffers' 줄은 변경 통계만 갱신 (unit='changes')
+        """
+        parsed = self.parse(line)
+        if parsed:
+            return self.update(*parsed, now)
+        match = self.CHANGED_PATTERN.search(line)
+        if match:
+            self.changed = {'blocks': int(match.group(1)), 'buffers': int(match.group(2))}
+            return {'unit': 'changes', **self.changed}
+        return None
+
+    def parse(self, line):
+        """진행 줄이면 (unit, done, total) 반환"""
+        for unit, pattern in self.PATTERNS:
+            match = pattern.search(line)
+            if match:
+                return unit, int(match.group(1)), int(match.group(2))
+        return None
+
+    def update(self, unit, done, total, now=None):
+        """진행 값 직접 반영 (여러 작업자의 진행을 합산한 경우)"""
+        return self._event(unit, done, total, now or time.time())
+
+    def _event(self, unit, done, total, now):
+        if unit != self.phase:
+            self.phase = unit
+            self._samples.clear()
+            self.phases[unit] = {'start': now, 'start_done': done}
+        self._samples.append((now, done))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.RATE_WINDOW:
+            self._samples.popleft()
+        first_time, first_done = self._samples[0]
+        rate = (done - first_done) / (now - first_time) if now > first_time else 0.0
+        remaining = max(total - done, 0)
+        phase = self.phases[unit]
+        phase.update({'end': now, 'done': done, 'total': total})
+        self.last_event = {
+            'unit': unit,
+            'done': done,
+            'total': total,
+            'percent': done / total * 100 if total else 100.0,
+            'rate_per_second': rate,
+            'eta_seconds': remaining / rate if rate > 0 else None,
+            'elapsed_seconds': now - phase['start']
+        }
+        return self.last_event
+
+    def summary(self):
+        """단계별 처리량 요약 (메타데이터용)"""
+        result = {}
+        for unit, phase in self.phases.items():
+            elapsed = phase.get('end', phase['start']) - phase['start']
+            processed = phase.get('done', 0) - phase['start_done']
+            result[unit] = {
+                'done': phase.get('done'),
+                'total': phase.get('total'),
+                'elapsed_seconds': elapsed,
+                'average_rate_per_second': processed / elapsed if elapsed > 0 else None
+            }
+        if self.changed:
+            result['changed'] = self.changed
+        return result
+
+
+def _pump_lines(stream, name, line_queue):
+    """스트림을 줄 단위로 읽어 큐에 전달 (종료 시 None)"""
+    try:
+        for line in stream:
+            line_queue.put((name, line))
+    finally:
+        stream.close()
+        line_queue.put((name, None))
+
+
+class LRUCache:
+    """스레드 안전 LRU 캐시 (용량 초과 시 가장 오래 사용하지 않은 항목 제거)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._items.get(key, default)
+            if key in self._items:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+EXT4_MAGIC = 0xEF53
+EXT4_ROOT_INODE = 2
+EXT4_INCOMPAT_FILETYPE = 0x2
+EXT4_INCOMPAT_META_BG = 0x10
+EXT4_INCOMPAT_64BIT = 0x80
+EXT4_EXTENTS_FL = 0x80000
+EXT4_INLINE_DATA_FL = 0x10000000
+EXT4_EXTENT_MAGIC = 0xF30A
+EXT4_FILE_TYPES = {1: 'file', 2: 'dir', 7: 'symlink'}
+EXT4_INODE_CACHE_SIZE = 8192
+EXT4_EXTENT_CACHE_SIZE = 2048
+USERDATA_MOUNT_POINT = '/data'  # 기기에서 userdata 파티션이 마운트되는 위치
+INMEMORY_DB_MAX_SIZE = 64 * 1024 * 1024  # 이보다 작은 DB는 메모리로 직접 읽어 sqlite3 deserialize
+TMPFS_DIR = '/dev/shm'  # 큰 DB를 풀어 둘 메모리 파일시스템 (없거나 공간 부족이면 임시 디렉토리)
+SQLITE_HEADER_MAGIC = b'SQLite format 3\x00'
+SQLITE_SIBLING_SUFFIXES = ('-wal', '-journal', '-shm')
+DB_DISCOVERY_WORKERS = 8  # DB 검색 스레드 수 (대부분 I/O 대기)
+DB_ANALYSIS_WORKERS = 1  # DB 분석 프로세스 수 (1이면 순차 분석)
+# 분석용 SQLite 연결 튜닝 프로필 (PRAGMA 이름 → 값), 모든 프로필은 query_only로 쓰기 금지
+SQLITE_TUNING_PROFILES = {
+    'default': {'query_only': 1, 'mmap_size': 256 * 1024 * 1024, 'cache_size': -16 * 1024, 'temp_store': 2},
+    # 전체 행을 훑는 대용량 DB: mmap/캐시를 크게 잡아 같은 페이지를 다시 읽지 않도록 함
+    'large_scan': {'query_only': 1, 'mmap_size': 2 * 1024 * 1024 * 1024, 'cache_size': -256 * 1024, 'temp_store': 2},
+}
+SQLITE_LARGE_DB_SIZE = 256 * 1024 * 1024  # auto 프로필에서 이 크기 이상이면 large_scan
+
+Ext4Inode = collections.namedtuple('Ext4Inode', 'ino mode uid gid size atime ctime mtime links flags block inline')
+Ext4DirEntry = collections.namedtuple('Ext4DirEntry', 'name path ino file_type')
+
+
+class Ext4Image:
+    """마운트 없이 ext4 이미지를 읽는 사용자 공간 리더 (읽기 전용, root/루프 장치 불필요)
+    
+    디렉토리는 htree 색인을 쓰지 않고 블록을 순차 탐색 - fbe-decrypt.mjs가 파일 이름을
+    제자리에서 복호화하므로 색인의 해시 값은 더 이상 맞지 않음.
+    아이노드, 익스텐트 목록, 디렉토리 목록은 LRU 캐시에 보관
+    """
+
+    def __init__(self, source, inode_cache_size=EXT4_INODE_CACHE_SIZE, extent_cache_size=EXT4_EXTENT_CACHE_SIZE,
+                 mount_point=USERDATA_MOUNT_POINT):
+        # source: 이미지 경로(mmap 사용) 또는 pread(length, offset)를 제공하는 객체 (예: Qcow2Image)
+        # mount_point: 절대 경로 심볼릭 링크(/data/user/0 -> /data/data 등)를 이미지 내부 경로로 바꿀 때 사용
+        self.mount_point = mount_point.rstrip('/')
+        self._file = None
+        self._map = None
+        if isinstance(source, (str, os.PathLike)):
+            self.path = os.fspath(source)
+            self._file = open(self.path, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._source = None
+        else:
+            self.path = getattr(source, 'path', None)
+            self._source = source
+        self._inodes = LRUCache(inode_cache_size)
+        self._extents = LRUCache(extent_cache_size)
+        self._directories = LRUCache(extent_cache_size)
+        try:
+            self._parse_superblock()
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _read(self, offset, length):
+        if self._map is not None:
+            return self._map[offset:offset + length]
+        return self._source.pread(length, offset)
+
+    def _parse_superblock(self):
+        sb = self._read(1024, 1024)
+        if len(sb) < 1024 or struct.unpack_from('<H', sb, 56)[0] != EXT4_MAGIC:
+            raise ValueError("ext4 슈퍼블록을 찾을 수 없습니다")
+        self.inodes_count, blocks_lo = struct.unpack_from('<II', sb, 0)
+        first_data_block, log_block_size = struct.unpack_from('<II', sb, 20)
+        self.blocks_per_group, = struct.unpack_from('<I', sb, 32)
+        self.inodes_per_group, = struct.unpack_from('<I', sb, 40)
+        rev_level, = struct.unpack_from('<I', sb, 76)
+        self.inode_size = struct.unpack_from('<H', sb, 88)[0] if rev_level else 128
+        self.feature_incompat, = struct.unpack_from('<I', sb, 96)
+        if self.feature_incompat & EXT4_INCOMPAT_META_BG:
+            raise ValueError("meta_bg 기능은 지원하지 않습니다")
+        self.block_size = 1024 << log_block_size
+        self.blocks_count = blocks_lo
+        desc_size = 32
+        if self.feature_incompat & EXT4_INCOMPAT_64BIT:
+            self.blocks_count |= struct.unpack_from('<I', sb, 0x150)[0] << 32
+            desc_size = max(struct.unpack_from('<H', sb, 0xFE)[0], 32)
+        self.volume_name = sb[120:136].split(b'\0', 1)[0].decode('utf-8', 'replace')
+        group_count = (self.inodes_count + self.inodes_per_group - 1) // self.inodes_per_group
+        table = self._read((first_data_block + 1) * self.block_size, group_count * desc_size)
+        self._inode_tables = []
+        for group in range(group_count):
+            base = group * desc_size
+            location, = struct.unpack_from('<I', table, base + 8)
+            if desc_size >= 64:
+                location |= struct.unpack_from('<I', table, base + 0x28)[0] << 32
+            self._inode_tables.append(location)
+
+    def inode(self, ino):
+        """아이노드 읽기 (캐시)"""
+        cached = self._inodes.get(ino)
+        if cached:
+            return cached
+        if not 1 <= ino <= self.inodes_count:
+            raise FileNotFoundError(errno.ENOENT, f"잘못된 아이노드 번호: {ino}")
+        group, index = divmod(ino - 1, self.inodes_per_group)
+        raw = self._read(self._inode_tables[group] * self.block_size + index * self.inode_size, self.inode_size)
+        mode, uid, size_lo, atime, ctime, mtime = struct.unpack_from('<HHIIII', raw, 0)
+        gid, links = struct.unpack_from('<HH', raw, 24)
+        flags, = struct.unpack_from('<I', raw, 32)
+        size = size_lo | (struct.unpack_from('<I', raw, 108)[0] << 32)
+        if self.inode_size > 128:
+            uid |= struct.unpack_from('<H', raw, 120)[0] << 16
+            gid |= struct.unpack_from('<H', raw, 122)[0] << 16
+        block = bytes(raw[40:100])
+        inline = None
+        if flags & EXT4_INLINE_DATA_FL:
+            # 인라인 데이터: i_block 60바이트 + system.data 확장 속성에 이어지는 나머지
+            inline = (block + self._inode_xattr(raw, 7, b'data'))[:size]
+        inode = Ext4Inode(ino, mode, uid, gid, size, atime, ctime, mtime, links, flags, block, inline)
+        self._inodes.put(ino, inode)
+        return inode
+
+    def _inode_xattr(self, raw, name_index, name):
+        """아이노드 내부 확장 속성 값 (없으면 b'')"""
+        if self.inode_size <= 128:
+            return b''
+        start = 128 + struct.unpack_from('<H', raw, 128)[0]
+        if start + 4 > len(raw) or struct.unpack_from('<I', raw, start)[0] != 0xEA020000:
+            return b''
+        entries = start + 4
+        position = entries
+        while position + 16 <= len(raw) and raw[position:position + 4] != b'\0\0\0\0':
+            name_len, index, value_offset, _, value_size = struct.unpack_from('<BBHII', raw, position)
+            if index == name_index and bytes(raw[position + 16:position + 16 + name_len]) == name:
+                return bytes(raw[entries + value_offset:entries + value_offset + value_size])
+            position += (16 + name_len + 3) & ~3
+        return b''
+
+    def extents(self, inode):
+        """파일 블록 매핑 [(논리 블록, 물리 블록, 길이, 초기화 여부)] (논리 블록 순, 캐시)"""
+        cached = self._extents.get(inode.ino)
+        if cached is not None:
+            return cached
+        if inode.inline is not None:
+            extents = []
+        elif inode.flags & EXT4_EXTENTS_FL:
+            extents = sorted(self._extent_tree(inode.block))
+        else:
+            extents = self._indirect_extents(inode)
+        self._extents.put(inode.ino, extents)
+        return extents
+
+    def _extent_tree(self, node):
+        magic, entries, _, depth = struct.unpack_from('<HHHH', node, 0)
+        if magic != EXT4_EXTENT_MAGIC:
+            raise ValueError("익스텐트 헤더 손상")
+        for i in range(entries):
+            position = 12 + i * 12
+            if depth:
+                _, leaf_lo, leaf_hi = struct.unpack_from('<IIH', node, position)
+                yield from self._extent_tree(self._read(((leaf_hi << 32) | leaf_lo) * self.block_size, self.block_size))
+            else:
+                logical, length, start_hi, start_lo = struct.unpack_from('<IHHI', node, position)
+                # 길이가 32768을 넘으면 할당만 되고 초기화되지 않은 익스텐트 (0으로 읽힘)
+                initialized = length <= 32768
+                yield logical, (start_hi << 32) | start_lo, length if initialized else length - 32768, initialized
+
+    def _indirect_extents(self, inode):
+        """ext2/3 방식 간접 블록 매핑을 익스텐트 목록으로 변환"""
+        block_count = (inode.size + self.block_size - 1) // self.block_size
+        pointers = struct.unpack('<15I', inode.block)
+        per_block = self.block_size // 4
+        physical = list(pointers[:12])
+
+        def expand(block, level):
+            if not block or len(physical) >= block_count:
+                physical.extend([0] * min(per_block ** level, block_count - len(physical)))
+                return
+            for child in struct.unpack(f'<{per_block}I', self._read(block * self.block_size, self.block_size)):
+                if len(physical) >= block_count:
+                    return
+                if level == 1:
+                    physical.append(child)
+                else:
+                    expand(child, level - 1)
+
+        for level, pointer in enumerate(pointers[12:], 1):
+            if len(physical) < block_count:
+                expand(pointer, level)
+        extents = []
+        for logical, block in enumerate(physical[:block_count]):
+            if not block:
+                continue
+            if extents and extents[-1][0] + extents[-1][2] == logical and extents[-1][1] + extents[-1][2] == block:
+                extents[-1] = (extents[-1][0], extents[-1][1], extents[-1][2] + 1, True)
+            else:
+                extents.append((logical, block, 1, True))
+        return extents
+
+    def open_inode(self, ino):
+        return Ext4File(self, self.inode(ino))
+
+    def open(self, path):
+        """파일 내용을 스트리밍으로 읽는 파일 객체"""
+        return self.open_inode(self.lookup(path))
+
+    def read_inode_data(self, ino):
+        with self.open_inode(ino) as f:
+            return f.read()
+
+    def readlink(self, path_or_ino):
+        ino = path_or_ino if isinstance(path_or_ino, int) else self.lookup(path_or_ino, follow=False)
+        inode = self.inode(ino)
+        if inode.size < 60 and not inode.flags & (EXT4_EXTENTS_FL | EXT4_INLINE_DATA_FL):
+            # fast symlink: 대상 경로가 i_block에 직접 저장됨
+            return inode.block[:inode.size].decode('utf-8', 'surrogateescape')
+        return self.read_inode_data(ino).decode('utf-8', 'surrogateescape')
+
+    def _directory(self, ino):
+        """디렉토리 항목 {이름: (아이노드, 종류)} (캐시)"""
+        cached = self._directories.get(ino)
+        if cached is not None:
+            return cached
+        inode = self.inode(ino)
+        if (inode.mode & 0xF000) != 0x4000:
+            raise NotADirectoryError(errno.ENOTDIR, f"디렉토리가 아님: 아이노드 {ino}")
+        entries = {}
+        has_filetype = self.feature_incompat & EXT4_INCOMPAT_FILETYPE
+        if inode.inline is not None:
+            # 인라인 디렉토리: 처음 4바이트가 상위 디렉토리 아이노드
+            entries['..'] = (struct.unpack_from('<I', inode.inline, 0)[0], 'dir')
+            blocks = [inode.inline[4:]]
+        else:
+            blocks = self._directory_blocks(inode)
+        for data in blocks:
+            position = 0
+            while position + 8 <= len(data):
+                child, rec_len, name_len = struct.unpack_from('<IHH', data, position)
+                file_type = 0
+                if has_filetype:
+                    name_len, file_type = name_len & 0xFF, name_len >> 8
+                if rec_len < 8 or position + rec_len > len(data):
+                    if rec_len in (0, 65535) and len(data) == 65536 and position == 0:
+                        rec_len = 65536
+                    else:
+                        break
+                # htree 색인 노드와 체크섬 꼬리는 아이노드 0인 가짜 항목이라 건너뜀
+                if child and name_len:
+                    name = bytes(data[position + 8:position + 8 + name_len]).decode('utf-8', 'surrogateescape')
+                    entries[name] = (child, EXT4_FILE_TYPES.get(file_type))
+                position += rec_len
+        self._directories.put(ino, entries)
+        return entries
+
+    def _directory_blocks(self, inode):
+        for logical, physical, length, initialized in self.extents(inode):
+            if initialized:
+                for i in range(length):
+                    yield self._read((physical + i) * self.block_size, self.block_size)
+
+    def lookup(self, path, follow=True):
+        """경로 → 아이노드 번호 (중간 심볼릭 링크는 따라감)"""
+        ino = EXT4_ROOT_INODE
+        parts = [part for part in path.split('/') if part and part != '.']
+        hops = 0
+        while parts:
+            part = parts.pop(0)
+            if part == '..':
+                ino = self._directory(ino).get('..', (EXT4_ROOT_INODE, 'dir'))[0]
+                continue
+            entry = self._directory(ino).get(part)
+            if not entry:
+                raise FileNotFoundError(errno.ENOENT, "이미지에 없는 경로", path)
+            child = entry[0]
+            if (parts or follow) and (self.inode(child).mode & 0xF000) == 0xA000:
+                hops += 1
+                if hops > 40:
+                    raise OSError(errno.ELOOP, "심볼릭 링크 순환", path)
+                target = self.readlink(child)
+                if target.startswith('/'):
+                    # 기기 기준 절대 경로 → 파티션 루트 기준 경로
+                    if self.mount_point and not (target + '/').startswith(self.mount_point + '/'):
+                        raise FileNotFoundError(errno.ENOENT, "이미지 밖을 가리키는 심볼릭 링크", target)
+                    target = target[len(self.mount_point):]
+                    ino = EXT4_ROOT_INODE
+                parts = [p for p in target.split('/') if p and p != '.'] + parts
+                continue
+            ino = child
+        return ino
+
+    def exists(self, path):
+        try:
+            self.lookup(path)
+            return True
+        except OSError:
+            return False
+
+    def stat(self, path):
+        return self.inode(self.lookup(path))
+
+    def scandir(self, path):
+        """디렉토리 항목 목록 ('.'과 '..' 제외)"""
+        base = '/' + path.strip('/')
+        entries = self._directory(self.lookup(path))
+        return [Ext4DirEntry(name, os.path.join(base, name), ino, file_type)
+                for name, (ino, file_type) in entries.items() if name not in ('.', '..')]
+
+    def listdir(self, path):
+        return [entry.name for entry in self.scandir(path)]
+
+    def is_dir(self, entry):
+        """디렉토리 항목이 디렉토리인지 (filetype 기능이 없으면 아이노드 확인)"""
+        if entry.file_type:
+            return entry.file_type == 'dir'
+        return (self.inode(entry.ino).mode & 0xF000) == 0x4000
+
+    def copy_file(self, path, dst_path):
+        """이미지 안의 파일을 dst_path로 복사 (빈 블록은 hole로 남김) - 복사한 바이트 수 반환"""
+        with self.open(path) as src, open(dst_path, 'wb') as dst:
+            buffer = bytearray(HASH_BUFFER_SIZE)
+            view = memoryview(buffer)
+            for start, end, is_data in src.sparse_extents(0, src.size):
+                if not is_data:
+                    continue
+                src.seek(start)
+                dst.seek(start)
+                while start < end:
+                    n = src.readinto(view[:min(len(buffer), end - start)])
+                    if not n:
+                        break
+                    dst.write(view[:n])
+                    start += n
+            dst.truncate(src.size)
+            return src.size
+
+
+class Ext4File(io.RawIOBase):
+    """ext4 이미지 안의 파일 하나를 읽는 파일 객체 - 익스텐트를 따라 이미지에서 직접 읽음"""
+
+    def __init__(self, image, inode):
+        super().__init__()
+        self.image = image
+        self.inode = inode
+        self.size = inode.size
+        self._extents = image.extents(inode)
+        self._starts = [extent[0] for extent in self._extents]
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"음수 위치: {offset}")
+        self._position = offset
+        return offset
+
+    def _extent_at(self, block):
+        """논리 블록을 포함하는 익스텐트와 다음 익스텐트 시작 블록"""
+        index = bisect.bisect_right(self._starts, block) - 1
+        next_start = self._starts[index + 1] if index + 1 < len(self._starts) else None
+        if index >= 0:
+            extent = self._extents[index]
+            if block < extent[0] + extent[2]:
+                return extent, next_start
+        return None, next_start
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        length = max(0, min(len(view), self.size - self._position))
+        if self.inode.inline is not None:
+            view[:length] = self.inode.inline[self._position:self._position + length]
+            self._position += length
+            return length
+        block_size = self.image.block_size
+        done = 0
+        while done < length:
+            position = self._position + done
+            block, offset = divmod(position, block_size)
+            extent, next_start = self._extent_at(block)
+            if extent and extent[3]:
+                run = (extent[0] + extent[2]) * block_size - position
+                n = min(run, length - done)
+                view[done:done + n] = self.image._read((extent[1] + block - extent[0]) * block_size + offset, n)
+            else:
+                # hole 또는 초기화되지 않은 익스텐트
+                hole_end = (extent[0] + extent[2]) * block_size if extent else (next_start * block_size if next_start is not None else self.size)
+                n = min(hole_end - position, length - done)
+                view[done:done + n] = bytes(n)
+            done += n
+        self._position += done
+        return done
+
+    def sparse_extents(self, start, end):
+        """[start, end)를 (시작, 끝, 데이터 여부)로 나눔 - MultiDigestHasher/복사에서 hole 건너뛰기"""
+        if self.inode.inline is not None:
+            if start < end:
+                yield start, end, True
+            return
+        block_size = self.image.block_size
+        position = start
+        for logical, _, length, initialized in self._extents:
+            extent_start = max(logical * block_size, start)
+            extent_end = min((logical + length) * block_size, end)
+            if not initialized or extent_end <= extent_start:
+                continue
+            if extent_start > position:
+                yield position, extent_start, False
+            yield extent_start, extent_end, True
+            position = extent_end
+        if position < end:
+            yield position, end, False
+
+
+DECRYPTER_INPUT_FILE = 'userdata-qemu.img.qcow2'  # fbe-decrypt.mjs가 읽는 이미지
+DECRYPTER_KEY_FILE = 'encryptionkey.img.qcow2'
+DECRYPT_BLOCK_SIZE = 4096
+DECRYPT_SHARD_SIZE = 1024 * 1024 * 1024  # 1GB 단위로 블록 구간 분할
+DECRYPT_SHARD_RETRIES = 2  # 실패한 구간 재시도 횟수
+SELECTIVE_DECRYPT_SUBDIRS = ('databases', 'shared_prefs')  # 선택적 복호화 시 앱별 복호화 대상 폴더
+# 선택적 복호화 시 앱 폴더를 찾는 위치 (파티션 루트 기준) - find_database_files의 /data/data, /data/user/<N>과 같음
+SELECTIVE_DECRYPT_APP_ROOTS = ('data', 'user/*')
+
+
+QCOW2_MAGIC = b'QFI\xfb'
+QCOW2_L2_CACHE_SIZE = 64  # LRU로 보관할 L2 테이블 수
+QCOW2_OFFSET_MASK = 0x00fffffffffffe00
+QCOW2_COMPRESSED = 1 << 62
+QCOW2_ZERO = 1
+
+
+class Qcow2Image(io.RawIOBase):
+    """qcow2 이미지의 게스트 디스크를 읽기 전용 파일 객체로 제공 (fbe-decrypt.mjs의 BlockDevQcow2와 같은 해석)
+    
+    이미지는 mmap으로 접근하고 파싱한 L2 테이블은 LRU 캐시에 보관.
+    할당되지 않은 클러스터는 백킹 파일 또는 0으로 읽히며, deflate 압축 클러스터도 지원
+    """
+
+    def __init__(self, path, l2_cache_size=QCOW2_L2_CACHE_SIZE):
+        super().__init__()
+        self.path = path
+        self.l2_cache_size = l2_cache_size
+        self.backing = None
+        self.backing_file = None
+        self._file = open(path, 'rb')
+        self._map = None
+        self._position = 0
+        self._l2_cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse_header()
+        except BaseException:
+            self.close()
+            raise
+
+    def _parse_header(self):
+        data = self._map
+        if data[:4] != QCOW2_MAGIC:
+            raise ValueError(f"qcow2 매직 불일치: {self.path}")
+        self.version, = struct.unpack_from('>I', data, 4)
+        backing_offset, backing_size, self.cluster_bits, self.size, crypt_method, l1_size, l1_offset = \
+            struct.unpack_from('>QIIQIIQ', data, 8)
+        if not 9 <= self.cluster_bits <= 21:
+            raise ValueError(f"잘못된 cluster_bits: {self.cluster_bits}")
+        if crypt_method:
+            raise ValueError("암호화된 qcow2는 지원하지 않습니다")
+        header_size = 72
+        if self.version > 2:
+            header_size, = struct.unpack_from('>I', data, 100)
+            if header_size < 104 or header_size & 7:
+                raise ValueError(f"잘못된 헤더 크기: {header_size}")
+            incompatible_features, = struct.unpack_from('>Q', data, 72)
+            # dirty/corrupt 비트만 허용 (읽기 전용이므로 무시 가능)
+            if incompatible_features & ~3:
+                raise ValueError(f"지원하지 않는 incompatible features: {incompatible_features & ~3:x}")
+        self.cluster_size = 1 << self.cluster_bits
+        self.cluster_count = (self.size + self.cluster_size - 1) // self.cluster_size
+        self._l2_entries = self.cluster_size // 8
+        self._zero_cluster = bytes(self.cluster_size)
+        self._l1 = struct.unpack_from(f'>{l1_size}Q', data, l1_offset)
+        self.snapshots = self._parse_snapshots(*struct.unpack_from('>IQ', data, 60))
+        if backing_offset:
+            self._open_backing(data[backing_offset:backing_offset + backing_size].decode('utf-8'), header_size)
+
+    def _parse_snapshots(self, count, position):
+        snapshots = []
+        for _ in range(count):
+            l1_offset, l1_size, id_size, name_size, seconds, nanoseconds, runtime_ns, _, extra_size = \
+                struct.unpack_from('>QIHHIIQII', self._map, position)
+            position += 40 + extra_size
+            snapshot_id = self._map[position:position + id_size].decode('utf-8', 'replace')
+            position += id_size
+            name = self._map[position:position + name_size].decode('utf-8', 'replace')
+            position += name_size
+            position += -position & 7
+            snapshots.append({
+                'id': snapshot_id,
+                'name': name,
+                'time': datetime.fromtimestamp(seconds + nanoseconds / 1e9, timezone.utc).isoformat(),
+                'guest_runtime_ns': runtime_ns,
+                'l1_offset': l1_offset,
+                'l1_size': l1_size
+            })
+        return snapshots
+
+    def _open_backing(self, name, position):
+        """백킹 파일 열기 - 헤더 확장 0xe2792aca로 형식 확인 (없으면 raw)"""
+        backing_format = 'raw'
+        while position + 8 <= len(self._map):
+            extension_type, length = struct.unpack_from('>II', self._map, position)
+            if extension_type == 0:
+                break
+            if extension_type == 0xe2792aca:
+                backing_format = self._map[position + 8:position + 8 + length].decode('utf-8')
+                break
+            position += 8 + ((length + 7) & ~7)
+        self.backing_file = os.path.join(os.path.dirname(self.path), name)
+        if backing_format == 'qcow2':
+            self.backing = Qcow2Image(self.backing_file, self.l2_cache_size)
+        else:
+            self.backing = open(self.backing_file, 'rb')
+
+    def load_snapshot(self, snapshot_id):
+        """스냅샷(id 또는 이름)의 L1 테이블로 전환"""
+        for snapshot in self.snapshots:
+            if snapshot_id in (snapshot['id'], snapshot['name']):
+                self._l1 = struct.unpack_from(f">{snapshot['l1_size']}Q", self._map, snapshot['l1_offset'])
+                with self._lock:
+                    self._l2_cache.clear()
+                return snapshot
+        raise KeyError(snapshot_id)
+
+    def info(self):
+        """메타데이터용 이미지 정보"""
+        return {
+            'format': 'qcow2',
+            'version': self.version,
+            'virtual_size': self.size,
+            'cluster_size': self.cluster_size,
+            'allocated_clusters': sum(1 for index in range(self.cluster_count) if self._entry_has_data(self._l2_entry(index))),
+            'backing_file': self.backing_file,
+            'snapshots': [{key: s[key] for key in ('id', 'name', 'time')} for s in self.snapshots]
+        }
+
+    def _l2_table(self, l2_offset):
+        """L2 테이블 파싱 결과를 LRU 캐시로 재사용"""
+        with self._lock:
+            table = self._l2_cache.get(l2_offset)
+            if table is not None:
+                self._l2_cache.move_to_end(l2_offset)
+                return table
+        table = struct.unpack_from(f'>{self._l2_entries}Q', self._map, l2_offset)
+        with self._lock:
+            self._l2_cache[l2_offset] = table
+            if len(self._l2_cache) > self.l2_cache_size:
+                self._l2_cache.popitem(last=False)
+        return table
+
+    def _l2_entry(self, index):
+        """클러스터의 L2 항목 (L1/L2가 할당되지 않았으면 0)"""
+        l1_index = index // self._l2_entries
+        if l1_index >= len(self._l1):
+            return 0
+        l2_offset = self._l1[l1_index] & QCOW2_OFFSET_MASK
+        if not l2_offset:
+            return 0
+        return self._l2_table(l2_offset)[index % self._l2_entries]
+
+    def read_cluster(self, index):
+        """게스트 클러스터 하나 읽기"""
+        return bytes(self._cluster_data(index))
+
+    def _cluster_data(self, index):
+        """클러스터 내용 (할당된 클러스터는 복사 없이 mmap의 memoryview)"""
+        if index >= self.cluster_count:
+            return self._zero_cluster
+        entry = self._l2_entry(index)
+        if not entry:
+            return self._read_backing(index)
+        if entry & QCOW2_COMPRESSED:
+            return self._read_compressed(entry)
+        if entry & QCOW2_ZERO:
+            return self._zero_cluster
+        offset = entry & QCOW2_OFFSET_MASK
+        data = memoryview(self._map)[offset:offset + self.cluster_size]
+        if len(data) < self.cluster_size:
+            return bytes(data).ljust(self.cluster_size, b'\0')
+        return data
+
+    def _read_backing(self, index):
+        if not self.backing:
+            return self._zero_cluster
+        offset = index * self.cluster_size
+        if isinstance(self.backing, Qcow2Image):
+            data = self.backing.pread(self.cluster_size, offset)
+        else:
+            data = os.pread(self.backing.fileno(), self.cluster_size, offset)
+        return data.ljust(self.cluster_size, b'\0')
+
+    def _read_compressed(self, entry):
+        """deflate 압축 클러스터 (qcow2 기본 압축 방식) 해제"""
+        offset_bits = 62 - (self.cluster_bits - 8)
+        offset = entry & ((1 << offset_bits) - 1)
+        sectors = ((entry >> offset_bits) & ((1 << (self.cluster_bits - 8)) - 1)) + 1
+        length = sectors * 512 - (offset & 511)
+        data = zlib.decompressobj(-12).decompress(self._map[offset:offset + length], self.cluster_size)
+        return data.ljust(self.cluster_size, b'\0')
+
+    def sparse_extents(self, start, end):
+        """[start, end) 구간을 (시작, 끝, 데이터 여부)로 나눠 반환 - 0으로 읽히는 클러스터는 hole"""
+        position = start
+        while position < end:
+            index = position // self.cluster_size
+            is_data = self._cluster_has_data(index)
+            extent_end = (index + 1) * self.cluster_size
+            while extent_end < end and self._cluster_has_data(extent_end // self.cluster_size) == is_data:
+                extent_end += self.cluster_size
+            extent_end = min(extent_end, end)
+            yield position, extent_end, is_data
+            position = extent_end
+
+    def _cluster_has_data(self, index):
+        if index >= self.cluster_count:
+            return False
+        entry = self._l2_entry(index)
+        if not entry:
+            # 백킹 파일 내용은 알 수 없으므로 데이터로 간주
+            return self.backing is not None
+        return self._entry_has_data(entry)
+
+    @staticmethod
+    def _entry_has_data(entry):
+        """L2 항목이 실제 데이터 클러스터(일반 또는 압축)를 가리키는지 확인"""
+        return bool(entry) and (bool(entry & QCOW2_COMPRESSED) or not entry & QCOW2_ZERO)
+
+    def pread(self, length, offset):
+        """게스트 디스크의 offset 위치에서 length 바이트 읽기"""
+        buffer = bytearray(max(0, min(length, self.size - offset)))
+        self._read_into(memoryview(buffer), offset)
+        return bytes(buffer)
+
+    def _read_into(self, view, offset):
+        done = 0
+        while done < len(view):
+            index, cluster_offset = divmod(offset + done, self.cluster_size)
+            n = min(self.cluster_size - cluster_offset, len(view) - done)
+            view[done:done + n] = self._cluster_data(index)[cluster_offset:cluster_offset + n]
+            done += n
+        return done
+
+    # io.RawIOBase 인터페이스 - MultiDigestHasher 등 파일 객체를 받는 코드에서 그대로 사용
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"음수 위치: {offset}")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        length = max(0, min(len(view), self.size - self._position))
+        n = self._read_into(view[:length], self._position)
+        self._position += n
+        return n
+
+    def close(self):
+        if self.backing:
+            self.backing.close()
+            self.backing = None
+        with self._lock:
+            self._l2_cache.clear()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+        super().close()
+
+
+def plan_block_shards(block_count, shard_blocks):
+    """블록 범위를 [start, end) 구간 목록으로 분할"""
+    return [(start, min(start + shard_blocks, block_count)) for start in range(0, block_count, shard_blocks)]
+
+
+HASH_MANIFEST_FILE = 'integrated_hash_manifest.json'
+
+
+class HashManifest:
+    """(device, inode, size, mtime_ns) 기준 해시 캐시 - JSON 사이드카 파일에 영구 저장"""
+
+    def __init__(self, manifest_path=HASH_MANIFEST_FILE):
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def file_key(file_path):
+        """파일 식별 키 - 내용이 바뀌면 size 또는 mtime_ns가 달라짐"""
+        st = os.stat(file_path)
+        return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {}) if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """임시 파일에 쓴 뒤 교체하여 중단 시에도 매니페스트가 깨지지 않게 저장"""
+        with self._lock:
+            data = {'version': 1, 'entries': self.entries}
+            tmp_path = f"{self.manifest_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+
+    def lookup(self, file_path, algorithms=HASH_ALGORITHMS):
+        """변경되지 않은 파일의 캐시 항목 반환 (없거나 알고리즘이 부족하면 None)"""
+        try:
+            key = self.file_key(file_path)
+        except OSError:
+            return None
+        entry = self.entries.get(key)
+        if not entry or not all(name in entry.get('hashes', {}) for name in algorithms):
+            return None
+        return entry
+
+    def lookup_segmented(self, file_path, segment_size):
+        """변경되지 않은 파일의 분할 해시 캐시 반환 (세그먼트 크기가 다르면 None)"""
+        entry = self.lookup(file_path, algorithms=())
+        segmented = entry.get('segmented') if entry else None
+        if not segmented or segmented.get('segment_size') != segment_size:
+            return None
+        return segmented
+
+    def store(self, file_path, key, hashes, **extra):
+        """계산 시작 시점의 키가 현재 파일과 같을 때만 저장 (계산 중 변경된 파일은 제외)"""
+        try:
+            if self.file_key(file_path) != key:
+                return False
+        except OSError:
+            return False
+        with self._lock:
+            entry = self.entries.get(key, {})
+            entry.update({
+                'path': os.path.abspath(file_path),
+                'hashes': {**entry.get('hashes', {}), **hashes},
+                'computed_at': datetime.now(timezone.utc).isoformat()
+            })
+            entry.update(extra)
+            # 같은 경로의 오래된 항목 정리
+            for old_key in [k for k, v in self.entries.items() if v.get('path') == entry['path'] and k != key]:
+                del self.entries[old_key]
+            self.entries[key] = entry
+        self.save()
+        return True
+
+
+DECRYPTION_CHECKPOINT_SUFFIX = '.checkpoint.json'
+
+
+class DecryptionCheckpoint:
+    """복호화 재개용 체크포인트 - 완료된 블록 구간과 입력 이미지 해시를 출력 파일 옆에 기록"""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.path = output_path + DECRYPTION_CHECKPOINT_SUFFIX
+        self.state = None
+
+    def load(self):
+        """저장된 체크포인트 읽기 (없거나 손상되었으면 None)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.state = state if isinstance(state, dict) and state.get('version') == 1 else None
+        except (OSError, ValueError):
+            self.state = None
+        return self.state
+
+    def mismatch(self, input_digests, block_count, block_size, selection=None):
+        """현재 입력/출력과 맞지 않는 이유 반환 (재개 가능하면 None)"""
+        state = self.state
+        if state.get('output_file') != os.path.abspath(self.output_path):
+            return "출력 파일 경로가 다름"
+        if state.get('selection') != selection:
+            return "복호화 대상 경로가 다름"
+        if state.get('block_count') != block_count or state.get('block_size') != block_size:
+            return "이미지 블록 수가 다름"
+        try:
+            if os.path.getsize(self.output_path) != block_count * block_size:
+                return "출력 파일 크기가 다름"
+        except OSError:
+            return "출력 파일이 없음"
+        for name, digest in input_digests.items():
+            if not digest or state.get('inputs', {}).get(name) != digest:
+                return f"입력 파일이 변경됨: {name}"
+        return None
+
+    def start(self, input_digests, hash_mode, segment_size, block_count, block_size, selection=None):
+        """새 체크포인트 시작"""
+        now = datetime.now(timezone.utc).isoformat()
+        self.state = {
+            'version': 1,
+            'output_file': os.path.abspath(self.output_path),
+            'inputs': input_digests,
+            'selection': selection,
+            'hash_mode': hash_mode,
+            'segment_size': segment_size,
+            'block_count': block_count,
+            'block_size': block_size,
+            'completed': [],
+            'created_at': now,
+            'updated_at': now
+        }
+        self.save()
+
+    def covers(self, block_range):
+        """block_range 전체가 완료된 구간에 포함되는지 확인 (구간 분할이 바뀌어도 동작)"""
+        start, end = block_range
+        for done_start, done_end in sorted(self.state['completed']):
+            if done_start > start:
+                break
+            start = max(start, done_end)
+        return start >= end
+
+    def mark_completed(self, block_range):
+        """디스크에 기록 완료된 구간 추가 후 저장"""
+        self.state['completed'].append(list(block_range))
+        self.state['updated_at'] = datetime.now(timezone.utc).isoformat()
+        self.save()
+
+    def save(self):
+        """임시 파일에 쓰고 fsync 후 교체 - 재부팅 후에도 완료 구간이 남도록 저장"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+ARTIFACT_STORE_DIR = 'decryption_artifacts'
+ARTIFACT_IMAGE_NAME = 'userdata-decrypted.img'
+ARTIFACT_METADATA_NAME = 'metadata.json'
+FICLONE = 0x40049409  # linux/fs.h - 블록을 공유하는 파일 복제 (btrfs, XFS 등)
+
+
+def link_or_copy_file(src_path, dst_path):
+    """reflink → 하드링크 → 희소 복사 순서로 시도하고 사용한 방식 반환"""
+    if fcntl:
+        try:
+            with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(src_path, dst_path)
+            return 'reflink'
+        except OSError:
+            # open() 자체가 실패했으면 대상 파일이 없음 - 원래 오류를 가리지 않고 다음 방식으로 진행
+            if os.path.lexists(dst_path):
+                os.remove(dst_path)
+    try:
+        os.link(src_path, dst_path)
+        return 'hardlink'
+    except OSError:
+        pass
+    copy_file_sparse(src_path, dst_path)
+    return 'copy'
+
+
+class DecryptionArtifactStore:
+    """입력 이미지 해시와 복호화 스크립트 버전으로 주소가 정해지는 복호화 결과 저장소
+    
+    <root>/<key>/ 아래에 복호화 이미지(읽기 전용)와 복호화 메타데이터를 보관
+    """
+
+    def __init__(self, root=ARTIFACT_STORE_DIR):
+        self.root = root
+
+    @staticmethod
+    def artifact_key(input_digests, decrypter_digest, hash_mode, segment_size, selection=None):
+        """입력 해시 + 복호화 스크립트 해시로 저장소 키 계산"""
+        identity = {
+            'inputs': input_digests,
+            'decrypter': decrypter_digest,
+            'hash_mode': hash_mode,
+            'segment_size': segment_size if hash_mode == 'segmented' else None
+        }
+        if selection:
+            # 선택적 복호화 결과는 전체 복호화 결과와 다른 이미지
+            identity['selection'] = selection
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def entry_path(self, key, *names):
+        return os.path.join(self.root, key, *names)
+
+    def lookup(self, key):
+        """저장된 항목의 메타데이터 반환 (없으면 None)"""
+        try:
+            with open(self.entry_path(key, ARTIFACT_METADATA_NAME), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(self.entry_path(key, ARTIFACT_IMAGE_NAME)):
+            return None
+        return entry
+
+    def materialize(self, key, dst_path):
+        """저장된 이미지를 dst_path로 연결 (기존 파일은 덮어쓰지 않고 교체) - 사용한 방식 반환"""
+        image_path = self.entry_path(key, ARTIFACT_IMAGE_NAME)
+        if os.path.exists(dst_path) and os.path.samefile(image_path, dst_path):
+            # 이미 저장소 이미지의 하드링크 (rename은 같은 파일끼리는 아무것도 하지 않음)
+            return 'hardlink'
+        tmp_path = f"{dst_path}.artifact-tmp"
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        method = link_or_copy_file(image_path, tmp_path)
+        os.replace(tmp_path, dst_path)
+        return method
+
+    def store(self, key, image_path, entry):
+        """복호화 이미지와 메타데이터 저장 (임시 디렉토리에 만든 뒤 이름 변경) - 사용한 방식 반환"""
+        if self.lookup(key):
+            return None
+        tmp_dir = self.entry_path(f".tmp-{key}-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            stored_image = os.path.join(tmp_dir, ARTIFACT_IMAGE_NAME)
+            method = link_or_copy_file(image_path, stored_image)
+            # 저장소 이미지는 읽기 전용 (하드링크로 공유된 경우에도 실수로 수정되지 않도록)
+            os.chmod(stored_image, 0o444)
+            # 재사용 시 이미지가 그대로인지 확인할 수 있도록 (device, inode, size, mtime_ns) 기록
+            entry = {**entry, 'image_file_key': HashManifest.file_key(stored_image)}
+            with open(os.path.join(tmp_dir, ARTIFACT_METADATA_NAME), 'w', encoding='utf-8') as f:
+                json.dump(entry, f, indent=2, ensure_ascii=False, default=str)
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+            os.rename(tmp_dir, self.entry_path(key))
+            return method
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+
+PRIVILEGED_HELPER_FLAG = '--privileged-helper'
+PRIVILEGED_HELPER_READ_LIMIT = 16 * 1024 * 1024  # read_range 한 번에 돌려줄 최대 크기
+
+
+class PrivilegedHelperError(OSError):
+    """특권 헬퍼가 돌려준 오류 (errno 유지)"""
+
+
+def _helper_stat(path):
+    st = os.stat(path, follow_symlinks=False)
+    return {'size': st.st_size, 'mode': st.st_mode, 'uid': st.st_uid, 'gid': st.st_gid,
+            'mtime': st.st_mtime, 'is_dir': (st.st_mode & 0o170000) == 0o040000}
+
+
+def list_directory_entries(path):
+    """os.scandir로 [이름, 디렉토리 여부, 크기] 목록 - 심볼릭 링크는 따라가지 않음 (sudo ls -la와 같은 기준)"""
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                size = entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                size = 0
+            entries.append([entry.name, entry.is_dir(follow_symlinks=False), size])
+    return entries
+
+
+def read_file_range(path, offset, length):
+    with open(path, 'rb', buffering=0) as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _helper_read_range(path, offset, length):
+    if length > PRIVILEGED_HELPER_READ_LIMIT:
+        raise OSError(errno.EINVAL, f"read_range 최대 크기 초과: {length}")
+    return base64.b64encode(read_file_range(path, offset, length)).decode('ascii')
+
+
+def _helper_copy(src, dst, uid=None, gid=None, mode=0o644):
+    """희소 복사 후 호출자가 읽을 수 있도록 소유자/권한 변경 (sudo cp + chmod + chown 대체)"""
+    copy_file_sparse(src, dst)
+    if uid is not None:
+        os.chown(dst, uid, -1 if gid is None else gid)
+    os.chmod(dst, mode)
+    return os.path.getsize(dst)
+
+
+def _helper_run(command):
+    result = subprocess.run(command, capture_output=True, text=True, timeout=30)
+    return {'returncode': result.returncode, 'stdout': result.stdout, 'stderr': result.stderr}
+
+
+PRIVILEGED_HELPER_METHODS = {
+    'ping': lambda: {'pid': os.getpid(), 'euid': os.geteuid()},
+    'stat': _helper_stat,
+    'exists': lambda path: os.path.lexists(path),
+    'listdir': list_directory_entries,
+    'read_range': _helper_read_range,
+    'copy': _helper_copy,
+    'mount': lambda image, mount_point, options=(): _helper_run(['mount'] + list(options) + [image, mount_point]),
+    'umount': lambda mount_point: _helper_run(['umount', mount_point]),
+}
+
+
+def _helper_dispatch(request):
+    """JSON-RPC 요청 하나 처리 → 응답"""
+    request_id = request.get('id') if isinstance(request, dict) else None
+    method = PRIVILEGED_HELPER_METHODS.get(request.get('method')) if isinstance(request, dict) else None
+    if method is None:
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32601, 'message': "알 수 없는 메서드"}}
+    try:
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': method(**request.get('params', {}))}
+    except OSError as e:
+        return {'jsonrpc': '2.0', 'id': request_id,
+                'error': {'code': -32000, 'message': e.strerror or str(e), 'data': {'errno': e.errno, 'path': e.filename}}}
+    except Exception as e:
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32603, 'message': str(e)}}
+
+
+def run_privileged_helper(stdin=None, stdout=None):
+    """특권 헬퍼 본체 - stdin에서 줄 단위 JSON-RPC 요청(또는 배치 배열)을 읽어 stdout으로 응답, EOF면 종료"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    # 다른 출력이 프로토콜 스트림에 섞이지 않도록 print는 stderr로 보냄
+    sys.stdout = sys.stderr
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': "JSON 파싱 오류"}}
+        else:
+            response = [_helper_dispatch(r) for r in request] if isinstance(request, list) else _helper_dispatch(request)
+        stdout.write(json.dumps(response) + '\n')
+        stdout.flush()
+
+
+class PrivilegedHelper:
+    """한 번만 띄워 두고 파이프로 요청하는 특권 헬퍼 클라이언트
+    
+    use_sudo=False면 같은 헬퍼를 권한 없이 실행 (이미 root이거나 테스트용 대역)
+    """
+
+    def __init__(self, use_sudo=True, script=None):
+        self.command = (['sudo'] if use_sudo else []) + [sys.executable, os.path.abspath(script or __file__), PRIVILEGED_HELPER_FLAG]
+        self.process = None
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """헬퍼 실행 (sudo 비밀번호는 여기서 한 번만 물음) 후 응답 확인"""
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True, encoding='utf-8', bufsize=1)
+        try:
+            return self.call('ping')
+        except OSError:
+            self.close()
+            raise
+
+    def _exchange(self, payload):
+        with self._lock:
+            if not self.process or self.process.poll() is not None:
+                raise PrivilegedHelperError(errno.EPIPE, "특권 헬퍼가 실행 중이 아님")
+            try:
+                self.process.stdin.write(json.dumps(payload) + '\n')
+                self.process.stdin.flush()
+                line = self.process.stdout.readline()
+            except (BrokenPipeError, ValueError):
+                line = ''
+            if not line:
+                raise PrivilegedHelperError(errno.EPIPE, "특권 헬퍼가 응답 없이 종료됨")
+            self.requests += 1
+            return json.loads(line)
+
+    def _request(self, method, params):
+        return {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': params}
+
+    @staticmethod
+    def _result(response):
+        if 'error' in response:
+            error = response['error']
+            data = error.get('data') or {}
+            return PrivilegedHelperError(data.get('errno') or errno.EIO, error.get('message'), data.get('path'))
+        return response.get('result')
+
+    def call(self, method, **params):
+        result = self._result(self._exchange(self._request(method, params)))
+        if isinstance(result, PrivilegedHelperError):
+            raise result
+        return result
+
+    def batch(self, calls):
+        """[(메서드, 인자 dict)] 를 한 번에 요청 - 결과 목록 (실패한 항목은 PrivilegedHelperError 객체)"""
+        if not calls:
+            return []
+        requests = [self._request(method, params) for method, params in calls]
+        responses = {response.get('id'): response for response in self._exchange(requests)}
+        return [self._result(responses.get(request['id'], {'error': {'message': "응답 없음"}})) for request in requests]
+
+    def stat(self, path):
+        return self.call('stat', path=path)
+
+    def exists(self, path):
+        return self.call('exists', path=path)
+
+    def listdir(self, path):
+        return [tuple(entry) for entry in self.call('listdir', path=path)]
+
+    def read_range(self, path, offset, length):
+        return base64.b64decode(self.call('read_range', path=path, offset=offset, length=length))
+
+    def copy(self, src, dst):
+        """호출자 소유의 읽기 가능한 복사본 생성 → 크기"""
+        return self.call('copy', src=src, dst=dst, uid=os.getuid(), gid=os.getgid())
+
+    def mount(self, image, mount_point, options=()):
+        result = self.call('mount', image=image, mount_point=mount_point, options=list(options))
+        return subprocess.CompletedProcess(['mount'] + list(options) + [image, mount_point], result['returncode'], result['stdout'], result['stderr'])
+
+    def umount(self, mount_point):
+        result = self.call('umount', mount_point=mount_point)
+        return subprocess.CompletedProcess(['umount', mount_point], result['returncode'], result['stdout'], result['stderr'])
+
+    def close(self):
+        """stdin을 닫으면 헬퍼가 스스로 종료"""
+        if not self.process:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# 앱 카테고리 분류 규칙 (priority가 작을수록 먼저 분석)
+DEFAULT_APP_CATEGORIES = {
+    "messaging": {
+        "apps": [
+            "com.kakao.talk", "jp.naver.line.android", "com.whatsapp",
+            "com.facebook.orca", "com.discord", "org.telegram.messenger",
+            "com.skype.raider", "com.viber.voip"
+        ],
+        "priority": 1
+    },
+    "social": {
+        "apps": [
+            "com.instagram.android", "com.facebook.katana", "com.twitter.android",
+            "com.snapchat.android", "com.tiktok.musically", "com.linkedin.android",
+            "com.reddit.frontpage"
+        ],
+        "priority": 2
+    },
+    "media": {
+        "apps": [
+            "com.spotify.music", "com.netflix.mediaclient", "com.youtube.android",
+            "com.soundcloud.android", "com.coffeebeanventures.easyvoicerecorder",
+            "com.google.android.apps.photos", "com.amazon.mp3"
+        ],
+        "priority": 2
+    },
+    "productivity": {
+        "apps": [
+            "com.google.android.keep", "com.evernote", "com.microsoft.office.onenote",
+            "com.todoist", "com.any.do", "com.dropbox.android", "com.notion.id"
+        ],
+        "priority": 1
+    },
+    "email": {
+        "apps": [
+            "com.google.android.gm", "com.microsoft.office.outlook",
+            "com.yahoo.mobile.client.android.mail", "com.apple.android.mail"
+        ],
+        "priority": 2
+    },
+    "navigation": {
+        "apps": [
+            "net.daum.android.map", "com.google.android.apps.maps", "com.waze",
+            "com.here.app.maps"
+        ],
+        "priority": 3
+    },
+    "system": {
+        "apps": [
+            "com.google.android.gms", "com.android.vending", "com.samsung", 
+            "com.sec.", "android", "com.google.android.gsf"
+        ],
+        "priority": 4
+    }
+}
+
+# 앱 패키지명 패턴 → 중요 테이블명 패턴 (먼저 나온 규칙 우선)
+DEFAULT_IMPORTANT_TABLES = {
+    "com.kakao.talk": ["chat", "message", "friend", "room", "OpenChatRoom"],
+    "jp.naver.line.android": ["chat", "message", "contact", "room", "group"],
+    "com.whatsapp": ["messages", "chat", "contacts", "group"],
+    "com.google.android.keep": ["note", "list", "reminder", "label"],
+    "com.coffeebeanventures.easyvoicerecorder": ["recording", "voice", "audio"],
+    "com.instagram.android": ["user", "media", "story", "direct"],
+    "com.spotify.music": ["track", "playlist", "user", "offline"],
+    "com.netflix.mediaclient": ["profile", "viewing", "download"],
+    "com.google.android.gm": ["message", "conversation", "label", "attachment"],
+    "com.evernote": ["note", "notebook", "tag", "resource"],
+    "com.dropbox.android": ["file", "sync", "account"],
+    "com.discord": ["message", "channel", "guild", "user"],
+    "org.telegram.messenger": ["message", "chat", "contact", "media"]
+}
+
+AppClassification = collections.namedtuple('AppClassification', 'category priority important_tables')
+
+
+class AppClassifier:
+    """앱 분류 규칙을 Aho-Corasick 오토마톤으로 한 번 컴파일 - 패키지명당 한 번의 탐색으로 카테고리와 중요 테이블 결정
+    
+    규칙 의미는 기존 반복문과 같음: 패키지명에 패턴이 부분 문자열로 포함되면 일치, 여러 규칙이 일치하면 먼저 나온 규칙
+    """
+
+    def __init__(self, categories=None, important_tables=None):
+        self.categories = DEFAULT_APP_CATEGORIES if categories is None else categories
+        self.important_tables = DEFAULT_IMPORTANT_TABLES if important_tables is None else important_tables
+        self._category_rules = [(category, info["priority"]) for category, info in self.categories.items()]
+        self._table_rules = list(self.important_tables.values())
+        # 상태별 전이, 실패 링크, 출력 (카테고리 규칙 번호 최소값, 테이블 규칙 번호 최소값)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [(None, None)]
+        for index, (category, info) in enumerate(self.categories.items()):
+            for pattern in info["apps"]:
+                self._add(pattern, index, None)
+        for index, pattern in enumerate(self.important_tables):
+            self._add(pattern, None, index)
+        self._link()
+        self._cache = {}
+
+    @classmethod
+    def from_rules_file(cls, path):
+        """JSON 규칙 파일 로드 - {"categories": {이름: {"apps": [...], "priority": n}}, "important_tables": {패턴: [...]}}
+        
+        빠진 항목은 내장 규칙 사용
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        if not isinstance(rules, dict):
+            raise ValueError(f"규칙 파일 최상위는 객체여야 합니다: {path}")
+        categories = rules.get('categories')
+        important_tables = rules.get('important_tables')
+        for category, info in (categories or {}).items():
+            if not isinstance(info, dict) or not isinstance(info.get('apps'), list) or not isinstance(info.get('priority'), int):
+                raise ValueError(f"잘못된 카테고리 규칙: {category}")
+        for pattern, tables in (important_tables or {}).items():
+            if not isinstance(tables, list):
+                raise ValueError(f"잘못된 중요 테이블 규칙: {pattern}")
+        return cls(categories, important_tables)
+
+    def _add(self, pattern, category_index, table_index):
+        if not pattern:
+            raise ValueError("빈 앱 패턴은 사용할 수 없습니다")
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append((None, None))
+            state = next_state
+        self._out[state] = self._merge(self._out[state], (category_index, table_index))
+
+    @staticmethod
+    def _merge(a, b):
+        return tuple(x if y is None else y if x is None else min(x, y) for x, y in zip(a, b))
+
+    def _link(self):
+        """너비 우선으로 실패 링크를 만들고, 접미사 상태의 출력을 합쳐 둠"""
+        pending = collections.deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._merge(self._out[next_state], self._out[self._fail[next_state]])
+                pending.append(next_state)
+
+    def classify(self, app_name):
+        """패키지명 → AppClassification(카테고리, 우선순위, 중요 테이블 패턴) - 일치하는 규칙이 없으면 None 항목"""
+        result = self._cache.get(app_name)
+        if result is not None:
+            return result
+        best = (None, None)
+        state = 0
+        for char in app_name:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._out[state] != (None, None):
+                best = self._merge(best, self._out[state])
+        category_index, table_index = best
+        category, priority = self._category_rules[category_index] if category_index is not None else (None, None)
+        result = AppClassification(category, priority, self._table_rules[table_index] if table_index is not None else None)
+        self._cache[app_name] = result
+        return result
+
+
+# 셀 내용 탐지기 - 문자 체계는 글자 수, 나머지는 발견 개수를 셈
+PII_DETECTOR_PATTERNS = (
+    ('url', r'\b(?:https?://|www\.)[^\s<>"\']+'),
+    # 기존 has_email_pattern/extract_emails와 같은 정규식 (최상위 도메인의 '|'도 그대로 허용)
+    ('email', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
+    ('coordinates', r'(?<![\d.])-?(?:[1-8]?\d|90)\.\d{4,}\s*,\s*-?(?:1[0-7]\d|\d{1,2}|180)\.\d{4,}(?![\d.])'),
+    ('phone', r'(?<![\w+])(?:\+?82[-. ]?1[016789]|01[016789])[-. ]?\d{3,4}[-. ]?\d{4}(?!\d)'
+              r'|(?<![\w+])\+[1-9]\d{0,2}[-. ]?\d{1,4}(?:[-. ]?\d{2,4}){2,3}(?!\d)'),
+    # 문자 체계는 공백으로 이어진 단어들을 한 번에 잡아 매치 수를 줄임 (글자 수에서 공백은 뺌)
+    ('hangul', r'[가-힣]+(?: +[가-힣]+)*'),
+    ('cjk', r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff]+(?: +[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff]+)*'),
+    ('cyrillic', r'[\u0400-\u04ff]+(?: +[\u0400-\u04ff]+)*'),
+)
+PII_SCRIPT_DETECTORS = frozenset({'hangul', 'cjk', 'cyrillic'})
+# 탐지기 매치의 첫 글자 (정규식 문자 클래스) - 어느 탐지기의 첫 글자도 아닌 위치는 교대 전체를 건너뜀
+PII_DETECTOR_FIRST_CHARS = {
+    'url': 'hw',
+    'email': r'A-Za-z0-9._%+\-',
+    'coordinates': r'\-\d',
+    'phone': '+08',
+    'hangul': '가-힣',
+    'cjk': r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff',
+    'cyrillic': r'\u0400-\u04ff',
+}
+# 매치 구간을 소비하지 않고 시작 위치만 차지하는 탐지기 - 안쪽의 한글/전화번호/좌표는 다른 탐지기가 셈
+PII_CONTAINER_DETECTORS = frozenset({'url'})
+# 다른 탐지기와 같은 글자를 두고 경쟁하므로 따로 훑는 탐지기 → 매치에 반드시 들어가는 문자
+PII_INDEPENDENT_DETECTORS = {'email': '@'}
+# 보고서 데이터 분류에 추가로 표시할 탐지기 (한글/이메일은 기존 항목으로 표시)
+PII_DETECTOR_LABELS = {'phone': "전화번호", 'url': "URL", 'coordinates': "좌표", 'cjk': "한자/가나", 'cyrillic': "키릴 문자"}
+# 전체 행 스캔 (--deep-scan) 설정
+DEEP_SCAN_BATCH_ROWS = 1000  # fetchmany 한 번에 가져오는 행 수
+DEEP_SCAN_BYTE_BUDGET = 256 * 1024 * 1024  # 테이블당 최대 스캔 크기
+DEEP_SCAN_TIME_BUDGET = 60  # 테이블당 최대 스캔 시간 (초)
+DEEP_SCAN_SAMPLE_ROWS = 5  # 탐지기별로 보관할 처음 일치 행 수
+DeepScanBudget = collections.namedtuple('DeepScanBudget', ['max_bytes', 'max_seconds', 'sample_rows'])
+# 보고서용 샘플 행 선택 방식 - head: 처음 행, tail: 마지막(최근) 행,
+# random: rowid 구간을 나눠 구간마다 한 행 (인덱스 탐색만 하므로 O(샘플 수)), reservoir: 전체를 한 번 훑는 균등 표본
+ROW_SAMPLING_STRATEGIES = ('head', 'tail', 'random', 'reservoir')
+ROW_SAMPLING_LABELS = {'head': "처음 행", 'tail': "최근 행", 'random': "전체 구간 무작위", 'reservoir': "전체 균등 표본"}
+
+
+KEYSET_PAGE_SIZE = 1000  # 키셋 페이지네이션 기본 페이지 크기
+
+
+def quote_identifier(name):
+    """SQLite 식별자 인용 (테이블/컬럼 이름에 공백, 따옴표, 예약어가 있어도 안전)"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class KeysetRowIterator:
+    """rowid/기본 키 기준 키셋 페이지네이션으로 테이블 전체 행을 일정한 메모리로 순회
+    
+    OFFSET 없이 'WHERE 키 > 마지막 키 ORDER BY 키 LIMIT n'으로 페이지를 가져오므로 페이지마다 인덱스 탐색만 하고,
+    state()를 저장해 두었다가 resume()으로 중단한 다음 행부터 이어서 읽을 수 있음
+    """
+    
+    def __init__(self, cur, table, page_size=KEYSET_PAGE_SIZE, key_columns=None, last_key=None, rows_read=0):
+        self.cur = cur
+        self.table = table
+        self.page_size = page_size
+        self.key_columns = list(key_columns or self.detect_key_columns(cur, table))
+        self.last_key = tuple(last_key) if last_key is not None else None
+        self.rows_read = rows_read
+        keys = ", ".join(quote_identifier(column) for column in self.key_columns)
+        placeholders = ", ".join("?" for _ in self.key_columns)
+        source = quote_identifier(table)
+        self._first_query = f"SELECT {keys}, * FROM {source} ORDER BY {keys} LIMIT ?"
+        self._next_query = f"SELECT {keys}, * FROM {source} WHERE ({keys}) > ({placeholders}) ORDER BY {keys} LIMIT ?"
+    
+    @staticmethod
+    def detect_key_columns(cur, table):
+        """페이지 키 컬럼 - rowid 테이블은 rowid, WITHOUT ROWID 테이블은 기본 키 컬럼 (없으면 ValueError)"""
+        schema = cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+        if schema is None:
+            raise ValueError(f"테이블 없음: {table}")
+        columns = cur.execute(f"PRAGMA table_info({quote_identifier(table)})").fetchall()
+        if not re.search(r'\bWITHOUT\s+ROWID\b', schema[0] or '', re.IGNORECASE):
+            names = {column[1].lower() for column in columns}
+            for alias in ('_rowid_', 'rowid', 'oid'):
+                if alias not in names:
+                    return [alias]
+            raise ValueError(f"rowid 별칭을 모두 컬럼 이름으로 쓰는 테이블: {table}")
+        primary_key = sorted((column[5], column[1]) for column in columns if column[5] > 0)
+        if not primary_key:
+            raise ValueError(f"기본 키 없는 WITHOUT ROWID 테이블: {table}")
+        return [name for _, name in primary_key]
+    
+    def _fetch_pages(self):
+        # 매 페이지 쿼리 시점의 last_key부터 읽으므로 소비한 행까지만 위치가 진행됨
+        while True:
+            if self.last_key is None:
+                rows = self.cur.execute(self._first_query, (self.page_size,)).fetchall()
+            else:
+                rows = self.cur.execute(self._next_query, (*self.last_key, self.page_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.page_size:
+                return
+    
+    def pages(self):
+        """행 목록(키 컬럼 제외)을 페이지 단위로 반환"""
+        key_length = len(self.key_columns)
+        for rows in self._fetch_pages():
+            self.last_key = tuple(rows[-1][:key_length])
+            self.rows_read += len(rows)
+            yield [row[key_length:] for row in rows]
+    
+    def __iter__(self):
+        """행 단위 순회 - 중간에 멈춰도 state()는 마지막으로 돌려준 행 다음부터 이어짐"""
+        key_length = len(self.key_columns)
+        for rows in self._fetch_pages():
+            for row in rows:
+                self.last_key = row[:key_length]
+                self.rows_read += 1
+                yield row[key_length:]
+    
+    def state(self):
+        """이어 읽기용 커서 상태 (rowid/텍스트 키면 JSON으로 저장 가능)"""
+        return {"table": self.table, "key_columns": self.key_columns, "page_size": self.page_size,
+                "last_key": list(self.last_key) if self.last_key is not None else None, "rows_read": self.rows_read}
+    
+    @classmethod
+    def resume(cls, cur, state, page_size=None):
+        return cls(cur, state["table"], page_size=page_size or state["page_size"], key_columns=state["key_columns"],
+                   last_key=state["last_key"], rows_read=state["rows_read"])
+
+
+def rowid_range(cur, table):
+    """(최소 rowid, 최대 rowid) - 빈 테이블이면 (None, None)
+    
+    min()/max()를 한 쿼리에 같이 쓰면 SQLite가 b-tree 끝만 보는 최적화를 못 해 전체를 훑으므로 따로 조회
+    """
+    source = quote_identifier(table)
+    low = cur.execute(f"SELECT min(_rowid_) FROM {source};").fetchone()[0]
+    high = cur.execute(f"SELECT max(_rowid_) FROM {source};").fetchone()[0]
+    return low, high
+
+
+def sample_table_rows(cur, table, limit, strategy='head', seed=None, without_rowid=False):
+    """테이블에서 limit개 샘플 행 선택 → (행 목록, 실제 사용한 방식)
+    
+    rowid가 없는 테이블은 tail → head, random → reservoir로 대체. 무작위 방식은 seed가 같으면
+    같은 행을 고르므로 같은 증거에서 보고서를 다시 만들어도 결과가 같음
+    """
+    if strategy in ('tail', 'random') and without_rowid:
+        strategy = 'head' if strategy == 'tail' else 'reservoir'
+    source = quote_identifier(table)
+    
+    if strategy == 'tail':
+        rows = cur.execute(f"SELECT * FROM {source} ORDER BY _rowid_ DESC LIMIT {int(limit)};").fetchall()
+        return rows[::-1], strategy
+    
+    if strategy == 'random':
+        low, high = rowid_range(cur, table)
+        if high is None or high - low < limit:
+            strategy = 'head'
+        else:
+            rng = random.Random(seed)
+            picked = {}
+            # rowid 범위를 limit개 구간으로 나눠 구간마다 임의 지점 이후 첫 행 → 표 전체에 고르게 분포
+            # (삭제로 빈 구간은 다음 행과 겹칠 수 있으므로 부족한 만큼 전체 범위에서 추가로 뽑음)
+            span = (high - low + 1) / limit
+            targets = [low + int(i * span + rng.random() * span) for i in range(limit)]
+            attempts = 0
+            while targets and attempts < limit * 4:
+                row = cur.execute(f"SELECT _rowid_, * FROM {source} WHERE _rowid_ >= ? ORDER BY _rowid_ LIMIT 1;",
+                                  (targets.pop(),)).fetchone()
+                attempts += 1
+                if row:
+                    picked[row[0]] = row[1:]
+                if not targets and len(picked) < limit:
+                    targets.append(rng.randint(low, high))
+            return [picked[rowid] for rowid in sorted(picked)], strategy
+    
+    if strategy == 'reservoir':
+        # Algorithm L - 다음으로 교체할 행 번호를 미리 계산해 배치 안에서 바로 건너뜀 (행마다 난수를 만들지 않음)
+        rng = random.Random(seed)
+        reservoir = []
+        weight = math.exp(math.log(rng.random()) / limit)
+        next_index = limit + int(math.log(rng.random()) / math.log(1 - weight))
+        base = 0
+        cur.execute(f"SELECT * FROM {source};")
+        for batch in iter(lambda: cur.fetchmany(DEEP_SCAN_BATCH_ROWS), []):
+            if len(reservoir) < limit:
+                reservoir.extend((base + i, row) for i, row in enumerate(batch[:limit - len(reservoir)]))
+            while next_index < base + len(batch):
+                reservoir[rng.randrange(limit)] = (next_index, batch[next_index - base])
+                weight *= math.exp(math.log(rng.random()) / limit)
+                next_index += int(math.log(rng.random()) / math.log(1 - weight)) + 1
+            base += len(batch)
+        return [row for _, row in sorted(reservoir, key=lambda item: item[0])], strategy
+    
+    return cur.execute(f"SELECT * FROM {source} LIMIT {int(limit)};").fetchall(), 'head'
+
+
+class PIIDetector:
+    """여러 탐지 패턴을 하나의 정규식으로 한 번만 컴파일해 셀마다 한 번만 훑음
+    
+    ASCII 문자열에는 문자 체계 탐지기를 뺀 정규식을 사용. URL은 전방 탐색으로 위치만 표시해 안쪽도 계속 훑고,
+    이메일은 '@'가 있는 텍스트만 별도 정규식으로 훑어 다른 탐지기에 가려지지 않게 함
+    """
+    
+    def __init__(self, patterns=PII_DETECTOR_PATTERNS):
+        self.kinds = tuple(kind for kind, _ in patterns)
+        combined = [(kind, regex) for kind, regex in patterns if kind not in PII_INDEPENDENT_DETECTORS]
+        self._pattern = self._compile(combined)
+        self._ascii_pattern = self._compile([(kind, regex) for kind, regex in combined if kind not in PII_SCRIPT_DETECTORS])
+        self._independent = [(kind, PII_INDEPENDENT_DETECTORS[kind], self._compile([(kind, regex)]))
+                             for kind, regex in patterns if kind in PII_INDEPENDENT_DETECTORS]
+    
+    @staticmethod
+    def _compile(patterns):
+        """탐지기 이름을 그룹으로 쓴 정규식 (컨테이너 탐지기는 전방 탐색 안의 그룹)
+        
+        각 분기와 교대 전체 앞에 첫 글자 검사를 붙여, 매치가 시작될 수 없는 위치에서는 분기를 하나씩 시도하지 않음
+        """
+        branches = []
+        for kind, regex in patterns:
+            branch = f'(?=(?P<{kind}>{regex}))' if kind in PII_CONTAINER_DETECTORS else f'(?P<{kind}>{regex})'
+            if kind in PII_DETECTOR_FIRST_CHARS:
+                branch = f'(?=[{PII_DETECTOR_FIRST_CHARS[kind]}]){branch}'
+            branches.append(branch)
+        if not branches:
+            return re.compile(r'(?!)')
+        if all(kind in PII_DETECTOR_FIRST_CHARS for kind, _ in patterns):
+            first_chars = ''.join(PII_DETECTOR_FIRST_CHARS[kind] for kind, _ in patterns)
+            return re.compile(f"(?=[{first_chars}])(?:{'|'.join(branches)})")
+        return re.compile('|'.join(branches))
+    
+    def _matches(self, text):
+        """텍스트의 (탐지기, 시작, 끝) - 앞선 URL 안에서 다시 시작하는 URL은 제외"""
+        container_end = 0
+        for match in (self._ascii_pattern if text.isascii() else self._pattern).finditer(text):
+            kind = match.lastgroup
+            start, end = match.span(kind)
+            if kind in PII_CONTAINER_DETECTORS:
+                if start < container_end:
+                    continue
+                container_end = end
+            yield kind, start, end
+        for kind, required, pattern in self._independent:
+            if required in text:
+                for match in pattern.finditer(text):
+                    yield (kind, *match.span())
+    
+    def scan(self, text, counts=None):
+        """텍스트 → {탐지기: 개수} (Counter, counts를 주면 거기에 누적) 와 이 텍스트에서 발견된 탐지기 집합
+        
+        셀마다 호출되는 경로라 _matches를 풀어서 씀 (제너레이터 호출 비용 제거)
+        """
+        counts = collections.Counter() if counts is None else counts
+        found = set()
+        container_end = 0
+        for match in (self._ascii_pattern if text.isascii() else self._pattern).finditer(text):
+            kind = match.lastgroup
+            if kind in PII_SCRIPT_DETECTORS:
+                start, end = match.span()
+                counts[kind] += end - start - text.count(' ', start, end)
+            else:
+                if kind in PII_CONTAINER_DETECTORS:
+                    start, end = match.span(kind)
+                    if start < container_end:
+                        continue
+                    container_end = end
+                counts[kind] += 1
+            found.add(kind)
+        for kind, required, pattern in self._independent:
+            if required in text:
+                matched = len(pattern.findall(text))
+                if matched:
+                    counts[kind] += matched
+                    found.add(kind)
+        return counts, found
+    
+    def scan_rows(self, rows, counts=None, cells=None):
+        """행 목록의 문자열 셀 검사 → (탐지기별 개수, 탐지기별 해당 셀 수) - 이어서 누적할 수 있음
+        
+        숫자/BLOB/NULL 셀은 건너뜀 (타임스탬프, ID 등이 대부분이라 탐지 대상이 아님)
+        """
+        counts = collections.Counter() if counts is None else counts
+        cells = collections.Counter() if cells is None else cells
+        for row in rows:
+            self.scan_row(row, counts, cells)
+        return counts, cells
+    
+    def scan_row(self, row, counts, cells):
+        """한 행의 문자열 셀을 검사해 counts/cells에 누적 → 이 행에서 발견된 탐지기 집합"""
+        row_found = set()
+        for cell in row:
+            if cell.__class__ is str and cell:
+                found = self.scan(cell, counts)[1]
+                for kind in found:
+                    cells[kind] += 1
+                row_found |= found
+        return row_found
+    
+    def findall(self, text, kind):
+        """텍스트에서 한 종류의 탐지 결과 문자열 목록"""
+        return [text[start:end] for found_kind, start, end in self._matches(text) if found_kind == kind]
+
+
+PII_DETECTOR = PIIDetector()
+
+
+# SQLite WAL 형식 (https://www.sqlite.org/fileformat2.html#walformat)
+WAL_MAGIC_LE = 0x377F0682  # 체크섬을 리틀엔디언 단위로 계산
+WAL_MAGIC_BE = 0x377F0683  # 체크섬을 빅엔디언 단위로 계산
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+WAL_SNAPSHOT_RETRIES = 3  # 캡처 중 원본 db/-wal/-shm이 바뀌면 다시 캡처하는 횟수
+
+
+def wal_checksum(data, endian, s0=0, s1=0):
+    """WAL 누적 체크섬 - 32비트 정수 두 개씩 더해 나감"""
+    for x0, x1 in struct.iter_unpack(endian + 'II', data):
+        s0 = (s0 + x0 + s1) & 0xFFFFFFFF
+        s1 = (s1 + x1 + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def parse_wal_frames(wal_path):
+    """WAL 프레임을 SQLite 복구와 같은 규칙으로 검증해 어떤 프레임이 재생되는지 계산
+
+    헤더 salt가 같고 체크섬 체인이 이어지는 프레임까지만 유효하며, 그중 마지막 커밋 프레임까지가 반영 대상
+    (1..applied_frames 프레임 반영, 나머지는 커밋되지 않았거나 이전 체크포인트의 잔여 프레임)
+    """
+    record = {"valid_header": False, "page_size": 0, "checkpoint_seq": 0, "total_frames": 0,
+              "valid_frames": 0, "applied_frames": 0, "ignored_frames": 0, "commit_frames": [],
+              "applied_pages": 0, "db_size_pages": 0}
+    with open(wal_path, 'rb') as f:
+        header = f.read(WAL_HEADER_SIZE)
+        if len(header) < WAL_HEADER_SIZE:
+            return record
+        magic, _, page_size, checkpoint_seq, salt1, salt2, c1, c2 = struct.unpack('>8I', header)
+        if magic not in (WAL_MAGIC_LE, WAL_MAGIC_BE) or page_size < 512 or page_size & (page_size - 1):
+            return record
+        endian = '<' if magic == WAL_MAGIC_LE else '>'
+        record["total_frames"] = (os.fstat(f.fileno()).st_size - WAL_HEADER_SIZE) // (WAL_FRAME_HEADER_SIZE + page_size)
+        if wal_checksum(header[:24], endian) != (c1, c2):
+            record["ignored_frames"] = record["total_frames"]
+            return record
+        record.update(valid_header=True, page_size=page_size, checkpoint_seq=checkpoint_seq)
+        
+        checksum = (c1, c2)
+        pending_pages = set()
+        applied_pages = set()
+        for index in range(1, record["total_frames"] + 1):
+            frame = f.read(WAL_FRAME_HEADER_SIZE + page_size)
+            page_number, commit_size, frame_salt1, frame_salt2, f1, f2 = struct.unpack('>6I', frame[:WAL_FRAME_HEADER_SIZE])
+            if page_number == 0 or (frame_salt1, frame_salt2) != (salt1, salt2):
+                break
+            checksum = wal_checksum(frame[:8], endian, *checksum)
+            checksum = wal_checksum(frame[WAL_FRAME_HEADER_SIZE:], endian, *checksum)
+            if checksum != (f1, f2):
+                break
+            record["valid_frames"] = index
+            pending_pages.add(page_number)
+            if commit_size:
+                record["applied_frames"] = index
+                record["commit_frames"].append(index)
+                record["db_size_pages"] = commit_size
+                applied_pages |= pending_pages
+                pending_pages.clear()
+    record["ignored_frames"] = record["total_frames"] - record["applied_frames"]
+    record["applied_pages"] = len(applied_pages)
+    return record
+
+
+# SQLite b-tree 페이지 형식 (https://www.sqlite.org/fileformat2.html#b_tree_pages)
+SQLITE_DB_HEADER_SIZE = 100
+BTREE_INTERIOR_INDEX = 0x02
+BTREE_INTERIOR_TABLE = 0x05
+BTREE_LEAF_INDEX = 0x0A
+BTREE_LEAF_TABLE = 0x0D
+BTREE_SAMPLE_LEAVES = 16  # 행 수 추정 시 셀 개수를 직접 세는 리프 페이지 수
+ROW_COUNT_METHODS = {'exact': "정확", 'btree_exact': "정확 (페이지)", 'stat1': "추정 (sqlite_stat1)",
+                     'rowid': "추정 (rowid 범위)", 'btree': "추정 (b-tree 페이지)"}
+SQLITE_FREELIST_OFFSET = 32  # DB 헤더의 첫 프리리스트 트렁크 페이지 번호
+SQLITE_TEXT_ENCODING_OFFSET = 56
+SQLITE_TEXT_ENCODINGS = {1: 'utf-8', 2: 'utf-16-le', 3: 'utf-16-be'}
+
+
+class SQLitePageFile:
+    """SQLite DB를 SQL을 거치지 않고 페이지 단위로 읽기 - 파일은 mmap, 메모리로 읽은 DB는 버퍼 그대로 사용"""
+    
+    def __init__(self, source):
+        self._file = None
+        self._map = None
+        if isinstance(source, (bytes, bytearray)):
+            self.data = source
+        else:
+            self._file = open(source, 'rb')
+            if os.fstat(self._file.fileno()).st_size:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = self._map or b''
+        if self.data[:16] != SQLITE_HEADER_MAGIC:
+            self.close()
+            raise ValueError("SQLite 데이터베이스 헤더가 아님")
+        page_size = struct.unpack_from('>H', self.data, 16)[0]
+        self.page_size = 65536 if page_size == 1 else page_size
+        self.usable_size = self.page_size - self.data[20]
+        self.page_count = len(self.data) // self.page_size
+    
+    def page(self, page_number):
+        if not 1 <= page_number <= self.page_count:
+            raise ValueError(f"페이지 번호 범위 밖: {page_number}")
+        start = (page_number - 1) * self.page_size
+        return self.data[start:start + self.page_size]
+    
+    def btree_page(self, page_number):
+        """b-tree 페이지 → (페이지 종류, 셀 개수, 자식 페이지 목록, 페이지 데이터, 헤더 위치)"""
+        data = self.page(page_number)
+        offset = SQLITE_DB_HEADER_SIZE if page_number == 1 else 0
+        page_type = data[offset]
+        cell_count = struct.unpack_from('>H', data, offset + 3)[0]
+        if page_type in (BTREE_LEAF_TABLE, BTREE_LEAF_INDEX):
+            return page_type, cell_count, [], data, offset
+        if page_type not in (BTREE_INTERIOR_TABLE, BTREE_INTERIOR_INDEX):
+            raise ValueError(f"b-tree 페이지가 아님: {page_number} (종류 {page_type})")
+        pointers = struct.unpack_from(f'>{cell_count}H', data, offset + 12)
+        children = [struct.unpack_from('>I', data, pointer)[0] for pointer in pointers]
+        children.append(struct.unpack_from('>I', data, offset + 8)[0])
+        return page_type, cell_count, children, data, offset
+    
+    def estimate_btree_rows(self, root_page, sample_leaves=BTREE_SAMPLE_LEAVES):
+        """내부 페이지만 훑어 리프 페이지 수를 세고, 일부 리프의 셀 개수로 행 수 추정 → (행 수, 정확 여부)
+        
+        리프가 sample_leaves개 이하면 모두 세므로 정확한 값. 인덱스 b-tree(WITHOUT ROWID)는 내부 셀도 행임
+        """
+        level = [root_page]
+        interior_rows = 0
+        visited = 0
+        while True:
+            page_type, cell_count, children, _, _ = self.btree_page(level[0])
+            if not children:
+                break
+            next_level = []
+            for page_number in level:
+                page_type, cell_count, children, _, _ = self.btree_page(page_number)
+                if page_type == BTREE_INTERIOR_INDEX:
+                    interior_rows += cell_count
+                next_level.extend(children)
+            visited += len(level)
+            if visited > self.page_count:
+                raise ValueError("b-tree 순환 참조")
+            level = next_level
+        if len(level) <= sample_leaves:
+            return interior_rows + sum(self.btree_page(page_number)[1] for page_number in level), True
+        step = len(level) / sample_leaves
+        sampled = [self.btree_page(level[int(i * step)])[1] for i in range(sample_leaves)]
+        return interior_rows + round(sum(sampled) / sample_leaves * len(level)), False
+    
+    def table_leaf_pages(self, root_page):
+        """테이블 b-tree의 리프 페이지 → (페이지 번호, 페이지 데이터, 헤더 위치)를 키 순서대로 반환"""
+        stack = [root_page]
+        visited = 0
+        while stack:
+            page_number = stack.pop()
+            visited += 1
+            if visited > self.page_count:
+                raise ValueError("b-tree 순환 참조")
+            page_type, _, children, data, offset = self.btree_page(page_number)
+            if page_type == BTREE_LEAF_TABLE:
+                yield page_number, data, offset
+            elif page_type == BTREE_INTERIOR_TABLE:
+                stack.extend(reversed(children))
+            else:
+                raise ValueError(f"테이블 b-tree 페이지가 아님: {page_number} (종류 {page_type})")
+    
+    def freelist_pages(self):
+        """프리리스트 페이지 → (페이지 번호, 이전 내용이 남아 있는 시작 위치) - 트렁크는 리프 목록 뒤부터"""
+        trunk_page = struct.unpack_from('>I', self.data, SQLITE_FREELIST_OFFSET)[0]
+        visited = set()
+        while 0 < trunk_page <= self.page_count and trunk_page not in visited:
+            visited.add(trunk_page)
+            data = self.page(trunk_page)
+            next_trunk, leaf_count = struct.unpack_from('>II', data, 0)
+            leaf_count = min(leaf_count, (self.usable_size - 8) // 4)
+            yield trunk_page, 8 + 4 * leaf_count
+            for leaf_page in struct.unpack_from(f'>{leaf_count}I', data, 8):
+                if 0 < leaf_page <= self.page_count:
+                    yield leaf_page, 0
+            trunk_page = next_trunk
+    
+    def unused_regions(self, data, offset):
+        """b-tree 페이지의 빈 공간 → [(종류, 시작, 끝)] - 셀 포인터 배열 뒤 미할당 영역과 프리블록 체인"""
+        page_type = data[offset]
+        first_freeblock, cell_count, content_start = struct.unpack_from('>HHH', data, offset + 1)
+        header_size = 8 if page_type in (BTREE_LEAF_TABLE, BTREE_LEAF_INDEX) else 12
+        pointers_end = offset + header_size + 2 * cell_count
+        content_start = min(content_start or 65536, self.usable_size)
+        regions = []
+        if pointers_end < content_start:
+            regions.append(('unallocated', pointers_end, content_start))
+        freeblock = first_freeblock
+        while pointers_end <= freeblock and freeblock + 4 <= self.usable_size:
+            next_freeblock, size = struct.unpack_from('>HH', data, freeblock)
+            regions.append(('freeblock', freeblock, min(freeblock + size, self.usable_size)))
+            # 프리블록 체인은 오프셋 오름차순이어야 함 (아니면 손상된 체인)
+            if next_freeblock <= freeblock:
+                break
+            freeblock = next_freeblock
+        return regions
+    
+    def close(self):
+        if self._map:
+            self._map.close()
+            self._map = None
+        if self._file:
+            self._file.close()
+            self._file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# 삭제 행 복구 (프리리스트 페이지, 프리블록, 미할당 영역의 레코드 카빙)
+RECOVERY_MAX_ROWS = 200  # 테이블당 결과에 담는 복구 행 수 (개수는 전부 셈)
+RECOVERY_SOURCES = {'freelist': "프리리스트 페이지", 'freeblock': "프리블록", 'unallocated': "미할당 영역"}
+RECOVERY_STATUSES = {'deleted': "삭제됨", 'previous_version': "수정 전 값"}
+# 컬럼 친화성별로 레코드 헤더에 올 수 있는 직렬 타입 (텍스트/BLOB 길이는 최대 3바이트 varint)
+_SERIAL_TYPE_ANY = rb'(?:[\x00-\x09\x0c-\x7f]|[\x80-\xff]{1,2}[\x00-\x7f])'
+RECORD_SERIAL_PATTERNS = {
+    'rowid': rb'\x00',  # INTEGER PRIMARY KEY 컬럼은 레코드에 NULL로 저장됨
+    'integer': rb'[\x00-\x09]',
+    'real': rb'[\x00-\x09]',
+    'text': rb'(?:[\x00\x0c-\x7f]|[\x80-\xff]{1,2}[\x00-\x7f])',
+    'numeric': _SERIAL_TYPE_ANY,
+    'blob': _SERIAL_TYPE_ANY,
+}
+SERIAL_TYPE_SIZES = (0, 1, 2, 3, 4, 6, 8, 8, 0, 0)
+NUMERIC_AFFINITIES = ('rowid', 'integer', 'real')
+RECORD_LAYOUT_CACHE_SIZE = 65536  # 레코드 헤더별 디코딩 배치 캐시 크기
+
+
+def read_varint(data, offset):
+    """SQLite varint → (값, 다음 위치)"""
+    value = 0
+    for i in range(8):
+        byte = data[offset + i]
+        value = (value << 7) | (byte & 0x7f)
+        if byte < 0x80:
+            return value, offset + i + 1
+    return (value << 8) | data[offset + 8], offset + 9
+
+
+def column_affinity(declared_type):
+    """선언 타입 → 컬럼 친화성 (https://www.sqlite.org/datatype3.html#determination_of_column_affinity)"""
+    declared = (declared_type or '').upper()
+    if 'INT' in declared:
+        return 'integer'
+    if any(keyword in declared for keyword in ('CHAR', 'CLOB', 'TEXT')):
+        return 'text'
+    if 'BLOB' in declared or not declared:
+        return 'blob'
+    if any(keyword in declared for keyword in ('REAL', 'FLOA', 'DOUB')):
+        return 'real'
+    return 'numeric'
+
+
+class SQLiteRecordCarver:
+    """테이블 스키마로 만든 레코드 헤더 패턴으로 빈 공간을 훑어 삭제된 레코드를 복구
+    
+    테이블이 소유한 리프 페이지의 프리블록/미할당 영역은 그 테이블 패턴만, 프리리스트 페이지는 모든 테이블 패턴으로 찾고
+    후보마다 헤더 길이, 컬럼 수, 직렬 타입, 값 디코딩까지 검증. 프리블록은 셀 앞 4바이트가 덮어써져 rowid를 잃지만
+    셀이 온전히 남은 경우 레코드 앞의 셀 헤더(페이로드 길이, rowid)에서 rowid를 되살림
+    """
+    
+    def __init__(self, pages, tables):
+        # tables: [(테이블 이름, 루트 페이지, 컬럼별 친화성)] - rowid 별칭 컬럼의 친화성은 'rowid'
+        self.pages = pages
+        encoding = struct.unpack_from('>I', pages.data, SQLITE_TEXT_ENCODING_OFFSET)[0]
+        self.encoding = SQLITE_TEXT_ENCODINGS.get(encoding, 'utf-8')
+        self.tables = []
+        for name, root_page, affinities in tables:
+            pattern = self.record_pattern(affinities)
+            if pattern:
+                self.tables.append((name, root_page, affinities, re.compile(pattern)))
+        self.all_tables = list(range(len(self.tables)))
+        self.layouts = {}
+        self.any_table = re.compile(b'|'.join(b'(?P<t%d>%s)' % (index, table[3].pattern)
+                                              for index, table in enumerate(self.tables))) if self.tables else None
+    
+    @staticmethod
+    def record_pattern(affinities):
+        """레코드 헤더 정규식 - 헤더 길이 바이트 + 컬럼별 직렬 타입 (헤더 길이가 1바이트를 넘는 넓은 테이블은 None)"""
+        if not affinities:
+            return None
+        varint_columns = sum(1 for affinity in affinities if affinity in ('text', 'numeric', 'blob'))
+        lowest = len(affinities) + 1
+        highest = lowest + 2 * varint_columns
+        if highest > 0x7f:
+            return None
+        return (rb'[\x%02x-\x%02x]' % (lowest, highest)) + b''.join(RECORD_SERIAL_PATTERNS[affinity] for affinity in affinities)
+    
+    def parse_record(self, data, start, end, index):
+        """start 위치의 레코드 → (값 목록, 레코드 끝 위치), index번 테이블 스키마와 맞지 않으면 None"""
+        # record_pattern이 헤더 길이를 1바이트 varint로 제한하므로 바로 읽음
+        header_size = data[start]
+        header_end = start + header_size
+        if header_size >= 0x80 or header_end > end:
+            return None
+        # 같은 헤더(직렬 타입 조합)의 레코드가 대부분이라 헤더별 디코딩 배치를 캐시
+        # (이미지 모드의 메모리 DB는 bytearray라 조각도 bytearray이므로 해시 가능한 bytes로 바꿈)
+        key = (index, bytes(data[start:header_end]))
+        layout = self.layouts.get(key, False)
+        if layout is False:
+            layout = self.record_layout(self.read_serials(data, start + 1, header_end), self.tables[index][2])
+            if len(self.layouts) >= RECORD_LAYOUT_CACHE_SIZE:
+                self.layouts.clear()
+            self.layouts[key] = layout
+        return layout and self.decode_layout(data, header_end, end, layout)
+    
+    @staticmethod
+    def read_serials(data, position, header_end):
+        """레코드 헤더의 직렬 타입 목록 (헤더 끝이 varint 경계와 안 맞으면 None)"""
+        serials = []
+        try:
+            while position < header_end:
+                byte = data[position]
+                # 직렬 타입은 거의 1~2바이트 varint라 함수 호출 없이 바로 읽음
+                if byte < 0x80:
+                    serials.append(byte)
+                    position += 1
+                elif data[position + 1] < 0x80:
+                    serials.append(((byte & 0x7f) << 7) | data[position + 1])
+                    position += 2
+                else:
+                    serial, position = read_varint(data, position)
+                    serials.append(serial)
+        except IndexError:
+            return None
+        return serials if position == header_end else None
+    
+    @staticmethod
+    def record_layout(serials, affinities):
+        """직렬 타입 목록 → (필드별 (종류, 크기), 본문 크기, 값 있는 필드 여부) - 컬럼 친화성으로 저장될 수 없으면 None
+        
+        TEXT 친화성은 숫자를 텍스트로 바꿔 저장하고, 카빙에서는 TEXT 컬럼의 BLOB도 오탐으로 봄
+        """
+        if serials is None or len(serials) != len(affinities):
+            return None
+        fields = []
+        body_size = 0
+        meaningful = False
+        for serial, affinity in zip(serials, affinities):
+            if serial >= 12:
+                if affinity in NUMERIC_AFFINITIES:
+                    return None
+                size = (serial - 12) >> 1
+                if serial & 1:
+                    fields.append(('text', size))
+                    meaningful = True
+                elif affinity == 'text':
+                    return None
+                else:
+                    fields.append(('blob', size))
+            elif serial == 0:
+                size = 0
+                fields.append(('null', 0))
+            elif serial >= 10 or affinity in ('text', 'rowid'):
+                return None
+            elif serial == 7:
+                size = 8
+                fields.append(('real', 8))
+                meaningful = True
+            elif serial == 9:
+                size = 0
+                fields.append(('one', 0))
+                meaningful = True
+            else:
+                # 직렬 타입 8(상수 0)은 길이 0 정수로 디코딩
+                size = SERIAL_TYPE_SIZES[serial]
+                fields.append(('int', size))
+                meaningful = True
+            body_size += size
+        return fields, body_size, meaningful
+    
+    def decode_layout(self, data, body, end, layout):
+        fields, body_size, meaningful = layout
+        if body + body_size > end:
+            return None
+        values = []
+        for kind, size in fields:
+            if kind == 'null':
+                values.append(None)
+                continue
+            chunk = data[body:body + size]
+            body += size
+            if kind == 'text':
+                try:
+                    value = chunk.decode(self.encoding)
+                except UnicodeDecodeError:
+                    return None
+                if '\x00' in value:
+                    return None
+            elif kind == 'int':
+                value = int.from_bytes(chunk, 'big', signed=True)
+            elif kind == 'blob':
+                value = bytes(chunk)
+                meaningful = meaningful or bool(value.strip(b'\x00'))
+            elif kind == 'real':
+                value = struct.unpack('>d', chunk)[0]
+            else:
+                value = 1
+            values.append(value)
+        # 값이 모두 NULL이거나 0으로 채워진 BLOB뿐이면 secure_delete로 지워진 영역에서 우연히 맞은 것
+        if not meaningful:
+            return None
+        return values, body
+    
+    def parse_freeblock_record(self, data, start, end, index):
+        """앞 4바이트가 프리블록 헤더(다음 위치, 크기)로 덮어써진 셀 → (값 목록, 레코드 끝 위치) 또는 None
+        
+        페이로드 길이와 rowid가 합쳐 2~3바이트인 작은 셀은 레코드 헤더 길이 바이트(와 첫 직렬 타입)까지 잃으므로,
+        잃은 직렬 타입이 rowid 별칭(항상 NULL)뿐일 때 남은 직렬 타입으로 헤더를 다시 구성
+        """
+        affinities = self.tables[index][2]
+        for cell_header_size in (3, 2):
+            lost = 3 - cell_header_size
+            if any(affinity != 'rowid' for affinity in affinities[:lost]):
+                continue
+            serials = [0] * lost
+            position = start + 4
+            try:
+                while len(serials) < len(affinities) and position < end:
+                    serial, position = read_varint(data, position)
+                    serials.append(serial)
+            except IndexError:
+                continue
+            layout = self.record_layout(serials, affinities)
+            parsed = layout and self.decode_layout(data, position, end, layout)
+            if parsed:
+                return parsed
+        return None
+    
+    @staticmethod
+    def cell_rowid(data, record_start, payload_size, region_start):
+        """레코드 바로 앞의 셀 헤더(페이로드 길이 varint + rowid varint)가 온전하면 rowid, 아니면 None"""
+        for rowid_size in range(1, 10):
+            for size_size in (1, 2, 3):
+                cell_start = record_start - rowid_size - size_size
+                if cell_start < region_start:
+                    break
+                size, position = read_varint(data, cell_start)
+                if position != cell_start + size_size or size != payload_size:
+                    continue
+                rowid, position = read_varint(data, position)
+                if position == record_start:
+                    return rowid - (1 << 64) if rowid >= 1 << 63 else rowid
+        return None
+    
+    def identify(self, data, match, end, candidates):
+        """정규식 후보 → (테이블 번호, 값 목록, 레코드 끝) - 패턴이 같은 테이블이 여럿이면 값 검증을 통과한 첫 테이블"""
+        start = match.start()
+        first = int(match.lastgroup[1:]) if match.lastgroup else candidates[0]
+        parsed = self.parse_record(data, start, end, first)
+        if parsed:
+            return first, *parsed
+        for index in candidates:
+            if index != first and self.tables[index][3].match(data, start, end):
+                parsed = self.parse_record(data, start, end, index)
+                if parsed:
+                    return index, *parsed
+        return None
+    
+    def carve_region(self, data, start, end, pattern, candidates, source, page_number, results, freeblock=False):
+        position = start
+        # 셀 헤더가 4바이트보다 짧으면 레코드 헤더 앞부분이 프리블록 헤더에 덮어써져 정규식으로는 못 찾음
+        intact = pattern.match(data, start + 4, end) if freeblock else None
+        if freeblock and not (intact and self.identify(data, intact, end, candidates)):
+            for index in candidates:
+                parsed = self.parse_freeblock_record(data, start, end, index)
+                if parsed:
+                    results[self.tables[index][0]].append({
+                        "values": parsed[0],
+                        "rowid": None,
+                        "source": source,
+                        "page": page_number,
+                        "offset": start
+                    })
+                    position = parsed[1]
+                    break
+        while position < end:
+            match = pattern.search(data, position, end)
+            if not match:
+                return
+            found = self.identify(data, match, end, candidates)
+            if not found:
+                position = match.start() + 1
+                continue
+            index, values, record_end = found
+            results[self.tables[index][0]].append({
+                "values": values,
+                "rowid": self.cell_rowid(data, match.start(), record_end - match.start(), start),
+                "source": source,
+                "page": page_number,
+                "offset": match.start()
+            })
+            position = record_end
+    
+    def carve_cells(self, data, page_number, results):
+        """헤더가 남아 있는 프리리스트 리프 페이지 - 셀 포인터로 온전한 셀을 rowid와 함께 복구"""
+        cell_count = struct.unpack_from('>H', data, 3)[0]
+        pointers_end = 8 + 2 * cell_count
+        if pointers_end > self.pages.usable_size:
+            return
+        for pointer in struct.unpack_from(f'>{cell_count}H', data, 8):
+            if not pointers_end <= pointer < self.pages.usable_size:
+                continue
+            try:
+                payload_size, position = read_varint(data, pointer)
+                rowid, position = read_varint(data, position)
+            except IndexError:
+                continue
+            # 오버플로 페이지로 이어진 레코드는 제외 (이어진 페이지도 재사용됐을 수 있음)
+            end = position + payload_size
+            if end > self.pages.usable_size:
+                continue
+            match = self.any_table.match(data, position, end)
+            found = match and self.identify(data, match, end, self.all_tables)
+            if found and found[2] == end:
+                results[self.tables[found[0]][0]].append({
+                    "values": found[1],
+                    "rowid": rowid - (1 << 64) if rowid >= 1 << 63 else rowid,
+                    "source": 'freelist',
+                    "page": page_number,
+                    "offset": position
+                })
+    
+    def carve(self):
+        """→ {테이블 이름: [{값 목록, rowid(모르면 None), 출처, 페이지 번호, 페이지 내 위치}]}"""
+        results = collections.defaultdict(list)
+        for index, (name, root_page, _, pattern) in enumerate(self.tables):
+            try:
+                for page_number, data, offset in self.pages.table_leaf_pages(root_page):
+                    for source, start, end in self.pages.unused_regions(data, offset):
+                        self.carve_region(data, start, end, pattern, [index], source, page_number, results,
+                                          freeblock=source == 'freeblock')
+            except (ValueError, struct.error):
+                # 손상된 b-tree는 읽은 곳까지만 복구
+                continue
+        if self.any_table:
+            for page_number, content_start in self.pages.freelist_pages():
+                data = self.pages.page(page_number)
+                if content_start == 0 and data[0] == BTREE_LEAF_TABLE:
+                    self.carve_cells(data, page_number, results)
+                    regions = self.pages.unused_regions(data, 0)
+                elif content_start == 0 and data[0] in (BTREE_INTERIOR_TABLE, BTREE_INTERIOR_INDEX, BTREE_LEAF_INDEX):
+                    # 내부 페이지는 자식 포인터, 인덱스 페이지는 인덱스 키뿐이라 테이블 행으로 오인만 생김
+                    continue
+                else:
+                    regions = [('unallocated', content_start, self.pages.usable_size)]
+                for kind, start, end in regions:
+                    self.carve_region(data, start, end, self.any_table, self.all_tables, 'freelist', page_number, results,
+                                      freeblock=kind == 'freeblock')
+        return results
+
 
 class IntegratedDecryptionAndForensicsLogger:
-    def __init__(self):
+    def __init__(self, hash_mode='linear', segment_size=HASH_SEGMENT_SIZE, hash_workers=None,
+                 stall_timeout=DECRYPTION_STALL_TIMEOUT, decrypt_workers=1, shard_size=DECRYPT_SHARD_SIZE,
+                 shard_retries=DECRYPT_SHARD_RETRIES, resumable=False, artifact_store=ARTIFACT_STORE_DIR,
+                 verify_artifact=False, hash_guest_image=False, selective=False, privileged_helper=True,
+                 discovery_workers=DB_DISCOVERY_WORKERS, app_classifier=None, sqlite_profile='auto',
+                 analysis_workers=DB_ANALYSIS_WORKERS, exact_row_counts=False, deep_scan=None,
+                 row_sampling='head', recover_deleted=False):
         self.start_time = datetime.now(timezone.utc)
         self.log_file = f"integrated_analysis_log_{self.start_time.strftime('%Y%m%d_%H%M%S')}.log"
         self.metadata = {}
         self.temp_dir = None
+        # 복호화 이미지를 마운트 없이 읽는 ext4 리더 (None이면 마운트 + sudo 경로 사용)
+        self.image_fs = None
+        self.hash_manifest = HashManifest()
+        # 해시 모드: 'linear' (전체 파일 SHA-256/SHA-1/MD5) 또는 'segmented' (병렬 Merkle)
+        self.hash_mode = hash_mode
+        self.segment_size = segment_size
+        self.hash_workers = hash_workers
+        # 복호화 스크립트가 stall_timeout초 동안 진행이 없으면 중단
+        self.stall_timeout = stall_timeout
+        # 2 이상이면 블록 구간을 나눠 여러 복호화 프로세스로 병렬 처리
+        self.decrypt_workers = decrypt_workers
+        self.shard_size = shard_size
+        self.shard_retries = shard_retries
+        # 완료된 블록 구간을 체크포인트로 기록해 중단 후 재실행 시 이어서 복호화
+        self.resumable = resumable
+        # 같은 입력의 복호화 결과를 저장소에서 재사용 (None이면 사용 안 함)
+        self.artifact_store = DecryptionArtifactStore(artifact_store) if artifact_store else None
+        # 재사용 전에 저장소 이미지 전체를 다시 해시해 검증 (기본은 파일 식별 키만 비교)
+        self.verify_artifact = verify_artifact
+        # qcow2 원본의 게스트 디스크 내용 해시도 계산 (raw 변환본과 비교용)
+        self.hash_guest_image = hash_guest_image
+        # 우선순위 앱의 databases/, shared_prefs/ 만 복호화 (나머지 파일 내용은 0으로 채워짐)
+        self.selective = selective
+        # 마운트 방식일 때 sudo를 매번 실행하지 않고 한 번 띄운 특권 헬퍼로 처리
+        self.use_privileged_helper = privileged_helper
+        self.privileged_helper = None
+        self.discovery_workers = discovery_workers
+        # 앱 카테고리/중요 테이블 규칙 (--app-rules 파일 또는 내장 규칙)
+        self.app_classifier = app_classifier or AppClassifier()
+        # 분석용 SQLite 연결 튜닝 프로필 ('auto'면 DB 크기로 선택)
+        self.sqlite_profile = sqlite_profile
+        # 2 이상이면 DB 분석을 프로세스 풀로 병렬 처리 (결과/로그는 우선순위 순서대로 합침)
+        self.analysis_workers = analysis_workers
+        # 법정 제출용 보고서처럼 정확한 행 수가 필요하면 모든 테이블에 COUNT(*) (기본은 저비용 추정)
+        self.exact_row_counts = exact_row_counts
+        # DeepScanBudget이면 첫 몇 행이 아니라 테이블 전체 행을 스트리밍으로 탐지 (None이면 사용 안 함)
+        self.deep_scan = deep_scan
+        # 보고서 샘플 행 선택 방식 (ROW_SAMPLING_STRATEGIES)
+        self.row_sampling = row_sampling
+        # 프리리스트/프리블록/미할당 영역에서 삭제된 행을 카빙해 테이블 결과에 붙임
+        self.recover_deleted = recover_deleted
+        # find_database_files 결과: DB 경로 → 앱/사용자/크기/WAL·저널 짝 정보
+        self.database_index = {}
+        # snapshot_database 결과: DB 경로 → 캡처한 파일 세트와 반영된 WAL 프레임 기록
+        self.wal_snapshots = {}
+        self.decryption_progress = {}
         
-    def log_and_print(self, message, file_only=False):
-        """콘솔과 로그 파일에 동시 출력"""
-        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+    def log_and_print(self, message, file_only=False, timestamp=None):
+        """콘솔과 로그 파일에 동시 출력 (timestamp: 분석 작업 프로세스에서 기록된 원래 시각)"""
+        timestamp = timestamp or datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
         log_message = f"[{timestamp}] {message}"
         
         if not file_only:
@@ -202,35 +2977,115 @@ class IntegratedDecryptionAndForensicsLogger:
         
         print("DEBUG: collect_system_info 완료")
     
-    def calculate_file_hash(self, file_path):
-        """파일 해시 계산 (진행률 표시)"""
+    def calculate_file_hashes(self, file_path):
+        """파일 해시 계산 - SHA-256/SHA-1/MD5를 한 번의 읽기로 계산 (진행률 표시)"""
         if not os.path.exists(file_path):
             return None
             
+        # 해시 매니페스트 확인 - 파일이 변경되지 않았으면 재계산하지 않음
+        cached = self.hash_manifest.lookup(file_path)
+        if cached:
+            self.log_and_print(f"해시 캐시 사용 (변경 없음): {file_path} - 계산 시각: {cached.get('computed_at')}")
+            return {name: cached['hashes'][name] for name in HASH_ALGORITHMS}
+        
         self.log_and_print(f"파일 해시 계산 중: {file_path}")
+        file_key = HashManifest.file_key(file_path)
         file_size = os.path.getsize(file_path)
         self.log_and_print(f"파일 크기: {file_size / (1024**3):.2f} GB")
         
-        sha256_hash = hashlib.sha256()
-        processed_bytes = 0
         start_time = time.time()
+        next_report = 1024**3
         
-        with open(file_path, "rb") as f:
-            while True:
-                byte_block = f.read(4096)
-                if not byte_block:
-                    break
-                sha256_hash.update(byte_block)
-                processed_bytes += len(byte_block)
-                
-                # 진행률 출력 (1GB마다)
-                if processed_bytes % (1024**3) == 0 or processed_bytes == file_size:
-                    progress = (processed_bytes / file_size) * 100
-                    elapsed = time.time() - start_time
-                    progress_msg = f"진행률: {progress:.1f}% ({processed_bytes / (1024**3):.2f} GB / {file_size / (1024**3):.2f} GB) - 경과시간: {elapsed:.1f}초"
-                    self.log_and_print(progress_msg)
+        def report_progress(processed_bytes):
+            nonlocal next_report
+            # 진행률 출력 (1GB마다)
+            if processed_bytes >= next_report or processed_bytes == file_size:
+                while next_report <= processed_bytes:
+                    next_report += 1024**3
+                progress = (processed_bytes / file_size) * 100 if file_size else 100.0
+                elapsed = time.time() - start_time
+                progress_msg = f"진행률: {progress:.1f}% ({processed_bytes / (1024**3):.2f} GB / {file_size / (1024**3):.2f} GB) - 경과시간: {elapsed:.1f}초"
+                self.log_and_print(progress_msg)
+        
+        hashes = MultiDigestHasher.hash_file(file_path, progress_callback=report_progress)
+        elapsed = time.time() - start_time
+        if elapsed > 0:
+            self.log_and_print(f"해시 처리 속도: {file_size / (1024**2) / elapsed:.1f} MB/s")
+        try:
+            self.hash_manifest.store(file_path, file_key, hashes)
+        except OSError as e:
+            self.log_and_print(f"⚠️  해시 매니페스트 저장 실패: {e}")
+        return hashes
+    
+    def calculate_file_hash(self, file_path):
+        """파일 SHA-256 해시 계산 (진행률 표시)"""
+        hashes = self.calculate_file_hashes(file_path)
+        return hashes['sha256'] if hashes else None
+    
+    def calculate_segmented_hash(self, file_path, segment_size=None):
+        """분할(Merkle) 해시 계산 - 세그먼트별 해시와 루트 해시 (프로세스 풀 병렬 처리)"""
+        if not os.path.exists(file_path):
+            return None
+        segment_size = segment_size or self.segment_size
+        
+        cached = self.hash_manifest.lookup_segmented(file_path, segment_size)
+        if cached:
+            self.log_and_print(f"분할 해시 캐시 사용 (변경 없음): {file_path}")
+            return cached
+        
+        file_key = HashManifest.file_key(file_path)
+        file_size = os.path.getsize(file_path)
+        workers = self.hash_workers or os.cpu_count()
+        self.log_and_print(f"분할 해시 계산 중: {file_path}")
+        self.log_and_print(f"파일 크기: {file_size / (1024**3):.2f} GB, 세그먼트: {segment_size / (1024**2):.0f} MB, 작업자: {workers}개")
+        
+        start_time = time.time()
+        report_every = max(1, (1024**3) // segment_size)
+        
+        def report_progress(done, total):
+            # 진행률 출력 (약 1GB마다)
+            if done % report_every == 0 or done == total:
+                elapsed = time.time() - start_time
+                self.log_and_print(f"진행률: {done / total * 100:.1f}% ({done}/{total} 세그먼트) - 경과시간: {elapsed:.1f}초")
         
-        return sha256_hash.hexdigest()
+        result = hash_file_segmented(file_path, segment_size, workers, report_progress)
+        elapsed = time.time() - start_time
+        if elapsed > 0:
+            self.log_and_print(f"해시 처리 속도: {file_size / (1024**2) / elapsed:.1f} MB/s")
+        self.log_and_print(f"Merkle 루트: {result['root']} ({result['segment_count']}개 세그먼트)")
+        try:
+            self.hash_manifest.store(file_path, file_key, {}, segmented=result)
+        except OSError as e:
+            self.log_and_print(f"⚠️  해시 매니페스트 저장 실패: {e}")
+        return result
+    
+    def hash_evidence_file(self, file_path):
+        """해시 모드에 따라 증거 파일 해시 계산 - (대표 해시, 다중 해시, 분할 해시) 반환"""
+        if self.hash_mode == 'segmented':
+            segmented = self.calculate_segmented_hash(file_path)
+            return segmented['root'], None, segmented
+        hashes = self.calculate_file_hashes(file_path)
+        return hashes['sha256'], hashes, None
+    
+    def calculate_guest_image_hashes(self, file_path):
+        """qcow2 이미지의 게스트 디스크 내용 해시 - raw로 변환했을 때의 해시와 동일 (raw 사본 없이 계산)"""
+        cached = self.hash_manifest.lookup(file_path, algorithms=())
+        if cached and cached.get('guest_hashes'):
+            self.log_and_print(f"게스트 디스크 해시 캐시 사용 (변경 없음): {file_path}")
+            return cached['guest_hashes']
+        
+        file_key = HashManifest.file_key(file_path)
+        start_time = time.time()
+        with Qcow2Image(file_path) as image, MultiDigestHasher() as hasher:
+            self.log_and_print(f"게스트 디스크 해시 계산 중: {file_path} (가상 크기 {image.size / (1024**3):.2f} GB, 할당된 클러스터만 읽음)")
+            hasher.update_from_file(image)
+            guest_hashes = hasher.hexdigests()
+        self.log_and_print(f"✅ 게스트 디스크 해시: {guest_hashes['sha256']} ({time.time() - start_time:.1f}초)")
+        try:
+            self.hash_manifest.store(file_path, file_key, {}, guest_hashes=guest_hashes)
+        except OSError as e:
+            self.log_and_print(f"⚠️  해시 매니페스트 저장 실패: {e}")
+        return guest_hashes
     
     def collect_file_metadata(self, file_path):
         """파일 메타데이터 수집"""
@@ -239,6 +3094,9 @@ class IntegratedDecryptionAndForensicsLogger:
         
         try:
             stat = os.stat(file_path)
+            _, hashes, segmented = self.hash_evidence_file(file_path)
+            hashes = hashes or {}
+            manifest_entry = self.hash_manifest.lookup(file_path) or {}
             metadata = {
                 'path': os.path.abspath(file_path),
                 'size': stat.st_size,
@@ -246,8 +3104,13 @@ class IntegratedDecryptionAndForensicsLogger:
                 'modified_time': datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
                 'created_time': datetime.fromtimestamp(stat.st_ctime, timezone.utc).isoformat(),
                 'permissions': oct(stat.st_mode)[-3:],
-                'hash_sha256': self.calculate_file_hash(file_path)
+                'hash_sha256': hashes.get('sha256'),
+                'hash_sha1': hashes.get('sha1'),
+                'hash_md5': hashes.get('md5'),
+                'hash_computed_at': manifest_entry.get('computed_at')
             }
+            if segmented:
+                metadata['hash_segmented'] = segmented
             return metadata
         except Exception as e:
             self.log_and_print(f"파일 메타데이터 수집 실패 ({file_path}): {e}")
@@ -285,6 +3148,18 @@ class IntegratedDecryptionAndForensicsLogger:
                     }
                 except Exception as e:
                     print(f"DEBUG: 파일 정보 수집 실패 {file}: {e}")
+                # qcow2 이미지는 헤더를 미리 검증 (복호화 스크립트가 지원하지 않는 형식이면 여기서 중단)
+                if file.endswith('.qcow2'):
+                    try:
+                        with Qcow2Image(file) as image:
+                            info = image.info()
+                        file_metadata.setdefault(file, {})['qcow2'] = info
+                        self.log_and_print(f"  qcow2 v{info['version']}: 가상 크기 {info['virtual_size'] / (1024**3):.1f}GB, "
+                                           f"클러스터 {info['cluster_size'] // 1024}KB, 할당 {info['allocated_clusters']:,}개, "
+                                           f"스냅샷 {len(info['snapshots'])}개")
+                    except (OSError, ValueError, struct.error) as e:
+                        self.log_and_print(f"❌ qcow2 이미지를 읽을 수 없습니다 ({file}): {e}")
+                        return False
         
         self.metadata['input_files'] = file_metadata
         
@@ -333,6 +3208,9 @@ class IntegratedDecryptionAndForensicsLogger:
         
         original_file = None
         original_hash = None
+        original_hashes = None
+        original_segmented = None
+        original_guest_hashes = None
         
         for filename in possible_original_files:
             if os.path.exists(filename):
@@ -344,14 +3222,14 @@ class IntegratedDecryptionAndForensicsLogger:
                     if file_size > 10 * 1024 * 1024 * 1024:  # 10GB 이상
                         self.log_and_print(f"⚠️  파일이 매우 큽니다 ({file_size / (1024**3):.1f}GB). 해시 계산에 시간이 오래 걸릴 수 있습니다.")
                     
-                    # 청크 단위로 읽어서 해시 계산 (메모리 효율적)
-                    hash_sha256 = hashlib.sha256()
-                    with open(original_file, 'rb') as f:
-                        for chunk in iter(lambda: f.read(4096), b""):
-                            hash_sha256.update(chunk)
-                    
-                    original_hash = hash_sha256.hexdigest()
+                    # 대용량 버퍼로 한 번만 읽어 SHA-256/SHA-1/MD5 동시 계산 (또는 분할 해시)
+                    original_hash, original_hashes, original_segmented = self.hash_evidence_file(original_file)
                     self.log_and_print(f"✅ 원본 파일 해시: {original_hash}")
+                    if original_hashes:
+                        self.log_and_print(f"   SHA-1: {original_hashes['sha1']}")
+                        self.log_and_print(f"   MD5: {original_hashes['md5']}")
+                    if self.hash_guest_image and filename.endswith('.qcow2'):
+                        original_guest_hashes = self.calculate_guest_image_hashes(original_file)
                     break
                     
                 except PermissionError:
@@ -374,22 +3252,45 @@ class IntegratedDecryptionAndForensicsLogger:
         else:
             self.log_and_print(f"✅ 원본 파일 확인됨: {original_file}")
         
+        checkpoint = None
         try:
             print("DEBUG: node fbe-decrypt.mjs 실행...")
-            result = subprocess.run(
-                ['node', 'fbe-decrypt.mjs'],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=900  # 5분 타임아웃
+            decrypted_file = 'userdata-decrypted.img'
+            artifact_key = self.decryption_artifact_key()
+            if artifact_key and self.reuse_decryption_artifact(artifact_key, decrypted_file):
+                print("DEBUG: run_decryption 성공 (저장된 결과 재사용)")
+                return True
+            
+            include_paths = self.decryption_include_paths()
+            command = ['node', 'fbe-decrypt.mjs']
+            if include_paths:
+                self.log_and_print(f"🎯 선택적 복호화: 우선순위 앱의 {', '.join(SELECTIVE_DECRYPT_SUBDIRS)} 폴더만 복호화합니다 ({len(include_paths)}개 경로 패턴)")
+                self.log_and_print("⚠️  그 외 파일 내용은 결과 이미지에 포함되지 않습니다 (분류/초동 분석용)")
+                for path in include_paths:
+                    command += ['--include', path]
+            
+            shards = self.plan_decryption_shards()
+            checkpoint = self.open_decryption_checkpoint(decrypted_file, shards)
+            result, tail_hasher = self._run_decrypter(
+                command,
+                decrypted_file,
+                stall_timeout=self.stall_timeout,  # 진행이 멈춘 경우에만 타임아웃
+                shards=shards,
+                checkpoint=checkpoint
             )
+            if checkpoint:
+                checkpoint.remove()
             
             decryption_end = datetime.now(timezone.utc)
             decryption_duration = (decryption_end - decryption_start).total_seconds()
             
+            # 복호화 중 계산된 해시를 매니페스트에 기록 (아래 해시 단계에서 재사용)
+            self._record_tail_hashes(tail_hasher, decrypted_file)
+            
             # 복호화된 파일 SHA-256 계산
-            decrypted_file = 'userdata-decrypted.img'
             decrypted_hash = None
+            decrypted_hashes = None
+            decrypted_segmented = None
             if os.path.exists(decrypted_file):
                 try:
                     self.log_and_print("🔍 복호화된 파일 무결성 검증 중...")
@@ -399,14 +3300,12 @@ class IntegratedDecryptionAndForensicsLogger:
                     if file_size > 10 * 1024 * 1024 * 1024:  # 10GB 이상
                         self.log_and_print(f"⚠️  복호화된 파일이 매우 큽니다 ({file_size / (1024**3):.1f}GB). 해시 계산에 시간이 오래 걸릴 수 있습니다.")
                     
-                    # 청크 단위로 읽어서 해시 계산 (메모리 효율적)
-                    hash_sha256 = hashlib.sha256()
-                    with open(decrypted_file, 'rb') as f:
-                        for chunk in iter(lambda: f.read(4096), b""):
-                            hash_sha256.update(chunk)
-                    
-                    decrypted_hash = hash_sha256.hexdigest()
+                    # 대용량 버퍼로 한 번만 읽어 SHA-256/SHA-1/MD5 동시 계산 (또는 분할 해시)
+                    decrypted_hash, decrypted_hashes, decrypted_segmented = self.hash_evidence_file(decrypted_file)
                     self.log_and_print(f"✅ 복호화된 파일 해시: {decrypted_hash}")
+                    if decrypted_hashes:
+                        self.log_and_print(f"   SHA-1: {decrypted_hashes['sha1']}")
+                        self.log_and_print(f"   MD5: {decrypted_hashes['md5']}")
                     
                 except PermissionError:
                     self.log_and_print("⚠️  복호화된 파일 읽기 권한이 없습니다.")
@@ -417,14 +3316,9 @@ class IntegratedDecryptionAndForensicsLogger:
             else:
                 self.log_and_print("⚠️  복호화된 파일이 아직 생성되지 않았습니다.")
             
-            self.log_and_print("복호화 스크립트 출력:")
-            for line in result.stdout.splitlines():
-                self.log_and_print(f"  {line}")
-            
+            # 스크립트 출력은 실행 중 실시간으로 기록됨
             if result.stderr:
-                self.log_and_print("경고/오류 메시지:")
-                for line in result.stderr.splitlines():
-                    self.log_and_print(f"  {line}")
+                self.log_and_print(f"경고/오류 메시지: {len(result.stderr.splitlines())}줄 (위 로그 참조)")
             
             self.metadata['decryption_process'] = {
                 'start_time': decryption_start.isoformat(),
@@ -433,14 +3327,24 @@ class IntegratedDecryptionAndForensicsLogger:
                 'return_code': result.returncode,
                 'stdout': result.stdout,
                 'stderr': result.stderr,
+                'progress': self.decryption_progress,
                 'original_file_hash': original_hash,
-                'decrypted_file_hash': decrypted_hash
+                'decrypted_file_hash': decrypted_hash,
+                'original_file_hashes': original_hashes,
+                'decrypted_file_hashes': decrypted_hashes,
+                'hash_mode': self.hash_mode,
+                'original_file_segmented_hash': original_segmented,
+                'original_file_guest_hashes': original_guest_hashes,
+                'decrypted_file_segmented_hash': decrypted_segmented,
+                'selective_paths': include_paths
             }
             
             # 복호화 성공 여부 확인
             if os.path.exists(decrypted_file) and os.path.getsize(decrypted_file) > 0:
                 self.log_and_print(f"✅ 복호화가 성공적으로 완료되었습니다! (소요시간: {decryption_duration:.1f}초)")
                 self.log_and_print(f"📁 생성된 파일: {decrypted_file} ({os.path.getsize(decrypted_file) / (1024**3):.1f}GB)")
+                if artifact_key and decrypted_hash:
+                    self.store_decryption_artifact(artifact_key, decrypted_file)
                 print("DEBUG: run_decryption 성공")
                 return True
             else:
@@ -453,14 +3357,18 @@ class IntegratedDecryptionAndForensicsLogger:
                 print("DEBUG: run_decryption 실패 - 결과 파일 없음")
                 return False
             
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as e:
             print("DEBUG: 복호화 타임아웃")
-            self.log_and_print("복호화 스크립트가 타임아웃되었습니다.")
+            self.log_and_print(f"복호화 스크립트가 타임아웃되었습니다. ({e.timeout}초 동안 진행 없음)")
+            if checkpoint:
+                self.log_and_print(f"💾 완료된 구간은 체크포인트에 기록되었습니다 ({checkpoint.path}) - 다시 실행하면 이어서 복호화합니다.")
             return False
         except subprocess.CalledProcessError as e:
             print(f"DEBUG: 복호화 실패: {e}")
             self.log_and_print(f"❌ 복호화 스크립트 실행 중 오류 발생:")
             self.log_and_print(f"   리턴 코드: {e.returncode}")
+            if checkpoint:
+                self.log_and_print(f"💾 완료된 구간은 체크포인트에 기록되었습니다 ({checkpoint.path}) - 다시 실행하면 이어서 복호화합니다.")
             
             if e.stdout:
                 self.log_and_print(f"   표준 출력: {e.stdout}")
@@ -482,22 +3390,545 @@ class IntegratedDecryptionAndForensicsLogger:
                 self.log_and_print("   - Node.js가 설치되지 않음")
                 self.log_and_print("   - PATH 설정 문제")
             
-            self.metadata['decryption_process'] = {
-                'start_time': decryption_start.isoformat(),
-                'end_time': datetime.now(timezone.utc).isoformat(),
-                'return_code': e.returncode,
-                'stdout': e.stdout,
-                'stderr': e.stderr,
-                'success': False
+            self.metadata['decryption_process'] = {
+                'start_time': decryption_start.isoformat(),
+                'end_time': datetime.now(timezone.utc).isoformat(),
+                'return_code': e.returncode,
+                'stdout': e.stdout,
+                'stderr': e.stderr,
+                'success': False
+            }
+            return False
+        
+        except FileNotFoundError:
+            print("DEBUG: Node.js 또는 파일 없음")
+            self.log_and_print("Node.js가 설치되어 있지 않거나 fbe-decrypt.mjs 파일을 찾을 수 없습니다.")
+            return False
+    
+    def plan_decryption_shards(self, image_path=DECRYPTER_INPUT_FILE):
+        """병렬/재개 가능 복호화용 블록 구간 계획 (사용할 수 없으면 None)"""
+        if self.decrypt_workers <= 1 and not self.resumable:
+            return None
+        if os.name != 'posix':
+            self.log_and_print("⚠️  구간 단위 복호화(병렬/재개)는 POSIX 환경에서만 지원됩니다 - 단일 프로세스로 진행합니다.")
+            return None
+        try:
+            with Qcow2Image(image_path) as image:
+                virtual_size = image.size
+        except (OSError, ValueError) as e:
+            self.log_and_print(f"⚠️  {image_path}의 qcow2 헤더를 읽을 수 없습니다 ({e}) - 단일 프로세스로 진행합니다.")
+            return None
+        block_count = (virtual_size + DECRYPT_BLOCK_SIZE - 1) // DECRYPT_BLOCK_SIZE
+        shard_blocks = max(self.shard_size // DECRYPT_BLOCK_SIZE, 1)
+        shards = plan_block_shards(block_count, shard_blocks)
+        self.log_and_print(f"🧩 {block_count:,}블록을 {len(shards)}개 구간으로 나눠 작업자 {min(max(self.decrypt_workers, 1), len(shards))}개로 처리")
+        return shards
+    
+    def decryption_input_digests(self, hash_mode, segment_size):
+        """복호화 입력 이미지 해시 (체크포인트 검증용, 해시 매니페스트 캐시 사용)"""
+        digests = {}
+        for input_file in (DECRYPTER_INPUT_FILE, DECRYPTER_KEY_FILE):
+            if hash_mode == 'segmented':
+                segmented = self.calculate_segmented_hash(input_file, segment_size)
+                digests[input_file] = segmented['root'] if segmented else None
+            else:
+                digests[input_file] = self.calculate_file_hash(input_file)
+        return digests
+    
+    def decryption_include_paths(self):
+        """선택적 복호화 대상 경로 패턴 (파티션 루트 기준, 전체 복호화면 None)"""
+        if not self.selective:
+            return None
+        include_paths = []
+        for info in self.get_app_categories().values():
+            if info["priority"] <= 2:  # find_database_files와 같은 고우선순위 앱
+                for app_pattern in info["apps"]:
+                    for app_root in SELECTIVE_DECRYPT_APP_ROOTS:
+                        for subdir in SELECTIVE_DECRYPT_SUBDIRS:
+                            # find_database_files처럼 패키지명 부분 일치
+                            include_paths.append(f"{app_root}/*{app_pattern}*/{subdir}")
+        return include_paths
+    
+    def open_decryption_checkpoint(self, output_path, shards):
+        """이전 체크포인트가 현재 입력과 맞으면 재개, 아니면 새 체크포인트 시작"""
+        if not shards or not self.resumable:
+            return None
+        block_count = shards[-1][1]
+        checkpoint = DecryptionCheckpoint(output_path)
+        try:
+            if checkpoint.load():
+                state = checkpoint.state
+                self.log_and_print(f"💾 복호화 체크포인트 발견: {checkpoint.path} (마지막 갱신: {state.get('updated_at')})")
+                # 체크포인트를 만들 때와 같은 방식으로 입력 이미지 해시를 계산해 비교
+                digests = self.decryption_input_digests(state.get('hash_mode'), state.get('segment_size'))
+                reason = checkpoint.mismatch(digests, block_count, DECRYPT_BLOCK_SIZE, self.decryption_include_paths())
+                if not reason:
+                    done = sum(1 for shard in shards if checkpoint.covers(shard))
+                    self.log_and_print(f"✅ 입력 이미지 변경 없음 - 완료된 {done}/{len(shards)}개 구간 이후부터 이어서 복호화합니다.")
+                    return checkpoint
+                self.log_and_print(f"⚠️  체크포인트를 사용할 수 없습니다 ({reason}) - 처음부터 복호화합니다.")
+            digests = self.decryption_input_digests(self.hash_mode, self.segment_size)
+            checkpoint.start(digests, self.hash_mode, self.segment_size, block_count, DECRYPT_BLOCK_SIZE,
+                             self.decryption_include_paths())
+            return checkpoint
+        except OSError as e:
+            self.log_and_print(f"⚠️  복호화 체크포인트 사용 불가 ({e}) - 재개 없이 진행합니다.")
+            return None
+    
+    def decryption_artifact_key(self):
+        """복호화 결과 저장소 키 - 입력 이미지 해시 + fbe-decrypt.mjs 해시 (계산할 수 없으면 None)"""
+        if not self.artifact_store:
+            return None
+        try:
+            digests = self.decryption_input_digests(self.hash_mode, self.segment_size)
+            if not all(digests.values()):
+                return None
+            with open('fbe-decrypt.mjs', 'rb') as f:
+                decrypter_digest = hashlib.sha256(f.read()).hexdigest()
+        except OSError as e:
+            self.log_and_print(f"⚠️  복호화 결과 저장소 키 계산 실패: {e}")
+            return None
+        return DecryptionArtifactStore.artifact_key(digests, decrypter_digest, self.hash_mode, self.segment_size,
+                                                    self.decryption_include_paths())
+    
+    def reuse_decryption_artifact(self, artifact_key, output_path):
+        """저장소에 같은 입력의 복호화 결과가 있으면 output_path로 연결하고 메타데이터 복원"""
+        entry = self.artifact_store.lookup(artifact_key)
+        if not entry:
+            self.log_and_print(f"복호화 결과 저장소에 항목 없음 ({artifact_key[:16]}...) - 복호화를 진행합니다.")
+            return False
+        process = entry['decryption_process']
+        try:
+            verified = self.verify_decryption_artifact(self.artifact_store.entry_path(artifact_key, ARTIFACT_IMAGE_NAME), entry)
+        except OSError as e:
+            verified = f"이미지 검증 실패: {e}"
+        if isinstance(verified, str):
+            self.log_and_print(f"⚠️  저장된 복호화 결과를 사용할 수 없습니다 ({verified}) - 복호화를 진행합니다.")
+            return False
+        hashes, extra = verified
+        try:
+            method = self.artifact_store.materialize(artifact_key, output_path)
+        except OSError as e:
+            self.log_and_print(f"⚠️  저장된 복호화 결과 연결 실패 ({e}) - 복호화를 진행합니다.")
+            return False
+        
+        # 방금 검증한 해시를 매니페스트에 등록해 이후 단계에서 다시 읽지 않도록 함
+        try:
+            self.hash_manifest.store(output_path, HashManifest.file_key(output_path), hashes, **extra)
+        except OSError as e:
+            self.log_and_print(f"⚠️  해시 매니페스트 저장 실패: {e}")
+        
+        self.metadata['decryption_process'] = {
+            **process,
+            'artifact_cache': {
+                'hit': True,
+                'key': artifact_key,
+                'method': method,
+                # 재사용 전 검증 방식: 이미지 재해시 또는 (device, inode, size, mtime_ns) 비교
+                'verification': 'rehash' if self.verify_artifact or not entry.get('image_file_key') else 'file_key',
+                'stored_at': entry.get('stored_at'),
+                'reused_at': datetime.now(timezone.utc).isoformat()
+            }
+        }
+        self.log_and_print(f"♻️  동일한 입력의 복호화 결과를 재사용합니다 ({method}, 저장 시각: {entry.get('stored_at')})")
+        self.log_and_print(f"✅ 복호화된 파일 해시: {process.get('decrypted_file_hash')}")
+        self.log_and_print(f"📁 {output_path} ({os.path.getsize(output_path) / (1024**3):.1f}GB) - 복호화를 건너뛰고 포렌식 분석으로 진행합니다.")
+        return True
+    
+    def verify_decryption_artifact(self, image_path, entry):
+        """저장소 이미지가 저장 당시와 같은지 확인 - 다르면 이유 문자열, 같으면 (해시, 매니페스트 추가 항목)
+        
+        (device, inode, size, mtime_ns)가 저장 시 기록과 같으면 저장된 해시를 그대로 사용.
+        verify_artifact가 켜져 있거나 식별 키가 없는 예전 항목이면 해시 캐시를 거치지 않고 이미지를 다시 해시해 비교
+        """
+        process = entry['decryption_process']
+        segmented = process.get('decrypted_file_segmented_hash')
+        stored_hashes = process.get('decrypted_file_hashes')
+        stored_key = entry.get('image_file_key')
+        if stored_key and HashManifest.file_key(image_path) != stored_key:
+            return "저장 이후 이미지 파일이 변경됨 (device/inode/size/mtime 불일치)"
+        if stored_key and not self.verify_artifact:
+            if not segmented and not stored_hashes:
+                return "저장된 해시 없음"
+            return stored_hashes or {}, {'segmented': segmented} if segmented else {}
+        
+        self.log_and_print(f"🔍 저장된 복호화 결과 해시 재검증 중: {image_path}")
+        if segmented:
+            result = hash_file_segmented(image_path, segmented['segment_size'], self.hash_workers or os.cpu_count())
+            if result['root'] != segmented['root']:
+                return f"Merkle 루트 불일치 ({result['root'][:16]}... != {segmented['root'][:16]}...)"
+            return {}, {'segmented': result}
+        if not stored_hashes:
+            return "저장된 해시 없음"
+        hashes = MultiDigestHasher.hash_file(image_path)
+        mismatched = [name for name in HASH_ALGORITHMS if hashes.get(name) != stored_hashes.get(name)]
+        if mismatched:
+            return f"{'/'.join(name.upper() for name in mismatched)} 해시 불일치"
+        return hashes, {}
+    
+    def store_decryption_artifact(self, artifact_key, output_path):
+        """복호화 결과와 메타데이터를 저장소에 보관"""
+        try:
+            method = self.artifact_store.store(artifact_key, output_path, {
+                'key': artifact_key,
+                'stored_at': datetime.now(timezone.utc).isoformat(),
+                'decryption_process': self.metadata['decryption_process']
+            })
+        except OSError as e:
+            self.log_and_print(f"⚠️  복호화 결과 저장소 기록 실패: {e}")
+            return
+        if method:
+            self.metadata['decryption_process']['artifact_cache'] = {'hit': False, 'key': artifact_key, 'method': method}
+            self.log_and_print(f"💾 복호화 결과를 저장소에 보관했습니다 ({method}): {self.artifact_store.entry_path(artifact_key)}")
+    
+    def _run_decrypter(self, command, output_path, stall_timeout=DECRYPTION_STALL_TIMEOUT, shards=None, checkpoint=None):
+        """복호화 스크립트 실행 - 출력을 실시간으로 읽어 진행 이벤트로 기록
+        
+        전체 실행 시간 제한 대신 stall_timeout초 동안 출력이 없을 때만 중단.
+        POSIX에서는 출력 파일이 쓰이는 동안 함께 해시 계산.
+        shards가 주어지면 블록 구간을 여러 작업자 프로세스에 나눠 맡기고,
+        실패한 작업자의 남은 구간은 새 작업자로 재시도 (shard_retries회까지).
+        작업자가 둘 이상이면 키 유도와 파일 시스템 탐색은 계획 프로세스가 한 번만 하고,
+        구간 작업자는 저장된 계획(--load-plan)으로 자기 구간만 씀
+        checkpoint가 주어지면 이미 완료된 구간은 건너뛰고, 새로 완료된 구간을 기록
+        """
+        segment_size = self.segment_size if self.hash_mode == 'segmented' else None
+        tail_hasher = DecryptionTailHasher(output_path, segment_size) if os.name == 'posix' else None
+        max_retries = self.shard_retries if shards else 0
+        
+        completed_shards = set()
+        selection = None
+        if shards and checkpoint:
+            completed_shards = {shard for shard in shards if checkpoint.covers(shard)}
+        if not completed_shards and os.path.lexists(output_path):
+            # 이전 결과가 저장소 이미지와 하드링크로 공유될 수 있으므로 덮어쓰지 않고 새 파일로 생성
+            os.remove(output_path)
+        if shards:
+            if not completed_shards:
+                # 각 작업자는 자기 구간만 덮어쓰므로 출력 파일을 미리 전체 크기로 생성 (희소 파일)
+                with open(output_path, 'wb') as f:
+                    f.truncate(shards[-1][1] * DECRYPT_BLOCK_SIZE)
+            pending = [shard for shard in shards if shard not in completed_shards]
+            worker_count = min(max(self.decrypt_workers, 1), len(pending))
+            assignments = [pending[k::worker_count] for k in range(worker_count)]
+            planned_blocks = sum(end - start for start, end in shards)
+        else:
+            assignments = [None]
+            planned_blocks = None
+        
+        event_queue = queue.Queue()
+        tracker = DecryptionProgressTracker()
+        output = {'stdout': [], 'stderr': []}
+        workers = {}
+        attempts = collections.Counter()
+        completed_blocks = sum(end - start for start, end in completed_shards)
+        hashed_shard_index = 0
+        worker_ids = iter(range(1, sys.maxsize))
+        last_report = 0
+        plan_path = None
+        plan_attempts = 0
+        if shards and len(assignments) > 1:
+            # 계획 파일에는 복호화 키가 들어가므로 소유자만 읽을 수 있게 생성 (mkstemp는 0600)
+            fd, plan_path = tempfile.mkstemp(prefix='fbe-plan-', dir=os.path.dirname(os.path.abspath(output_path)))
+            os.close(fd)
+        
+        def launch(worker_shards, planner=False):
+            worker_id = next(worker_ids)
+            extra_args = ['--save-plan', plan_path] if planner else ['--load-plan', plan_path] if plan_path else []
+            workers[worker_id] = self._launch_decrypt_worker(command, output_path, worker_shards, event_queue, worker_id, extra_args)
+            workers[worker_id]['planner'] = planner
+        
+        if tail_hasher:
+            tail_hasher.start()
+            # 이전 실행에서 완료된 앞부분은 바로 해시 가능
+            while shards and hashed_shard_index < len(shards) and shards[hashed_shard_index] in completed_shards:
+                hashed_shard_index += 1
+            if hashed_shard_index:
+                tail_hasher.advance(shards[hashed_shard_index - 1][1] * DECRYPT_BLOCK_SIZE)
+        try:
+            if plan_path:
+                launch(None, planner=True)
+            else:
+                for worker_shards in assignments:
+                    launch(worker_shards)
+            
+            while workers:
+                try:
+                    (worker_id, name), line = event_queue.get(timeout=1)
+                except queue.Empty:
+                    worker_id = None
+                now = time.time()
+                # 활동 시각은 작업자 자신의 stdout/stderr/진행 보고로만 갱신
+                if worker_id is not None:
+                    workers[worker_id]['last_activity'] = now
+                # 다른 작업자가 계속 출력하더라도 멈춘 작업자는 매 반복마다 확인해 중단
+                if stall_timeout:
+                    for stalled_id, stalled_worker in workers.items():
+                        if not stalled_worker['stalled'] and now - stalled_worker['last_activity'] > stall_timeout:
+                            label = f"복호화 작업자 {stalled_id}" if shards else "복호화"
+                            self.log_and_print(f"⏰ {label} 진행이 {stall_timeout}초 동안 멈춰 프로세스를 중단합니다.")
+                            stalled_worker['stalled'] = True
+                            stalled_worker['process'].kill()
+                if worker_id is None:
+                    continue
+                
+                worker = workers[worker_id]
+                if line is None:
+                    worker['open_streams'] -= 1
+                    if worker['open_streams']:
+                        continue
+                    # 작업자 종료 - 실패했으면 남은 구간 재시도
+                    process = workers.pop(worker_id)['process']
+                    process.wait()
+                    if process.returncode == 0 and not worker['stalled']:
+                        if worker['planner']:
+                            # 탐색 결과를 받은 구간 작업자들이 쓰기 단계만 병렬로 수행
+                            for worker_shards in assignments:
+                                launch(worker_shards)
+                        continue
+                    if worker['planner']:
+                        plan_attempts += 1
+                        retry_count = plan_attempts
+                        remaining = None
+                    else:
+                        remaining = [shard for shard in worker['shards'] or [None] if shard not in completed_shards]
+                        if not remaining:
+                            continue
+                        attempts.update(remaining)
+                        retry_count = max(attempts[shard] for shard in remaining)
+                    if retry_count > max_retries:
+                        stdout = '\n'.join(output['stdout'])
+                        stderr = '\n'.join(output['stderr'])
+                        if worker['stalled']:
+                            raise subprocess.TimeoutExpired(process.args, stall_timeout, output=stdout, stderr=stderr)
+                        raise subprocess.CalledProcessError(process.returncode, process.args, output=stdout, stderr=stderr)
+                    retrying = "파일 시스템 탐색 재시도" if worker['planner'] else f"남은 {len(remaining)}개 구간 재시도"
+                    self.log_and_print(f"🔁 작업자 {worker_id} 실패 (리턴 코드 {process.returncode}) - {retrying} ({retry_count}/{max_retries})")
+                    launch(remaining, planner=worker['planner'])
+                    continue
+                
+                if name == 'progress':
+                    fields = line.split()
+                    progress = None
+                    if fields[0] == 'written' and tail_hasher:
+                        tail_hasher.advance(int(fields[1]) * int(fields[3]))
+                    elif fields[0] == 'done' and tail_hasher and not shards:
+                        tail_hasher.finish(int(fields[1]) * int(fields[2]))
+                    elif fields[0] == 'planned':
+                        self.log_and_print(f"🗺️  파일 시스템 탐색 완료 (1회) - 파일 블록 {int(fields[1]):,}개, 메타데이터 버퍼 {int(fields[2]):,}개를 "
+                                           f"구간 작업자 {len(assignments)}개에 전달")
+                        continue
+                    elif fields[0] == 'selected':
+                        # 작업자마다 같은 선택 결과를 보고하므로 한 번만 기록
+                        if not selection:
+                            selection = {'inodes': int(fields[1]), 'skipped_blocks': int(fields[2]), 'total_blocks': int(fields[3])}
+                            self.log_and_print(f"🎯 선택된 아이노드 {int(fields[1]):,}개 - 전체 {int(fields[3]):,}블록 중 {int(fields[2]):,}블록은 복호화/기록 생략")
+                        continue
+                    elif fields[0] == 'range-done':
+                        shard = (int(fields[1]), int(fields[2]))
+                        if shard in completed_shards:
+                            continue
+                        completed_shards.add(shard)
+                        if checkpoint:
+                            try:
+                                checkpoint.mark_completed(shard)
+                            except OSError as e:
+                                self.log_and_print(f"⚠️  복호화 체크포인트 저장 실패 ({e}) - 이후 구간은 재개 정보 없이 진행합니다.")
+                                checkpoint = None
+                        worker['completed_blocks'] += shard[1] - shard[0]
+                        worker['blocks'] = max(worker['blocks'], worker['completed_blocks'])
+                        completed_blocks += shard[1] - shard[0]
+                        progress = ('blocks', worker['blocks'], planned_blocks)
+                        # 앞에서부터 연속으로 완료된 구간까지는 해시 가능
+                        while hashed_shard_index < len(shards) and shards[hashed_shard_index] in completed_shards:
+                            hashed_shard_index += 1
+                        if tail_hasher and hashed_shard_index:
+                            tail_hasher.advance(shards[hashed_shard_index - 1][1] * int(fields[3]))
+                    if not progress:
+                        continue
+                else:
+                    line = ANSI_ESCAPE_PATTERN.sub('', line).strip()
+                    if not line:
+                        continue
+                    progress = tracker.parse(line) if name == 'stdout' else None
+                
+                if progress:
+                    unit, done, total = progress
+                    worker[unit] = done
+                    if shards and unit == 'blocks':
+                        # 작업자별로 쓴 블록 수를 합산 (이전 시도에서 끝난 구간 포함)
+                        done = completed_blocks + sum(w['blocks'] - w['completed_blocks'] for w in workers.values())
+                        total = planned_blocks
+                    elif unit == 'inodes':
+                        # 모든 작업자가 같은 아이노드를 훑으므로 가장 느린 작업자 기준
+                        done = min(w['inodes'] for w in workers.values() if 'inodes' in w)
+                    event = tracker.update(unit, done, total, now)
+                    # 진행 줄은 간격을 두고 요약 기록 (마지막 줄은 항상 기록)
+                    if now - last_report >= PROGRESS_LOG_INTERVAL or event['done'] >= event['total']:
+                        last_report = now
+                        self.log_and_print(self._format_progress_event(event))
+                    continue
+                if name == 'stdout' and tracker.feed(line, now):
+                    continue
+                
+                output[name].append(line)
+                prefix = f"[{worker_id}] " if shards else ""
+                self.log_and_print(f"  {prefix}{line}" if name == 'stdout' else f"  [stderr] {prefix}{line}")
+            
+            if shards and tail_hasher:
+                tail_hasher.finish(shards[-1][1] * DECRYPT_BLOCK_SIZE)
+        finally:
+            for worker in workers.values():
+                if worker['process'].poll() is None:
+                    worker['process'].kill()
+                    worker['process'].wait()
+            if tail_hasher:
+                # 완료 보고가 없었으면 해시 계산 중단 (이미 완료 보고를 받았으면 끝까지 계산)
+                tail_hasher.abort()
+            if plan_path and os.path.exists(plan_path):
+                # 계획 파일에는 복호화 키가 들어 있으므로 성공/실패와 관계없이 삭제
+                os.remove(plan_path)
+                tail_hasher.join()
+        
+        self.decryption_progress = tracker.summary()
+        if shards:
+            self.decryption_progress['shards'] = {
+                'count': len(shards),
+                'workers': len(assignments),
+                'resumed': len(shards) - len(pending),
+                'retried': sum(1 for count in attempts.values() if count),
+                'planned': bool(plan_path)
             }
-            return False
+        if selection:
+            self.decryption_progress['selection'] = selection
+        stdout = '\n'.join(output['stdout'])
+        stderr = '\n'.join(output['stderr'])
+        return subprocess.CompletedProcess(command, 0, stdout, stderr), tail_hasher
+    
+    def _launch_decrypt_worker(self, command, output_path, worker_shards, event_queue, worker_id, extra_args=()):
+        """복호화 작업자 프로세스 시작 (worker_shards가 None이면 전체 이미지를 한 프로세스가 처리)
         
-        except FileNotFoundError:
-            print("DEBUG: Node.js 또는 파일 없음")
-            self.log_and_print("Node.js가 설치되어 있지 않거나 fbe-decrypt.mjs 파일을 찾을 수 없습니다.")
-            return False
+        extra_args는 복호화 명령 뒤에 그대로 붙임 (--save-plan / --load-plan)
+        
+        출력 줄과 진행 보고는 ((worker_id, 스트림 이름), 줄) 형태로 event_queue에 전달
+        """
+        pass_fds = ()
+        command = command + ['--output', output_path] + list(extra_args)
+        if worker_shards:
+            for start, end in worker_shards:
+                command += ['--block-range', f'{start}:{end}']
+        if os.name == 'posix':
+            read_fd, write_fd = os.pipe()
+            command = command + ['--progress-fd', str(write_fd)]
+            pass_fds = (write_fd,)
+        
+        try:
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors='replace',
+                pass_fds=pass_fds
+            )
+        except Exception:
+            if pass_fds:
+                os.close(read_fd)
+                os.close(write_fd)
+            raise
+        
+        streams = [(process.stdout, 'stdout'), (process.stderr, 'stderr')]
+        if pass_fds:
+            # 자식 프로세스만 쓰기 끝을 갖도록 닫아야 종료 시 EOF가 전달됨
+            os.close(write_fd)
+            streams.append((os.fdopen(read_fd, 'r', encoding='ascii', errors='replace'), 'progress'))
+        for stream, name in streams:
+            threading.Thread(target=_pump_lines, args=(stream, (worker_id, name), event_queue), daemon=True).start()
+        
+        return {
+            'process': process,
+            'shards': worker_shards,
+            'open_streams': len(streams),
+            'last_activity': time.time(),
+            'stalled': False,
+            'blocks': 0,
+            'completed_blocks': 0
+        }
+    
+    @staticmethod
+    def _format_progress_event(event):
+        """진행 이벤트를 로그 한 줄로 변환"""
+        unit = '아이노드' if event['unit'] == 'inodes' else '블록'
+        message = f"  ⏳ {unit} {event['done']:,}/{event['total']:,} ({event['percent']:.1f}%) - {event['rate_per_second']:,.0f} {unit}/s"
+        if event['eta_seconds'] is not None:
+            message += f", 남은 시간 약 {event['eta_seconds'] / 60:.1f}분"
+        return message
+    
+    def _record_tail_hashes(self, tail_hasher, output_path):
+        """복호화 중 계산된 해시가 완전하면 해시 매니페스트에 저장"""
+        if not tail_hasher:
+            return
+        if tail_hasher.error or not tail_hasher.completed:
+            self.log_and_print(f"⚠️  복호화 중 해시 계산 미완료 - 복호화 후 다시 계산합니다: {tail_hasher.error or '진행 보고 없음'}")
+            return
+        try:
+            file_key = HashManifest.file_key(output_path)
+            file_size = os.path.getsize(output_path)
+            if file_size != tail_hasher.hashed_bytes:
+                self.log_and_print(f"⚠️  복호화 중 해시 범위 불일치 ({tail_hasher.hashed_bytes} != {file_size}) - 다시 계산합니다")
+                return
+            extra = {}
+            if tail_hasher.segments is not None:
+                extra['segmented'] = segmented_hash_record(tail_hasher.segments, self.segment_size, file_size)
+            self.hash_manifest.store(output_path, file_key, tail_hasher.hashes, **extra)
+            self.log_and_print("✅ 복호화 중 출력 파일 해시 계산 완료 (추가 읽기 없음)")
+        except OSError as e:
+            self.log_and_print(f"⚠️  복호화 중 계산된 해시 저장 실패: {e}")
     
     # 포렌식 분석 관련 메서드들
+    def open_image_filesystem(self, img_path):
+        """복호화 이미지를 사용자 공간 ext4 리더로 열기 (실패 시 마운트 방식으로 대체)"""
+        if self.image_fs:
+            return True
+        try:
+            image_fs = Ext4Image(img_path)
+        except (OSError, ValueError, struct.error) as e:
+            self.log_and_print(f"⚠️  이미지 직접 읽기 불가 ({e}) - 마운트 방식으로 분석합니다.")
+            return False
+        if not image_fs.exists("/data"):
+            image_fs.close()
+            self.log_and_print("⚠️  이미지에서 /data/data 디렉토리를 찾을 수 없음 - 마운트 방식으로 분석합니다.")
+            return False
+        self.image_fs = image_fs
+        self.log_and_print(f"✅ 사용자 공간 ext4 리더로 이미지 열기 완료 (블록 크기 {image_fs.block_size}B, 마운트/sudo 불필요)")
+        return True
+    
+    def start_privileged_helper(self):
+        """특권 헬퍼 실행 - 이후 ls/stat/cp/mount를 파이프 요청으로 처리 (실패하면 요청마다 sudo 실행)"""
+        if self.privileged_helper or not self.use_privileged_helper:
+            return self.privileged_helper is not None
+        helper = PrivilegedHelper(use_sudo=os.geteuid() != 0)
+        try:
+            info = helper.start()
+        except (OSError, ValueError) as e:
+            self.log_and_print(f"⚠️  특권 헬퍼 실행 실패 ({e}) - 작업마다 sudo를 실행합니다.")
+            return False
+        self.privileged_helper = helper
+        self.log_and_print(f"🔐 특권 헬퍼 실행 (PID {info['pid']}, euid {info['euid']}) - 이후 sudo 호출 없이 처리합니다.")
+        return True
+    
+    def stop_privileged_helper(self):
+        if self.privileged_helper:
+            requests = self.privileged_helper.requests
+            self.privileged_helper.close()
+            self.privileged_helper = None
+            self.log_and_print(f"[+] 특권 헬퍼 종료 (처리한 요청 {requests}회)")
+    
+    def _privileged_umount(self, mount_point, timeout=None):
+        if self.privileged_helper:
+            return self.privileged_helper.umount(mount_point)
+        return subprocess.run(["sudo", "umount", mount_point], stderr=subprocess.DEVNULL, timeout=timeout)
+    
     def mount_img(self, img_path, mount_point):
         """이미지 파일 마운트"""
         if not os.path.isfile(img_path):
@@ -515,7 +3946,7 @@ class IntegratedDecryptionAndForensicsLogger:
         
         # 기존 마운트 해제 시도
         try:
-            subprocess.run(["sudo", "umount", mount_point], stderr=subprocess.DEVNULL, timeout=10)
+            self._privileged_umount(mount_point, timeout=10)
             self.log_and_print("✅ 기존 마운트 해제 완료")
         except subprocess.TimeoutExpired:
             self.log_and_print("⚠️  기존 마운트 해제 타임아웃 (무시하고 진행)")
@@ -548,10 +3979,13 @@ class IntegratedDecryptionAndForensicsLogger:
             self.log_and_print(f"🔄 마운트 시도 {i}/{len(mount_options)}: mount {' '.join(options)} {img_path} {mount_point}")
             
             try:
-                result = subprocess.run(
-                    ["sudo", "mount"] + options + [img_path, mount_point],
-                    capture_output=True, text=True, timeout=30
-                )
+                if self.privileged_helper:
+                    result = self.privileged_helper.mount(img_path, mount_point, options)
+                else:
+                    result = subprocess.run(
+                        ["sudo", "mount"] + options + [img_path, mount_point],
+                        capture_output=True, text=True, timeout=30
+                    )
                 
                 if result.returncode == 0:
                     self.log_and_print(f"✅ 마운트 성공! 옵션: {' '.join(options)}")
@@ -599,9 +4033,220 @@ class IntegratedDecryptionAndForensicsLogger:
     
     def umount_img(self, mount_point):
         """이미지 파일 언마운트"""
-        subprocess.run(["sudo", "umount", mount_point], stderr=subprocess.DEVNULL)
+        try:
+            self._privileged_umount(mount_point)
+        except OSError as e:
+            self.log_and_print(f"⚠️  마운트 해제 실패: {e}")
         self.log_and_print(f"[+] 마운트 해제: {mount_point}")
     
+    def _working_copy_dir(self, size_bytes):
+        """작업 복사본을 둘 디렉토리 - 공간이 충분하면 tmpfs, 아니면 임시 디렉토리"""
+        try:
+            vfs = os.statvfs(TMPFS_DIR)
+            if vfs.f_bavail * vfs.f_frsize > size_bytes * 2:
+                return TMPFS_DIR
+        except (OSError, AttributeError):
+            pass
+        return self.temp_dir or tempfile.gettempdir()
+    
+    def open_image_database(self, db_path):
+        """이미지 안의 DB를 복사 없이 연결 - 작은 파일은 메모리로 deserialize, 큰 파일은 tmpfs에 추출
+        
+        (연결, 추출한 임시 파일 경로 또는 None, 페이지를 직접 읽을 파일 경로 또는 메모리 버퍼) 반환
+        """
+        db_name = os.path.basename(db_path)
+        size_bytes = self.image_fs.stat(db_path).size
+        extract_start = time.time()
+        
+        if size_bytes <= INMEMORY_DB_MAX_SIZE and hasattr(sqlite3.Connection, 'deserialize'):
+            data = bytearray(size_bytes)
+            with self.image_fs.open(db_path) as f:
+                f.readinto(data)
+            # WAL 모드 헤더(18, 19번 바이트 = 2)는 메모리 DB에서 열 수 없으므로 복사본만 롤백 저널 모드로 표시
+            if data[:16] == b'SQLite format 3\0' and data[18:20] == b'\x02\x02':
+                data[18:20] = b'\x01\x01'
+            conn = sqlite3.connect(':memory:')
+            conn.deserialize(data)
+            self.log_and_print(f"    🧠 DB 메모리 추출: {db_name} ({size_bytes / (1024 * 1024):.2f} MB, {time.time() - extract_start:.2f}초)")
+            return conn, None, data
+        
+        extract_dir = self._working_copy_dir(size_bytes)
+        fd, temp_db_path = tempfile.mkstemp(prefix="forensics_", suffix="_" + db_name, dir=extract_dir)
+        os.close(fd)
+        try:
+            self.image_fs.copy_file(db_path, temp_db_path)
+            conn = sqlite3.connect(temp_db_path)
+        except Exception:
+            self._remove_database_copy(temp_db_path)
+            raise
+        self.log_and_print(f"    📋 DB {'tmpfs' if extract_dir == TMPFS_DIR else '임시 파일'} 추출: {db_name} ({size_bytes / (1024 * 1024):.2f} MB, {time.time() - extract_start:.2f}초)")
+        return conn, temp_db_path, temp_db_path
+    
+    def _wal_pending(self, db_path):
+        """재생해야 할 -wal 파일이 있는지 (비어 있지 않은 WAL)"""
+        db_info = self.database_index.get(db_path)
+        if db_info is not None:
+            return db_info["siblings"].get('-wal', 0) > 0
+        try:
+            if self.image_fs:
+                return self.image_fs.stat(db_path + '-wal').size > 0
+            return os.path.getsize(db_path + '-wal') > 0
+        except OSError:
+            return False
+    
+    def _source_state(self, db_path):
+        """원본 db/-wal/-shm 상태 {접미사: (크기, 수정 시각)} - 없는 파일은 빠짐, 확인할 수 없으면 빈 dict"""
+        state = {}
+        for suffix in ('', '-wal', '-shm'):
+            path = db_path + suffix
+            try:
+                if self.image_fs:
+                    # 이미지는 바뀌지 않으므로 크기만 비교
+                    state[suffix] = (self.image_fs.stat(path).size, None)
+                elif self.privileged_helper and not os.access(path, os.R_OK):
+                    st = self.privileged_helper.stat(path)
+                    state[suffix] = (st['size'], st['mtime'])
+                else:
+                    st = os.stat(path)
+                    state[suffix] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+        return state
+    
+    def _capture_file(self, src_path, dst_path):
+        """원본 파일 하나를 지정한 경로로 복사 (이미지 → 직접 읽기 → 특권 헬퍼 → sudo 순) → 크기"""
+        if self.image_fs:
+            return self.image_fs.copy_file(src_path, dst_path)
+        if os.access(src_path, os.R_OK):
+            shutil.copyfile(src_path, dst_path)
+        elif self.privileged_helper:
+            return self.privileged_helper.copy(src_path, dst_path)
+        else:
+            subprocess.run(["sudo", "cp", "--sparse=always", src_path, dst_path], capture_output=True, check=True, timeout=60)
+            subprocess.run(["sudo", "chmod", "644", dst_path], capture_output=True, check=True, timeout=10)
+        return os.path.getsize(dst_path)
+    
+    def snapshot_database(self, db_path):
+        """db/-wal/-shm를 한 세트로 캡처해 개인 작업 복사본에 체크포인트 → 작업 복사본 경로
+        
+        복사 전후의 원본 상태가 같아야 일관된 세트로 보고, 바뀌었으면 다시 캡처함.
+        WAL 프레임을 직접 검증해 반영된 프레임과 SQLite 체크포인트 결과를 self.wal_snapshots에 기록
+        """
+        db_name = os.path.basename(db_path)
+        snapshot_start = time.time()
+        state = self._source_state(db_path)
+        fd, working_path = tempfile.mkstemp(prefix="forensics_", suffix="_" + db_name,
+                                            dir=self._working_copy_dir(sum(size for size, _ in state.values())))
+        os.close(fd)
+        try:
+            for attempt in range(1, WAL_SNAPSHOT_RETRIES + 1):
+                self._remove_database_copy(working_path, siblings_only=True)
+                captured = {}
+                # 상태를 확인할 수 없으면 (sudo 복사) 세 파일을 모두 시도
+                for suffix in (state or {'': None, '-wal': None, '-shm': None}):
+                    try:
+                        captured[suffix] = self._capture_file(db_path + suffix, working_path + suffix)
+                    except (OSError, subprocess.SubprocessError):
+                        if not suffix:
+                            raise
+                after = self._source_state(db_path)
+                if not state or after == state:
+                    break
+                self.log_and_print(f"      ⚠️  캡처 중 원본 변경 감지 - 다시 캡처 ({attempt}/{WAL_SNAPSHOT_RETRIES})")
+                state = after
+            
+            record = {
+                "source": db_path,
+                "captured_at": datetime.now(timezone.utc).isoformat(),
+                "consistent": (after == state) if state else None,
+                "attempts": attempt,
+                "members": {db_name + suffix: {"size": size, "sha256": MultiDigestHasher.hash_file(working_path + suffix, ('sha256',))['sha256']}
+                            for suffix, size in captured.items()},
+                "wal": parse_wal_frames(working_path + '-wal') if '-wal' in captured else None
+            }
+            # 캡처한 -shm은 기록만 하고 버림 - SQLite가 WAL에서 인덱스를 다시 만들어야 위에서 검증한 기준과 같게 재생됨
+            self._remove_database_copy(working_path + '-shm')
+            
+            conn = sqlite3.connect(working_path)
+            try:
+                busy, log_frames, checkpointed_frames = conn.execute("PRAGMA wal_checkpoint(FULL)").fetchone()
+                # 작업 복사본을 롤백 저널 모드로 바꿔 (-wal 삭제) 이후 immutable로 열 수 있게 함
+                conn.execute("PRAGMA journal_mode=DELETE").fetchone()
+            finally:
+                conn.close()
+        except Exception:
+            self._remove_database_copy(working_path)
+            raise
+        
+        record["checkpoint"] = {"busy": busy, "log_frames": log_frames, "checkpointed_frames": checkpointed_frames}
+        self.wal_snapshots[db_path] = record
+        
+        wal = record["wal"]
+        if wal:
+            self.log_and_print(f"    🧾 WAL 스냅샷: {db_name} - 프레임 {wal['applied_frames']}/{wal['total_frames']}개 반영 "
+                               f"(커밋 {len(wal['commit_frames'])}개, 페이지 {wal['applied_pages']}개, 무시 {wal['ignored_frames']}개, {time.time() - snapshot_start:.2f}초)")
+            if log_frames >= 0 and log_frames != wal['applied_frames']:
+                self.log_and_print(f"      ⚠️  SQLite 체크포인트 프레임 수({log_frames})가 검증 결과({wal['applied_frames']})와 다름")
+        if record["consistent"] is False:
+            self.log_and_print(f"      ⚠️  {WAL_SNAPSHOT_RETRIES}회 캡처 동안 원본이 계속 바뀜 - 마지막 캡처로 분석")
+        return working_path
+    
+    @staticmethod
+    def _remove_database_copy(temp_db_path, siblings_only=False):
+        """추출/복사한 DB와 SQLite가 옆에 만든 -wal/-journal/-shm 정리"""
+        for suffix in SQLITE_SIBLING_SUFFIXES if siblings_only else ('',) + SQLITE_SIBLING_SUFFIXES:
+            try:
+                os.remove(temp_db_path + suffix)
+            except OSError:
+                pass
+    
+    def tune_connection(self, conn, size_bytes):
+        """연결에 튜닝 프로필 적용 → 프로필 이름"""
+        profile = self.sqlite_profile
+        if profile == 'auto':
+            profile = 'large_scan' if size_bytes >= SQLITE_LARGE_DB_SIZE else 'default'
+        for pragma, value in SQLITE_TUNING_PROFILES[profile].items():
+            conn.execute(f"PRAGMA {pragma} = {int(value)}")
+        return profile
+    
+    def open_database_for_analysis(self, db_path):
+        """분석용 DB 연결 - 증거 파일은 절대 쓰지 않음
+        
+        1. WAL 재생이 필요하면: db/-wal/-shm 세트를 캡처해 체크포인트한 개인 복사본 (snapshot_database)
+        2. 이미지 리더: 메모리(deserialize)/tmpfs 추출
+        3. 호스트에서 읽을 수 있는 파일 (읽기 전용 마운트, root 실행 등): 복사 없이 immutable URI로 열기
+        4. 그 외: 특권 헬퍼/sudo로 임시 디렉토리에 복사
+        (연결, 정리할 임시 복사본 경로 또는 None, SQLitePageFile로 읽을 원본) 반환, 복사 실패면 (None, None, None)
+        """
+        db_name = os.path.basename(db_path)
+        if self._wal_pending(db_path):
+            copied_db = self.snapshot_database(db_path)
+            conn = sqlite3.connect(Path(copied_db).as_uri() + '?mode=ro&immutable=1', uri=True)
+            page_source = copied_db
+            size_bytes = os.path.getsize(copied_db)
+        elif self.image_fs:
+            conn, copied_db, page_source = self.open_image_database(db_path)
+            size_bytes = self.image_fs.stat(db_path).size
+        elif os.access(db_path, os.R_OK):
+            # immutable=1: 잠금/저널 파일을 만들지 않고 파일이 바뀌지 않는다고 가정 → 증거 디렉토리에 아무것도 쓰지 않음
+            conn = sqlite3.connect(Path(os.path.abspath(db_path)).as_uri() + '?mode=ro&immutable=1', uri=True)
+            copied_db = None
+            page_source = db_path
+            size_bytes = os.path.getsize(db_path)
+            self.log_and_print(f"    ⚡ 복사 없이 읽기 전용으로 열기 (immutable): {db_name} ({size_bytes / (1024 * 1024):.2f} MB)")
+        else:
+            temp_dir = self.temp_dir or tempfile.gettempdir()
+            copied_db = self.copy_db_with_sudo(db_path, temp_dir)
+            if not copied_db:
+                return None, None, None
+            conn = sqlite3.connect(copied_db)
+            page_source = copied_db
+            size_bytes = os.path.getsize(copied_db)
+        profile = self.tune_connection(conn, size_bytes)
+        if profile != 'default':
+            self.log_and_print(f"      ⚙️  연결 튜닝 프로필: {profile}")
+        return conn, copied_db, page_source
+    
     def copy_db_with_sudo(self, src_db_path, temp_dir):
         """sudo로 DB 파일을 임시 디렉토리에 복사하고 읽을 수 있게 권한 변경"""
         try:
@@ -610,6 +4255,28 @@ class IntegratedDecryptionAndForensicsLogger:
             
             self.log_and_print(f"    📋 DB 파일 복사 중: {db_name}")
             
+            if self.image_fs:
+                # 이미지에서 직접 추출 - sudo/마운트 불필요, 빈 블록은 hole로 유지
+                copy_start = time.time()
+                size_bytes = self.image_fs.copy_file(src_db_path, temp_db_path)
+                self.log_and_print(f"      ✅ 이미지에서 직접 추출 완료: {size_bytes / (1024 * 1024):.2f} MB ({time.time() - copy_start:.1f}초)")
+                return temp_db_path
+            
+            if self.privileged_helper:
+                # 특권 헬퍼가 복사 + 소유자/권한 변경을 한 번에 처리
+                copy_start = time.time()
+                size_bytes = self.privileged_helper.copy(src_db_path, temp_db_path)
+                self.log_and_print(f"      ✅ 특권 헬퍼로 복사 완료: {size_bytes / (1024 * 1024):.2f} MB ({time.time() - copy_start:.1f}초)")
+                return temp_db_path
+
+            if os.access(src_db_path, os.R_OK):
+                # 직접 읽을 수 있는 파일 (읽기 전용 마운트, root 실행) - sudo 불필요
+                copy_start = time.time()
+                shutil.copyfile(src_db_path, temp_db_path)
+                size_bytes = os.path.getsize(temp_db_path)
+                self.log_and_print(f"      ✅ 직접 복사 완료: {size_bytes / (1024 * 1024):.2f} MB ({time.time() - copy_start:.1f}초)")
+                return temp_db_path
+
             # 파일 크기 확인
             try:
                 stat_result = subprocess.run(
@@ -632,7 +4299,7 @@ class IntegratedDecryptionAndForensicsLogger:
             copy_start = time.time()
             
             result = subprocess.run(
-                ["sudo", "cp", src_db_path, temp_db_path],
+                ["sudo", "cp", "--sparse=always", src_db_path, temp_db_path],
                 capture_output=True, text=True, timeout=60  # 1분 타임아웃
             )
             
@@ -693,260 +4360,272 @@ class IntegratedDecryptionAndForensicsLogger:
     
     def get_app_categories(self):
         """앱을 카테고리별로 분류"""
-        return {
-            "messaging": {
-                "apps": [
-                    "com.kakao.talk", "jp.naver.line.android", "com.whatsapp",
-                    "com.facebook.orca", "com.discord", "org.telegram.messenger",
-                    "com.skype.raider", "com.viber.voip"
-                ],
-                "priority": 1
-            },
-            "social": {
-                "apps": [
-                    "com.instagram.android", "com.facebook.katana", "com.twitter.android",
-                    "com.snapchat.android", "com.tiktok.musically", "com.linkedin.android",
-                    "com.reddit.frontpage"
-                ],
-                "priority": 2
-            },
-            "media": {
-                "apps": [
-                    "com.spotify.music", "com.netflix.mediaclient", "com.youtube.android",
-                    "com.soundcloud.android", "com.coffeebeanventures.easyvoicerecorder",
-                    "com.google.android.apps.photos", "com.amazon.mp3"
-                ],
-                "priority": 2
-            },
-            "productivity": {
-                "apps": [
-                    "com.google.android.keep", "com.evernote", "com.microsoft.office.onenote",
-                    "com.todoist", "com.any.do", "com.dropbox.android", "com.notion.id"
-                ],
-                "priority": 1
-            },
-            "email": {
-                "apps": [
-                    "com.google.android.gm", "com.microsoft.office.outlook",
-                    "com.yahoo.mobile.client.android.mail", "com.apple.android.mail"
-                ],
-                "priority": 2
-            },
-            "navigation": {
-                "apps": [
-                    "net.daum.android.map", "com.google.android.apps.maps", "com.waze",
-                    "com.here.app.maps"
-                ],
-                "priority": 3
-            },
-            "system": {
-                "apps": [
-                    "com.google.android.gms", "com.android.vending", "com.samsung", 
-                    "com.sec.", "android", "com.google.android.gsf"
-                ],
-                "priority": 4
-            }
-        }
+        return self.app_classifier.categories
     
     def has_korean_text(self, text):
         """텍스트에 한글이 포함되어 있는지 확인"""
         if not text:
             return False
-        
-        # 텍스트를 문자열로 변환
-        text_str = str(text)
-        
-        # 한글 유니코드 범위 확인 (가-힣: 44032-55203)
-        korean_pattern = re.compile(r'[가-힣]')
-        has_korean = bool(korean_pattern.search(text_str))
-        
-        # 디버깅: 한글이 발견된 경우 샘플 출력
-        if has_korean:
-            # 한글 부분만 추출하여 샘플 표시
-            korean_chars = korean_pattern.findall(text_str)
-            sample_text = ''.join(korean_chars[:10])  # 처음 10개 한글 문자만
-            print(f"DEBUG: 한글 텍스트 발견: '{sample_text}'... (전체 길이: {len(text_str)})")
-        
-        return has_korean
+        return PII_DETECTOR.scan(str(text))[0]['hangul'] > 0
     
     def has_email_pattern(self, text):
         """텍스트에 이메일 패턴이 있는지 확인"""
         if not text:
             return False
-        email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-        return bool(email_pattern.search(str(text)))
+        return PII_DETECTOR.scan(str(text))[0]['email'] > 0
     
     def count_korean_chars(self, text):
         """텍스트의 한글 문자 수를 세기"""
         if not text:
             return 0
-        korean_pattern = re.compile(r'[가-힣]')
-        return len(korean_pattern.findall(str(text)))
+        return PII_DETECTOR.scan(str(text))[0]['hangul']
     
     def extract_emails(self, text):
         """텍스트에서 이메일 주소 추출"""
         if not text:
             return []
-        email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-        return email_pattern.findall(str(text))
+        return PII_DETECTOR.findall(str(text), 'email')
     
     def analyze_table_content(self, table_info):
-        """테이블 내용을 분석하여 한글/이메일 정보 추가"""
-        korean_count = 0
-        email_count = 0
-        has_korean = False
-        has_email = False
-        
-        if table_info.get("rows"):
-            for row in table_info["rows"]:
-                for cell in row:
-                    cell_str = str(cell) if cell is not None else ""
-                    if self.has_korean_text(cell_str):
-                        has_korean = True
-                        korean_count += self.count_korean_chars(cell_str)
-                    if self.has_email_pattern(cell_str):
-                        has_email = True
-                        email_count += len(self.extract_emails(cell_str))
-        
-        # 디버깅 정보 추가
+        """테이블 내용을 분석하여 한글/이메일/전화번호/URL/좌표 등 탐지 결과 추가 (셀마다 한 번만 검사)"""
+        counts, cells = PII_DETECTOR.scan_rows(table_info.get("rows") or [])
+        has_korean = cells['hangul'] > 0
+        has_email = cells['email'] > 0
+        korean_count = counts['hangul']
+        email_count = counts['email']
+        
+        # 디버깅 정보 추가 (로그 파일에만 기록 - 분석 작업 프로세스에서는 주 프로세스 로그로 전달됨)
         if has_korean:
-            print(f"DEBUG: 테이블 {table_info.get('table', 'Unknown')}에서 한글 데이터 발견")
-            print(f"DEBUG: 한글 문자 수: {korean_count}")
-            print(f"DEBUG: 샘플 행 수: {len(table_info.get('rows', []))}")
+            self.log_and_print(f"DEBUG: 테이블 {table_info.get('table', 'Unknown')}에서 한글 데이터 발견", file_only=True)
+            self.log_and_print(f"DEBUG: 한글 문자 수: {korean_count}", file_only=True)
+            self.log_and_print(f"DEBUG: 샘플 행 수: {len(table_info.get('rows', []))}", file_only=True)
         
         table_info["has_korean"] = has_korean
         table_info["has_email"] = has_email
         table_info["korean_count"] = korean_count
         table_info["email_count"] = email_count
+        # 전체 탐지 결과: 탐지기별 개수(문자 체계는 글자 수)와 해당 셀 수
+        table_info["pii_counts"] = {kind: counts[kind] for kind in PII_DETECTOR.kinds}
+        table_info["pii_cells"] = {kind: cells[kind] for kind in PII_DETECTOR.kinds}
         
         return table_info
     
+    def deep_scan_table(self, cur, table_info):
+        """테이블 전체 행을 fetchmany 배치로 흘려 보내며 탐지해 table_info의 탐지 결과를 교체 (메모리 일정)
+        
+        탐지기별 처음 sample_rows개 일치 행만 보관하고, 바이트/시간 예산을 넘으면 중단 (그때까지의 개수는 하한값)
+        """
+        budget = self.deep_scan
+        table = table_info["table"]
+        counts, cells = collections.Counter(), collections.Counter()
+        samples = {}  # 스캔 순서 → 일치 행
+        sample_slots = collections.Counter()
+        rows_scanned = bytes_scanned = 0
+        stop_reason = None
+        scan_start = time.time()
+        
+        # 키셋 페이지로 읽어 예산 초과로 멈춰도 이어 읽을 위치(state)를 남김
+        rows_iter = KeysetRowIterator(cur, table, page_size=DEEP_SCAN_BATCH_ROWS)
+        for batch in rows_iter.pages():
+            for row in batch:
+                found = PII_DETECTOR.scan_row(row, counts, cells)
+                if found:
+                    wanted = [kind for kind in found if sample_slots[kind] < budget.sample_rows]
+                    if wanted:
+                        samples[rows_scanned] = row
+                        sample_slots.update(wanted)
+                rows_scanned += 1
+            # 크기 예산은 배치 단위로 계산 (문자열은 글자 수, BLOB은 바이트 수)
+            bytes_scanned += sum(len(cell) for row in batch for cell in row if cell.__class__ is str or cell.__class__ is bytes)
+            if bytes_scanned >= budget.max_bytes:
+                stop_reason = 'bytes'
+                break
+            if time.time() - scan_start >= budget.max_seconds:
+                stop_reason = 'time'
+                break
+        elapsed = time.time() - scan_start
+        
+        table_info.update({
+            "has_korean": cells['hangul'] > 0,
+            "has_email": cells['email'] > 0,
+            "korean_count": counts['hangul'],
+            "email_count": counts['email'],
+            "pii_counts": {kind: counts[kind] for kind in PII_DETECTOR.kinds},
+            "pii_cells": {kind: cells[kind] for kind in PII_DETECTOR.kinds},
+            "matched_rows": [samples[index] for index in sorted(samples)],
+            "deep_scan": {"rows_scanned": rows_scanned, "bytes_scanned": bytes_scanned,
+                          "seconds": round(elapsed, 3), "complete": stop_reason is None, "stop_reason": stop_reason}
+        })
+        if stop_reason is None:
+            # 끝까지 읽었으므로 행 수도 정확한 값
+            table_info["row_count"] = rows_scanned
+            table_info["row_count_method"] = 'exact'
+            self.log_and_print(f"      🔎 전체 스캔: {table} - 행 {rows_scanned:,}개, {bytes_scanned / (1024 * 1024):.1f} MB ({elapsed:.2f}초)")
+        else:
+            # 이어 읽기 위치 (KeysetRowIterator.resume으로 남은 행만 다시 스캔 가능)
+            table_info["deep_scan"]["resume"] = rows_iter.state()
+            self.log_and_print(f"      ⏸️  전체 스캔 중단: {table} - {'크기' if stop_reason == 'bytes' else '시간'} 예산 초과, "
+                               f"행 {rows_scanned:,}개까지 ({bytes_scanned / (1024 * 1024):.1f} MB, {elapsed:.2f}초)")
+        return table_info
+    
+    def _list_directory(self, path, timeout=10):
+        """디렉토리 항목 [(이름, 디렉토리 여부, 크기)] - 이미지 리더/특권 헬퍼/os.scandir 순으로 시도, 권한이 없으면 sudo ls (실패 시 None)"""
+        if self.image_fs:
+            try:
+                return [(entry.name, self.image_fs.is_dir(entry), self.image_fs.inode(entry.ino).size)
+                        for entry in self.image_fs.scandir(path)]
+            except OSError:
+                return None
+        if self.privileged_helper:
+            try:
+                return self.privileged_helper.listdir(path)
+            except OSError:
+                return None
+        try:
+            return [tuple(entry) for entry in list_directory_entries(path)]
+        except PermissionError:
+            pass
+        except OSError:
+            return None
+        result = subprocess.run(["sudo", "ls", "-la", path], capture_output=True, text=True, timeout=timeout)
+        if result.returncode != 0:
+            return None
+        entries = []
+        for line in result.stdout.strip().split('\n'):
+            parts = line.split()
+            if len(parts) >= 9 and parts[-1] not in ['.', '..']:
+                size_bytes = int(parts[4]) if parts[4].isdigit() else 0
+                entries.append((parts[-1], parts[0].startswith('d'), size_bytes))
+        return entries
+    
+    def _list_directories(self, paths):
+        """여러 디렉토리 조회 → {경로: 항목 목록 또는 None} (특권 헬퍼는 한 번의 배치 요청)"""
+        if not self.privileged_helper:
+            return {path: self._list_directory(path) for path in paths}
+        results = self.privileged_helper.batch([('listdir', {'path': path}) for path in paths])
+        return {path: None if isinstance(entries, OSError) else [tuple(entry) for entry in entries]
+                for path, entries in zip(paths, results)}
+    
+    def _read_headers(self, paths, length=len(SQLITE_HEADER_MAGIC)):
+        """파일들의 앞부분 length바이트 → {경로: bytes 또는 None}"""
+        headers = {}
+        if self.privileged_helper and paths:
+            results = self.privileged_helper.batch([('read_range', {'path': path, 'offset': 0, 'length': length}) for path in paths])
+            return {path: None if isinstance(data, OSError) else base64.b64decode(data) for path, data in zip(paths, results)}
+        for path in paths:
+            try:
+                if self.image_fs:
+                    with self.image_fs.open(path) as f:
+                        headers[path] = f.read(length)
+                else:
+                    headers[path] = read_file_range(path, 0, length)
+            except PermissionError:
+                result = subprocess.run(["sudo", "head", "-c", str(length), path], capture_output=True, timeout=10)
+                headers[path] = result.stdout if result.returncode == 0 else None
+            except OSError:
+                headers[path] = None
+        return headers
+    
+    def classify_app(self, app_name):
+        """패키지명 → (카테고리, 우선순위) - 어느 카테고리에도 없으면 ('other', 5)"""
+        classification = self.app_classifier.classify(app_name)
+        if classification.category is None:
+            return 'other', 5
+        return classification.category, classification.priority
+    
+    def _scan_package_databases(self, app_name, app_path, user_id):
+        """앱 폴더 전체를 단계별로 훑어 SQLite 헤더를 가진 파일과 -wal/-journal/-shm 짝을 찾음"""
+        found = []
+        stats = {'directories': 0, 'checked': 0}
+        level = [app_path]
+        while level:
+            listings = self._list_directories(level)
+            level = []
+            for directory, entries in listings.items():
+                if entries is None:
+                    continue
+                stats['directories'] += 1
+                sizes = {name: size for name, is_dir, size in entries if not is_dir}
+                level.extend(os.path.join(directory, name) for name, is_dir, _ in entries if is_dir)
+                # DB 본 파일 크기는 항상 페이지 크기(512의 배수)의 배수 - 헤더를 읽기 전에 대부분 걸러냄
+                candidates = [os.path.join(directory, name) for name, size in sizes.items()
+                              if size >= 512 and size % 512 == 0 and not name.endswith(SQLITE_SIBLING_SUFFIXES)]
+                stats['checked'] += len(candidates)
+                for path, header in self._read_headers(candidates).items():
+                    if header != SQLITE_HEADER_MAGIC:
+                        continue
+                    name = os.path.basename(path)
+                    found.append({
+                        "path": path,
+                        "app_name": app_name,
+                        "user_id": user_id,
+                        "db_name": os.path.relpath(path, app_path),
+                        "size_bytes": sizes[name],
+                        "siblings": {suffix: sizes[name + suffix] for suffix in SQLITE_SIBLING_SUFFIXES if name + suffix in sizes}
+                    })
+        return found, stats
+    
     def find_database_files(self, mount_point):
-        """개선된 DB 검색 - 서드파티 앱 우선, 다중 검색 방법 사용"""
+        """전체 앱 DB 검색 - /data/data와 /data/user/*의 모든 앱 폴더를 병렬로 훑어 SQLite 헤더로 판별"""
         db_paths = []
         root_data = os.path.join(mount_point, "data")
+        root_user = os.path.join(mount_point, "user")
         
-        if not os.path.exists(root_data):
+        if not (self.image_fs.exists(root_data) if self.image_fs else os.path.exists(root_data)):
             self.log_and_print(f"[경고] /data 폴더가 존재하지 않습니다: {root_data}")
             return []
         
         self.log_and_print("[+] 데이터베이스 파일 검색 중...")
-        self.log_and_print(f"[+] 검색 경로: {root_data}")
+        self.log_and_print(f"[+] 검색 경로: {root_data}, {root_user}/*")
+        discovery_start = time.time()
         
-        app_categories = self.get_app_categories()
+        # 1단계: 사용자별 앱 폴더 목록 (/data/user/0처럼 /data/data를 가리키는 심볼릭 링크는 디렉토리가 아니므로 제외됨)
+        self.log_and_print("\n[+] 1단계: 앱 폴더 검색...")
+        user_roots = [('0', root_data)]
+        for name, is_dir, _ in self._list_directory(root_user) or []:
+            if is_dir:
+                user_roots.append((name, os.path.join(root_user, name)))
         
-        # 1단계: 직접 ls를 이용한 앱 폴더 검색
-        self.log_and_print("\n[+] 1단계: 앱 폴더 직접 검색...")
         app_folders = []
-        try:
-            self.log_and_print(f"    🔍 {root_data} 디렉토리 검색 중...")
-            
-            ls_result = subprocess.run(
-                ["sudo", "ls", "-la", root_data],
-                capture_output=True, text=True, timeout=30
-            )
-            
-            if ls_result.returncode == 0:
-                lines = ls_result.stdout.strip().split('\n')
-                self.log_and_print(f"      📁 디렉토리 항목 수: {len(lines)}개")
-                
-                for line in lines:
-                    parts = line.split()
-                    if len(parts) >= 9 and parts[0].startswith('d'):  # 디렉토리만
-                        folder_name = parts[-1]
-                        if '.' in folder_name and folder_name not in ['.', '..']:  # 패키지명 형태
-                            full_path = os.path.join(root_data, folder_name)
-                            app_folders.append((folder_name, full_path))
-                
-                self.log_and_print(f"      ✅ 발견된 앱 폴더: {len(app_folders)}개")
-                
-                # 처음 몇 개 앱 이름 표시
-                if app_folders:
-                    sample_apps = [name for name, _ in app_folders[:5]]
-                    self.log_and_print(f"      📱 샘플 앱: {', '.join(sample_apps)}")
-                    if len(app_folders) > 5:
-                        self.log_and_print(f"      ... 및 {len(app_folders) - 5}개 더")
-                
-            else:
-                self.log_and_print(f"      ❌ ls 명령 실패: {ls_result.stderr.strip()}")
-                
-        except subprocess.TimeoutExpired:
-            self.log_and_print(f"      ⏰ 앱 폴더 검색 타임아웃")
-        except Exception as e:
-            self.log_and_print(f"      ❌ 앱 폴더 검색 오류: {e}")
+        for (user_id, user_root), entries in zip(user_roots, self._list_directories([root for _, root in user_roots]).values()):
+            if entries is None:
+                self.log_and_print(f"      ❌ 디렉토리 목록 조회 실패: {user_root}")
+                continue
+            folders = [(name, os.path.join(user_root, name), user_id) for name, is_dir, _ in entries
+                       if is_dir and '.' in name]  # 패키지명 형태
+            self.log_and_print(f"    📁 {user_root}: 앱 폴더 {len(folders)}개 (사용자 {user_id})")
+            app_folders.extend(folders)
         
-        # 2단계: 서드파티 앱 우선 DB 검색
-        self.log_and_print(f"\n[+] 2단계: 서드파티 앱 우선 개별 검사...")
+        if app_folders:
+            sample_apps = sorted({name for name, _, _ in app_folders})
+            self.log_and_print(f"      📱 샘플 앱: {', '.join(sample_apps[:5])}")
+            if len(sample_apps) > 5:
+                self.log_and_print(f"      ... 및 {len(sample_apps) - 5}개 더")
         
+        # 2단계: 모든 앱 폴더를 스레드 풀로 병렬 검사
+        self.log_and_print(f"\n[+] 2단계: 전체 앱 {len(app_folders)}개 병렬 검사 (작업자 {self.discovery_workers}개)...")
         db_info_list = []
+        totals = collections.Counter()
+        with ThreadPoolExecutor(max_workers=self.discovery_workers) as pool:
+            futures = {pool.submit(self._scan_package_databases, app_name, app_path, user_id): (app_name, user_id)
+                       for app_name, app_path, user_id in app_folders}
+            for future, (app_name, user_id) in futures.items():
+                try:
+                    found, stats = future.result()
+                except Exception as e:
+                    self.log_and_print(f"    ❌ {app_name} (사용자 {user_id}) 검사 실패: {e}")
+                    continue
+                totals.update(stats)
+                category, priority = self.classify_app(app_name)
+                for db_info in found:
+                    db_info.update(category=category, priority=priority)
+                db_info_list.extend(found)
         
-        # 우선순위 앱들을 먼저 검사
-        priority_apps = []
-        for category, info in app_categories.items():
-            if info["priority"] <= 2:  # 고우선순위만
-                for app_pattern in info["apps"]:
-                    for app_name, folder_path in app_folders:
-                        if app_pattern in app_name:
-                            priority_apps.append((app_name, folder_path, category, info["priority"]))
-        
-        self.log_and_print(f"  우선 검사할 서드파티 앱: {len(priority_apps)}개")
-        
-        # 우선순위 앱들 개별 검사
-        for app_name, app_path, category, priority in priority_apps:
-            self.log_and_print(f"    🔍 {app_name} 개별 검사...")
-            
-            # databases 폴더 직접 확인
-            databases_path = os.path.join(app_path, "databases")
-            try:
-                ls_db_result = subprocess.run(
-                    ["sudo", "ls", "-la", databases_path],
-                    capture_output=True, text=True, timeout=10
-                )
-                
-                if ls_db_result.returncode == 0:
-                    self.log_and_print(f"      ✓ databases 폴더 발견")
-                    lines = ls_db_result.stdout.strip().split('\n')
-                    db_count = 0
-                    
-                    for line in lines:
-                        parts = line.split()
-                        if len(parts) >= 9 and not parts[0].startswith('d'):  # 파일만
-                            filename = parts[-1]
-                            if filename.endswith('.db') and filename not in ['.', '..']:
-                                db_file_path = os.path.join(databases_path, filename)
-                                
-                                # 파일 크기 확인
-                                try:
-                                    stat_result = subprocess.run(
-                                        ["sudo", "stat", "-c", "%s", db_file_path],
-                                        capture_output=True, text=True, timeout=5
-                                    )
-                                    size_bytes = int(stat_result.stdout.strip()) if stat_result.returncode == 0 else 0
-                                except:
-                                    size_bytes = 0
-                                
-                                db_info_list.append({
-                                    "path": db_file_path,
-                                    "app_name": app_name,
-                                    "db_name": filename,
-                                    "size_bytes": size_bytes,
-                                    "category": category,
-                                    "priority": priority
-                                })
-                                
-                                db_count += 1
-                                self.log_and_print(f"        🗃️  {filename} ({size_bytes} bytes)")
-                    
-                    if db_count == 0:
-                        self.log_and_print(f"      ⚠️  databases 폴더가 비어있음")
-                else:
-                    self.log_and_print(f"      ❌ databases 폴더 없음")
-                    
-            except Exception as e:
-                self.log_and_print(f"      ❌ 검사 실패: {e}")
+        self.log_and_print(f"  ✓ 디렉토리 {totals['directories']:,}개, 헤더 확인 파일 {totals['checked']:,}개 ({time.time() - discovery_start:.1f}초)")
         
         # 우선순위 기준으로 정렬 (서드파티 앱 우선)
         db_info_list.sort(key=lambda x: (x["priority"], -x["size_bytes"]))
+        self.database_index = {db_info["path"]: db_info for db_info in db_info_list}
         
         # 결과 출력 및 경로 리스트 생성
         if db_info_list:
@@ -960,7 +4639,9 @@ class IntegratedDecryptionAndForensicsLogger:
                 
                 size_kb = db_info["size_bytes"] / 1024 if db_info["size_bytes"] > 0 else 0
                 marker = "🔥" if db_info["priority"] <= 2 else "  "
-                self.log_and_print(f"{marker} {db_info['app_name']}/{db_info['db_name']} ({size_kb:.1f} KB)")
+                user = f" [사용자 {db_info['user_id']}]" if db_info["user_id"] != '0' else ""
+                siblings = f" +{','.join(suffix.lstrip('-') for suffix in db_info['siblings'])}" if db_info["siblings"] else ""
+                self.log_and_print(f"{marker} {db_info['app_name']}/{db_info['db_name']}{user} ({size_kb:.1f} KB){siblings}")
                 
                 db_paths.append(db_info["path"])
             
@@ -968,60 +4649,202 @@ class IntegratedDecryptionAndForensicsLogger:
             total_size = sum(db["size_bytes"] for db in db_info_list)
             high_priority_count = sum(1 for db in db_info_list if db["priority"] <= 2)
             
-            self.log_and_print(f"\n[+] 총 {len(db_info_list)}개 DB 파일 발견")
+            self.log_and_print(f"\n[+] 총 {len(db_info_list)}개 DB 파일 발견 (앱 {len({(db['user_id'], db['app_name']) for db in db_info_list})}개)")
             self.log_and_print(f"[+] 총 DB 파일 크기: {total_size / 1024 / 1024:.2f} MB")
+            self.log_and_print(f"[+] WAL/저널 파일이 있는 DB: {sum(1 for db in db_info_list if db['siblings'])}개")
             self.log_and_print(f"[+] 고우선순위 서드파티 앱 DB: {high_priority_count}개 ⭐")
         else:
             self.log_and_print(f"[경고] DB 파일을 찾을 수 없습니다")
         
         return db_paths
     
+    def database_app_name(self, db_path, mount_point):
+        """DB 경로의 앱 이름 (검색 결과에 있으면 그대로, 아니면 /data/data 기준 첫 경로)"""
+        db_info = self.database_index.get(db_path)
+        if db_info:
+            return db_info["app_name"]
+        return os.path.relpath(db_path, os.path.join(mount_point, "data")).split('/')[0]
+    
     def get_important_tables_by_app(self, app_name):
-        """앱별로 중요한 테이블명 패턴 반환"""
-        table_patterns = {
-            "com.kakao.talk": ["chat", "message", "friend", "room", "OpenChatRoom"],
-            "jp.naver.line.android": ["chat", "message", "contact", "room", "group"],
-            "com.whatsapp": ["messages", "chat", "contacts", "group"],
-            "com.google.android.keep": ["note", "list", "reminder", "label"],
-            "com.coffeebeanventures.easyvoicerecorder": ["recording", "voice", "audio"],
-            "com.instagram.android": ["user", "media", "story", "direct"],
-            "com.spotify.music": ["track", "playlist", "user", "offline"],
-            "com.netflix.mediaclient": ["profile", "viewing", "download"],
-            "com.google.android.gm": ["message", "conversation", "label", "attachment"],
-            "com.evernote": ["note", "notebook", "tag", "resource"],
-            "com.dropbox.android": ["file", "sync", "account"],
-            "com.discord": ["message", "channel", "guild", "user"],
-            "org.telegram.messenger": ["message", "chat", "contact", "media"]
-        }
+        """앱별로 중요한 테이블명 패턴 반환 (없으면 None → 모든 테이블 분석)"""
+        return self.app_classifier.classify(app_name).important_tables
+    
+    @staticmethod
+    def read_stat1_row_counts(cur):
+        """sqlite_stat1 (ANALYZE 결과)의 테이블별 행 수 - 인덱스 통계의 첫 값도 행 수임"""
+        counts = {}
+        try:
+            for table, index, stat in cur.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+                rows = int(str(stat).split()[0])
+                # 부분 인덱스는 행 수가 적을 수 있으므로 가장 큰 값 사용
+                counts[table] = max(rows, counts.get(table, 0))
+        except (sqlite3.Error, ValueError, IndexError):
+            pass
+        return counts
+    
+    def count_table_rows(self, cur, table, root_page, without_rowid, stat1_counts, pages):
+        """테이블 행 수 → (행 수, 방식) - 방식은 ROW_COUNT_METHODS 키 ('exact'/'btree_exact'만 정확한 값)
+        
+        전체 b-tree를 훑는 COUNT(*) 대신 sqlite_stat1 → 내부 페이지 구조 → rowid 범위 순으로 추정
+        (rowid 범위는 삭제된 행만큼 크게 나오므로 페이지를 직접 읽을 수 없을 때만 사용)
+        """
+        if not self.exact_row_counts and root_page:
+            if table in stat1_counts:
+                return stat1_counts[table], 'stat1'
+            if pages:
+                try:
+                    # 리프 페이지가 적은 작은 테이블은 정확한 값이 바로 나옴
+                    rows, exact = pages.estimate_btree_rows(root_page)
+                    return rows, 'btree_exact' if exact else 'btree'
+                except (ValueError, struct.error):
+                    pass
+            if not without_rowid:
+                try:
+                    low, high = rowid_range(cur, table)
+                    return (0 if high is None else high - low + 1), 'rowid'
+                except sqlite3.Error:
+                    pass
+        cur.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)};")
+        return cur.fetchone()[0], 'exact'
+    
+    @staticmethod
+    def _row_count_text(table_info):
+        """보고서용 행 수 표시 - 추정값은 '약'을 붙임"""
+        prefix = "" if table_info.get("row_count_method", 'exact') in ('exact', 'btree_exact') else "약 "
+        return f"{prefix}{table_info.get('row_count', 0):,}"
+    
+    def recover_deleted_rows(self, cur, pages, table_schemas):
+        """삭제 행 카빙 → {테이블 이름: (복구 행 목록, 통계)} - WITHOUT ROWID 테이블은 인덱스 b-tree 형식이라 제외"""
+        tables = []
+        columns_by_table = {}
+        for table, (root_page, without_rowid) in table_schemas.items():
+            if without_rowid or not root_page or table.startswith('sqlite_'):
+                continue
+            columns = cur.execute(f"PRAGMA table_info({quote_identifier(table)})").fetchall()
+            primary_key = [column for column in columns if column[5]]
+            alias = primary_key[0][0] if len(primary_key) == 1 and primary_key[0][2].upper() == 'INTEGER' else None
+            tables.append((table, root_page, ['rowid' if column[0] == alias else column_affinity(column[2])
+                                              for column in columns]))
+            columns_by_table[table] = ([column[1] for column in columns], alias)
+        carved = SQLiteRecordCarver(pages, tables).carve()
+        return {table: self.verify_recovered_rows(cur, table, records, *columns_by_table[table])
+                for table, records in carved.items()}
+    
+    def verify_recovered_rows(self, cur, table, records, columns, alias):
+        """카빙한 레코드를 현재 행과 대조 → (복구 행 목록, 통계)
         
-        # 패턴 매칭으로 앱 찾기
-        for app_pattern, patterns in table_patterns.items():
-            if app_pattern in app_name:
-                return patterns
+        페이지 분할/재배치로 빈 공간에 남은 살아 있는 행의 사본은 버리고, 같은 rowid의 현재 값이 다르면 수정 전 값으로 표시.
+        rowid를 잃은 레코드는 텍스트/정수 값 하나로 후보 행을 찾아 전체 값을 대조 (IN 목록은 json_each로 한 번에 넘겨
+        테이블당 쿼리 한두 번으로 끝남)
+        """
+        unique = {}
+        duplicates = 0
+        for record in records:
+            key = tuple(record["values"])
+            kept = unique.get(key)
+            if kept is None or (kept["rowid"] is None and record["rowid"] is not None):
+                unique[key] = record
+            duplicates += kept is not None
+        
+        source = quote_identifier(table)
+        key_column = quote_identifier(KeysetRowIterator.detect_key_columns(cur, table)[0])
+        rowids = {record["rowid"] for record in unique.values() if record["rowid"] is not None}
+        live_by_rowid = {}
+        if rowids:
+            cur.execute(f"SELECT {key_column}, * FROM {source} WHERE {key_column} IN (SELECT value FROM json_each(?))",
+                        (json.dumps(sorted(rowids)),))
+            live_by_rowid = {row[0]: row[1:] for row in cur.fetchall()}
+        
+        # rowid를 잃은 레코드는 후보들 사이에서 값이 가장 다양한(선택도가 높은) 컬럼으로 찾음
+        unknown = [key for key, record in unique.items() if record["rowid"] is None]
+        distinct = collections.defaultdict(set)
+        for key in unknown:
+            for index, value in enumerate(key):
+                if index != alias and isinstance(value, (str, int)):
+                    distinct[index].add(value)
+        ranked = sorted(distinct, key=lambda index: len(distinct[index]), reverse=True)
+        lookups = collections.defaultdict(set)
+        for key in unknown:
+            column = next((index for index in ranked if isinstance(key[index], (str, int))), None)
+            if column is not None:
+                lookups[column].add(key[column])
+        
+        live_rows = set()
+        for key, record in unique.items():
+            if record["rowid"] is None:
+                record["values"] = key
+                record["status"] = 'deleted'
+                continue
+            values = list(key)
+            if alias is not None:
+                values[alias] = record["rowid"]
+            record["values"] = tuple(values)
+            live = live_by_rowid.get(record["rowid"])
+            if live is None:
+                record["status"] = 'deleted'
+            elif live == record["values"]:
+                live_rows.add(key)
+            else:
+                record["status"] = 'previous_version'
+        for column, values in lookups.items():
+            cur.execute(f"SELECT * FROM {source} WHERE {quote_identifier(columns[column])} IN (SELECT value FROM json_each(?))",
+                        (json.dumps(list(values), ensure_ascii=False),))
+            for row in cur:
+                if alias is not None:
+                    row = row[:alias] + (None,) + row[alias + 1:]
+                if row in unique and unique[row]["rowid"] is None:
+                    live_rows.add(row)
         
-        return None  # 모든 테이블 분석
+        recovered = [record for key, record in unique.items() if key not in live_rows]
+        stats = {
+            "recovered": len(recovered),
+            "sources": dict(collections.Counter(record["source"] for record in recovered)),
+            "previous_versions": sum(1 for record in recovered if record["status"] == 'previous_version'),
+            "live_copies": len(live_rows),
+            "duplicates": duplicates
+        }
+        return recovered[:RECOVERY_MAX_ROWS], stats
     
     def analyze_sqlite_db(self, db_path, app_name=None, row_limit=10):
         """개선된 DB 분석 - 앱별 중요 테이블 우선, 한글/이메일 데이터 분석"""
         summary = []
         copied_db = None
+        pages = None
         
         try:
-            # DB 파일을 임시 디렉토리에 복사
-            if self.temp_dir:
-                copied_db = self.copy_db_with_sudo(db_path, self.temp_dir)
-                if not copied_db:
-                    return [{"table": "COPY_ERROR", "columns": [], "rows": [f"파일 복사 실패: {db_path}"]}]
-                working_db = copied_db
-            else:
-                working_db = db_path
-            
-            conn = sqlite3.connect(working_db)
+            # 복사 없이 읽기 전용으로 열고, 불가능하거나 WAL 재생이 필요할 때만 임시 복사
+            conn, copied_db, page_source = self.open_database_for_analysis(db_path)
+            if conn is None:
+                return [{"table": "COPY_ERROR", "columns": [], "rows": [f"파일 복사 실패: {db_path}"]}]
             cur = conn.cursor()
+            if not self.exact_row_counts or self.recover_deleted:
+                try:
+                    pages = SQLitePageFile(page_source)
+                except (OSError, ValueError, struct.error):
+                    pages = None
             
-            # 테이블 목록 가져오기
-            cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            all_tables = [r[0] for r in cur.fetchall()]
+            # 테이블 목록 가져오기 (행 수 추정용 루트 페이지, WITHOUT ROWID 여부 포함)
+            cur.execute("SELECT name, rootpage, sql FROM sqlite_master WHERE type='table';")
+            table_schemas = {name: (root_page, bool(re.search(r'\bWITHOUT\s+ROWID\b', sql or '', re.IGNORECASE)))
+                             for name, root_page, sql in cur.fetchall()}
+            all_tables = list(table_schemas)
+            stat1_counts = {} if self.exact_row_counts else self.read_stat1_row_counts(cur)
+            row_count_methods = collections.Counter()
+            recovered = {}
+            if self.recover_deleted and pages:
+                try:
+                    recover_start = time.time()
+                    recovered = self.recover_deleted_rows(cur, pages, table_schemas)
+                    total = sum(stats["recovered"] for _, stats in recovered.values())
+                    if total:
+                        sources = collections.Counter()
+                        for _, stats in recovered.values():
+                            sources.update(stats["sources"])
+                        source_text = ", ".join(f"{RECOVERY_SOURCES[source]} {count}" for source, count in sources.most_common())
+                        self.log_and_print(f"    🗑️  삭제 행 복구: 테이블 {sum(1 for _, stats in recovered.values() if stats['recovered'])}개, "
+                                           f"{total:,}행 ({source_text}, {time.time() - recover_start:.2f}초)")
+                except Exception as recover_error:
+                    self.log_and_print(f"    ⚠️  삭제 행 복구 실패: {recover_error}")
             
             # 앱별 중요 테이블 패턴 가져오기
             important_patterns = self.get_important_tables_by_app(app_name) if app_name else None
@@ -1048,16 +4871,16 @@ class IntegratedDecryptionAndForensicsLogger:
             for table in table_names:
                 try:
                     # 테이블 스키마 정보
-                    cur.execute(f"PRAGMA table_info({table});")
+                    cur.execute(f"PRAGMA table_info({quote_identifier(table)});")
                     columns = [c[1] for c in cur.fetchall()]
                     
-                    # 행 개수 확인
-                    cur.execute(f"SELECT COUNT(*) FROM {table};")
-                    row_count = cur.fetchone()[0]
+                    # 행 개수 확인 (기본은 저비용 추정, --exact-row-counts면 COUNT(*))
+                    row_count, row_count_method = self.count_table_rows(cur, table, *table_schemas[table], stat1_counts, pages)
                     
-                    # 데이터 샘플
-                    cur.execute(f"SELECT * FROM {table} LIMIT {row_limit};")
-                    rows = cur.fetchall()
+                    # 데이터 샘플 (DB/테이블 이름을 시드로 써서 다시 분석해도 같은 행 선택)
+                    rows, sample_strategy = sample_table_rows(cur, table, row_limit, self.row_sampling,
+                                                              seed=f"{os.path.basename(db_path)}:{table}",
+                                                              without_rowid=table_schemas[table][1])
                     
                     # 중요한 테이블인지 표시
                     is_important = False
@@ -1069,11 +4892,21 @@ class IntegratedDecryptionAndForensicsLogger:
                         "columns": columns, 
                         "rows": rows,
                         "row_count": row_count,
+                        "row_count_method": row_count_method,
+                        "sample_strategy": sample_strategy,
                         "is_important": is_important
                     }
                     
+                    # 카빙으로 복구한 삭제 행 (현재 행과 대조를 마친 것만)
+                    if table in recovered and recovered[table][1]["recovered"]:
+                        table_info["recovered_rows"], table_info["recovery"] = recovered[table]
+                    
                     # 한글/이메일 데이터 분석 추가
                     table_info = self.analyze_table_content(table_info)
+                    if self.deep_scan:
+                        # 샘플 행 대신 전체 행 기준으로 탐지 결과 교체
+                        self.deep_scan_table(cur, table_info)
+                    row_count_methods[table_info["row_count_method"]] += 1
                     summary.append(table_info)
                     
                 except Exception as table_error:
@@ -1088,6 +4921,11 @@ class IntegratedDecryptionAndForensicsLogger:
                         "korean_count": 0,
                         "email_count": 0
                     })
+            
+            estimated = sum(count for method, count in row_count_methods.items() if method not in ('exact', 'btree_exact'))
+            if estimated:
+                methods = ", ".join(f"{ROW_COUNT_METHODS[method]} {count}" for method, count in row_count_methods.most_common())
+                self.log_and_print(f"    📏 행 수: 테이블 {estimated}개는 추정값 ({methods})")
                     
         except Exception as e:
             summary.append({
@@ -1106,19 +4944,78 @@ class IntegratedDecryptionAndForensicsLogger:
                 conn.close()
             except: 
                 pass
+            if pages:
+                pages.close()
                 
             # 임시 복사본 정리
-            if copied_db and os.path.exists(copied_db):
-                try:
-                    os.remove(copied_db)
-                except:
-                    pass
+            if copied_db:
+                self._remove_database_copy(copied_db)
         
         return summary
     
+    def analysis_worker_config(self):
+        """분석 작업 프로세스에 넘길 설정 (피클 가능한 값만)"""
+        return {
+            'image_path': self.image_fs.path if self.image_fs else None,
+            'temp_dir': self.temp_dir,
+            'database_index': self.database_index,
+            'app_classifier': self.app_classifier,
+            'sqlite_profile': self.sqlite_profile,
+            'exact_row_counts': self.exact_row_counts,
+            'deep_scan': self.deep_scan,
+            'row_sampling': self.row_sampling,
+            'recover_deleted': self.recover_deleted,
+            'privileged_helper': self.use_privileged_helper,
+            'start_helper': self.privileged_helper is not None
+        }
+    
+    def iter_database_analyses(self, db_files, mount_point):
+        """DB를 find_database_files 우선순위 순서대로 분석해 (DB 경로, 결과, 오류 메시지) 반환
+        
+        analysis_workers가 2 이상이면 프로세스 풀에서 동시에 분석하되, 결과와 작업자 로그는
+        순차 분석과 같은 순서로 주 로그에 기록해 관리 연속성(custody) 로그가 섞이지 않게 함
+        """
+        tasks = [(db, self.database_app_name(db, mount_point)) for db in db_files]
+        workers = min(self.analysis_workers, len(tasks))
+        executor = None
+        results = None
+        if workers > 1 and not (self.image_fs and not self.image_fs.path):
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_analysis_worker,
+                                           initargs=(self.analysis_worker_config(),))
+            results = executor.map(_analyze_database_task, tasks)
+            self.log_and_print(f"⚙️  분석 작업 프로세스 {workers}개로 병렬 분석 (결과는 우선순위 순서로 기록)")
+        
+        try:
+            for i, (db, app_name) in enumerate(tasks, 1):
+                rel_path = os.path.relpath(db, os.path.join(mount_point, "data"))
+                self.log_and_print(f"\n[{i}/{len(tasks)}] 🔍 분석 중: {rel_path}")
+                
+                if results is not None:
+                    try:
+                        result = next(results)
+                    except BrokenProcessPool as e:
+                        # 작업 프로세스가 죽으면 이 DB부터는 주 프로세스에서 순차 분석
+                        self.log_and_print(f"⚠️  분석 작업 프로세스 비정상 종료 ({e}) - 남은 DB는 순차 분석합니다.")
+                        results = None
+                    else:
+                        for timestamp, message, file_only in result["logs"]:
+                            self.log_and_print(message, file_only=file_only, timestamp=timestamp)
+                        if result["wal_snapshot"]:
+                            self.wal_snapshots[db] = result["wal_snapshot"]
+                        yield db, result["summary"], result["error"]
+                        continue
+                
+                try:
+                    summary, error = self.analyze_sqlite_db(db, app_name=app_name), None
+                except Exception as e:
+                    summary, error = None, str(e)
+                yield db, summary, error
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+    
     def generate_html_forensic_report(self, db_summaries, output_path, mount_point):
         """HTML 포렌식 증거 보고서 생성"""
-        app_categories = self.get_app_categories()
         
         # 전체 통계 계산
         total_dbs = len(db_summaries)
@@ -1139,16 +5036,12 @@ class IntegratedDecryptionAndForensicsLogger:
         
         for db_file, tables in db_summaries.items():
             rel_path = os.path.relpath(db_file, os.path.join(mount_point, "data"))
-            app_name = rel_path.split('/')[0]
+            app_name = self.database_app_name(db_file, mount_point)
             
             # 카테고리 확인
-            category = "기타"
-            priority = 5
-            for cat, info in app_categories.items():
-                if any(app_pattern in app_name for app_pattern in info["apps"]):
-                    category = cat
-                    priority = info["priority"]
-                    break
+            classification = self.app_classifier.classify(app_name)
+            category = classification.category or "기타"
+            priority = 5 if classification.priority is None else classification.priority
             
             # 의미 있는 데이터가 있는 테이블들만 수집
             important_data = []
@@ -1200,9 +5093,10 @@ class IntegratedDecryptionAndForensicsLogger:
                 # 한글 또는 이메일 데이터가 있는지 확인
                 korean_data = [t for t in important_data + other_data if t.get('has_korean')]
                 email_data = [t for t in important_data + other_data if t.get('has_email')]
+                recovered_data = [t for t in important_data + other_data if t.get('recovered_rows')]
                 
-                # 한글/이메일 데이터가 있거나, 높은 우선순위 앱에서 상당한 데이터가 있는 경우만 포함
-                if korean_data or email_data:
+                # 한글/이메일/삭제 복구 데이터가 있거나, 높은 우선순위 앱에서 상당한 데이터가 있는 경우만 포함
+                if korean_data or email_data or recovered_data:
                     has_meaningful_data = True
                 elif priority <= 2 and sum(t.get('row_count', 0) for t in important_data + other_data) >= 50:
                     has_meaningful_data = True
@@ -1218,7 +5112,11 @@ class IntegratedDecryptionAndForensicsLogger:
                         "other_tables": other_data,
                         "total_rows": sum(t.get('row_count', 0) for t in important_data + other_data),
                         "korean_data": korean_data,
-                        "email_data": email_data
+                        "email_data": email_data,
+                        "recovered_data": recovered_data,
+                        "pii_tables": {kind: count for kind in PII_DETECTOR_LABELS
+                                       if (count := sum(1 for t in important_data + other_data if t.get("pii_cells", {}).get(kind)))},
+                        "wal_snapshot": self.wal_snapshots.get(db_file)
                     })
                     evidence_counter += 1
         
@@ -1463,6 +5361,8 @@ class IntegratedDecryptionAndForensicsLogger:
                             <div><strong>우선순위:</strong> {priority_text}</div>
                             <div><strong>DB 경로:</strong> {item["db_path"]}</div>
                             <div><strong>총 테이블:</strong> {len(item["important_tables"]) + len(item.get("other_tables", []))}개</div>
+                            {f'<div><strong>샘플 행:</strong> {ROW_SAMPLING_LABELS[self.row_sampling]}</div>' if self.row_sampling != 'head' else ''}
+                            {f'<div><strong>WAL 반영:</strong> 프레임 {item["wal_snapshot"]["wal"]["applied_frames"]}/{item["wal_snapshot"]["wal"]["total_frames"]}개 (커밋 {len(item["wal_snapshot"]["wal"]["commit_frames"])}개)</div>' if item.get("wal_snapshot") and item["wal_snapshot"]["wal"] else ''}
                         </div>
                     </div>
                     
@@ -1476,6 +5376,8 @@ class IntegratedDecryptionAndForensicsLogger:
                             {f'<div style="background: #dbeafe; padding: 8px; border-radius: 4px; text-align: center; color: #1e40af; font-size: 0.85em;"><strong>이메일</strong><br>{len(item["email_data"])}개 테이블</div>' if item["email_data"] else ''}
                             {f'<div style="background: #d1fae5; padding: 8px; border-radius: 4px; text-align: center; color: #065f46; font-size: 0.85em;"><strong>중요</strong><br>{len(item["important_tables"])}개 테이블</div>' if item["important_tables"] else ''}
                             {f'<div style="background: #f3f4f6; padding: 8px; border-radius: 4px; text-align: center; color: #374151; font-size: 0.85em;"><strong>기타</strong><br>{len(item.get("other_tables", []))}개 테이블</div>' if item.get("other_tables") else ''}
+                            {''.join(f'<div style="background: #ede9fe; padding: 8px; border-radius: 4px; text-align: center; color: #5b21b6; font-size: 0.85em;"><strong>{PII_DETECTOR_LABELS[kind]}</strong><br>{count}개 테이블</div>' for kind, count in item["pii_tables"].items())}
+                            {f'<div style="background: #fee2e2; padding: 8px; border-radius: 4px; text-align: center; color: #991b1b; font-size: 0.85em;"><strong>삭제 복구</strong><br>{sum(t["recovery"]["recovered"] for t in item["recovered_data"]):,}행</div>' if item["recovered_data"] else ''}
                         </div>
                     </div>"""
             
@@ -1490,7 +5392,7 @@ class IntegratedDecryptionAndForensicsLogger:
                     html_content += f'''
                     <div style="background: #fef3c7; padding: 12px; border-radius: 6px; margin-bottom: 10px; border-left: 4px solid #f59e0b;">
                         <div style="font-weight: bold; margin-bottom: 8px; color: #92400e;">
-                            📋 {table["table"]} ({table["row_count"]}행)
+                            📋 {table["table"]} ({self._row_count_text(table)}행)
                         </div>'''
                     
                     # 실제 데이터 내용 표시
@@ -1508,7 +5410,7 @@ class IntegratedDecryptionAndForensicsLogger:
                     html_content += '</div>'
                     html_content += f'''
                     <div class="data-item korean-data">
-                        <strong>{table["table"]}</strong> ({table["row_count"]}행)
+                        <strong>{table["table"]}</strong> ({self._row_count_text(table)}행)
                     </div>'''
             
             # 이메일 데이터가 있는 경우
@@ -1522,7 +5424,7 @@ class IntegratedDecryptionAndForensicsLogger:
                     html_content += f'''
                     <div style="background: #dbeafe; padding: 12px; border-radius: 6px; margin-bottom: 10px; border-left: 4px solid #3b82f6;">
                         <div style="font-weight: bold; margin-bottom: 8px; color: #1e40af;">
-                            📧 {table["table"]} ({table["row_count"]}행)
+                            📧 {table["table"]} ({self._row_count_text(table)}행)
                         </div>'''
                     
                     # 실제 데이터 내용 표시
@@ -1540,7 +5442,7 @@ class IntegratedDecryptionAndForensicsLogger:
                     html_content += '</div>'
                     html_content += f'''
                     <div class="data-item email-data">
-                        <strong>{table["table"]}</strong> ({table["row_count"]}행)
+                        <strong>{table["table"]}</strong> ({self._row_count_text(table)}행)
                     </div>'''
             
             # 기타 중요 데이터
@@ -1553,7 +5455,7 @@ class IntegratedDecryptionAndForensicsLogger:
                 for table in item["important_tables"][:3]:
                     html_content += f'''
                     <div class="data-item">
-                        <strong>{table["table"]}</strong> ({table["row_count"]}행)
+                        <strong>{table["table"]}</strong> ({self._row_count_text(table)}행)
                     </div>'''
             
             # 포렌식 의미 설명
@@ -1580,13 +5482,13 @@ class IntegratedDecryptionAndForensicsLogger:
                     html_content += f'''
                                     <div style="background: #fef3c7; padding: 12px; border-radius: 6px; margin-bottom: 10px;">
                                         <strong style="color: #92400e;">테이블: {table["table"]}</strong>
-                                        <div style="color: #92400e; font-size: 0.9em; margin: 5px 0;">행 수: {table["row_count"]:,}개 | 한글 문자: {table.get("korean_count", 0):,}자</div>
+                                        <div style="color: #92400e; font-size: 0.9em; margin: 5px 0;">행 수: {self._row_count_text(table)}개 | 한글 문자: {table.get("korean_count", 0):,}자</div>
                                         <div style="color: #92400e; font-size: 0.9em; margin: 5px 0;">컬럼: {", ".join(table.get("columns", [])[:5])}{"..." if len(table.get("columns", [])) > 5 else ""}</div>'''
                     
                     # 실제 데이터 샘플 표시 (한글 포함된 행만)
                     if table.get("rows"):
                         korean_samples = []
-                        for row in table["rows"][:10]:  # 최대 10개 행에서 검색
+                        for row in (table.get("matched_rows") or table["rows"])[:10]:  # 최대 10개 행에서 검색
                             row_has_korean = any(self.has_korean_text(str(cell)) for cell in row if cell is not None)
                             if row_has_korean:
                                 korean_samples.append(row)
@@ -1658,7 +5560,7 @@ class IntegratedDecryptionAndForensicsLogger:
                         
                         # 한글 포함된 행들을 찾아서 상세 표시
                         korean_rows = []
-                        for row_idx, row in enumerate(table["rows"][:20]):  # 최대 20개 행 검사
+                        for row_idx, row in enumerate((table.get("matched_rows") or table["rows"])[:20]):  # 최대 20개 행 검사
                             row_has_korean = False
                             korean_cells = []
                             
@@ -1703,7 +5605,7 @@ class IntegratedDecryptionAndForensicsLogger:
                     html_content += f'''
                                     <div style="background: #dbeafe; padding: 12px; border-radius: 6px; margin-bottom: 10px;">
                                         <strong style="color: #1e40af;">테이블: {table["table"]}</strong>
-                                        <div style="color: #1e40af; font-size: 0.9em; margin: 5px 0;">행 수: {table["row_count"]:,}개 | 이메일: {table.get("email_count", 0):,}개</div>
+                                        <div style="color: #1e40af; font-size: 0.9em; margin: 5px 0;">행 수: {self._row_count_text(table)}개 | 이메일: {table.get("email_count", 0):,}개</div>
                                         <div style="color: #1e40af; font-size: 0.9em; margin: 5px 0;">컬럼: {", ".join(table.get("columns", [])[:5])}{"..." if len(table.get("columns", [])) > 5 else ""}</div>'''
                     
                     # 이메일 패턴 샘플 표시
@@ -1711,7 +5613,7 @@ class IntegratedDecryptionAndForensicsLogger:
                         email_samples = []
                         email_rows = []
                         
-                        for row_idx, row in enumerate(table["rows"][:10]):  # 최대 10개 행
+                        for row_idx, row in enumerate((table.get("matched_rows") or table["rows"])[:10]):  # 최대 10개 행
                             row_emails = []
                             for col_idx, cell in enumerate(row):
                                 if cell is not None:
@@ -1750,7 +5652,7 @@ class IntegratedDecryptionAndForensicsLogger:
                                 
                                 # 전체 행 데이터 표시 (이메일 부분 강조)
                                 row_display = []
-                                for col_idx, cell in enumerate(table["rows"][row_idx]):
+                                for col_idx, cell in enumerate((table.get("matched_rows") or table["rows"])[row_idx]):
                                     if cell is not None:
                                         cell_str = str(cell)
                                         # 이메일이 포함된 컬럼인지 확인
@@ -1786,7 +5688,7 @@ class IntegratedDecryptionAndForensicsLogger:
                     html_content += f'''
                                     <div style="background: #d1fae5; padding: 12px; border-radius: 6px; margin-bottom: 10px;">
                                         <strong style="color: #065f46;">테이블: {table["table"]}</strong>
-                                        <div style="color: #065f46; font-size: 0.9em; margin: 5px 0;">행 수: {table["row_count"]:,}개</div>
+                                        <div style="color: #065f46; font-size: 0.9em; margin: 5px 0;">행 수: {self._row_count_text(table)}개</div>
                                         <div style="color: #065f46; font-size: 0.9em; margin: 5px 0;">컬럼: {", ".join(table.get("columns", [])[:6])}{"..." if len(table.get("columns", [])) > 6 else ""}</div>'''
                     
                     # 데이터 샘플 표시
@@ -1827,6 +5729,39 @@ class IntegratedDecryptionAndForensicsLogger:
                 html_content += '''
                                 </div>'''
             
+            # 삭제 행 복구 상세 표시
+            if item["recovered_data"]:
+                html_content += '''
+                                <div style="margin-bottom: 20px;">
+                                    <h4 style="color: #dc2626; margin-bottom: 10px;">🗑️ 삭제 행 복구 상세</h4>'''
+                
+                for table in item["recovered_data"][:3]:  # 최대 3개 테이블
+                    recovery = table["recovery"]
+                    sources = ", ".join(f"{RECOVERY_SOURCES[source]} {count:,}" for source, count in recovery["sources"].items())
+                    # 카빙된 값과 테이블/컬럼 이름은 증거 DB에서 온 그대로이므로 HTML로 해석되지 않게 이스케이프
+                    columns_text = html.escape(", ".join(str(column) for column in table.get("columns", [])[:5]))
+                    html_content += f'''
+                                    <div style="background: #fee2e2; padding: 12px; border-radius: 6px; margin-bottom: 10px;">
+                                        <strong style="color: #991b1b;">테이블: {html.escape(str(table["table"]))}</strong>
+                                        <div style="color: #991b1b; font-size: 0.9em; margin: 5px 0;">복구 행: {recovery["recovered"]:,}개 ({sources}) | 수정 전 값: {recovery["previous_versions"]:,}개</div>
+                                        <div style="color: #991b1b; font-size: 0.9em; margin: 5px 0;">컬럼: {columns_text}{"..." if len(table.get("columns", [])) > 5 else ""}</div>'''
+                    
+                    for record in table["recovered_rows"][:5]:  # 최대 5개 행
+                        row_text = " | ".join(str(cell) if cell is not None else "NULL" for cell in record["values"])
+                        rowid_text = f"rowid {record['rowid']}" if record["rowid"] is not None else "rowid 미상"
+                        # 자른 뒤에 이스케이프 (엔티티 중간에서 잘리지 않도록)
+                        html_content += f'''
+                                        <div style="background: white; padding: 8px; margin: 5px 0; border-radius: 4px; font-family: monospace; font-size: 0.85em; color: #374151;">
+                                            <strong>[{RECOVERY_STATUSES[record["status"]]}] {rowid_text}, 페이지 {record["page"]} ({RECOVERY_SOURCES[record["source"]]}):</strong><br>
+                                            {html.escape(row_text[:300])}{"..." if len(row_text) > 300 else ""}
+                                        </div>'''
+                    
+                    html_content += '''
+                                    </div>'''
+                
+                html_content += '''
+                                </div>'''
+            
             # 모든 테이블 요약 정보
             html_content += '''
                                 <div style="margin-top: 20px; background: #f8fafc; padding: 15px; border-radius: 8px; border: 1px solid #e2e8f0;">
@@ -1842,7 +5777,7 @@ class IntegratedDecryptionAndForensicsLogger:
                 
                 for table in item["important_tables"][:5]:  # 최대 5개
                     html_content += f'''
-                                                • {table["table"]} ({table["row_count"]:,}행)'''
+                                                • {table["table"]} ({self._row_count_text(table)}행)'''
                 
                 if len(item["important_tables"]) > 5:
                     html_content += f'''
@@ -1861,7 +5796,7 @@ class IntegratedDecryptionAndForensicsLogger:
                 
                 for table in item["other_tables"][:5]:  # 최대 5개
                     html_content += f'''
-                                                • {table["table"]} ({table["row_count"]:,}행)'''
+                                                • {table["table"]} ({self._row_count_text(table)}행)'''
                 
                 if len(item["other_tables"]) > 5:
                     html_content += f'''
@@ -2042,15 +5977,23 @@ class IntegratedDecryptionAndForensicsLogger:
         self.temp_dir = tempfile.mkdtemp(prefix="integrated_forensics_")
         self.log_and_print(f"임시 작업 디렉토리: {self.temp_dir}")
         
-        # 마운트 포인트 설정
+        # 마운트 포인트 설정 (이미지 리더 사용 시 파티션 루트 기준 경로 /data/... 를 그대로 사용)
         home = os.path.expanduser("~")
-        mount_point = os.path.join(home, "mnt_integrated")
+        self.open_image_filesystem(decrypted_file)
+        if self.image_fs:
+            mount_point = "/"
+        else:
+            mount_point = os.path.join(home, "mnt_integrated")
         
         try:
-            # 이미지 파일 마운트
-            self.log_and_print("🔍 이미지 파일 마운트 시작...")
-            self.mount_img(decrypted_file, mount_point)
-            self.log_and_print("✅ 이미지 파일 마운트 완료")
+            if self.image_fs:
+                self.log_and_print("✅ 이미지 직접 읽기 모드 - 마운트 생략")
+            else:
+                self.start_privileged_helper()
+                # 이미지 파일 마운트
+                self.log_and_print("🔍 이미지 파일 마운트 시작...")
+                self.mount_img(decrypted_file, mount_point)
+                self.log_and_print("✅ 이미지 파일 마운트 완료")
             
             # 데이터베이스 파일 검색
             self.log_and_print("\n🔍 데이터베이스 파일 검색 시작...")
@@ -2075,27 +6018,20 @@ class IntegratedDecryptionAndForensicsLogger:
             successful_analyses = 0
             failed_analyses = 0
             
-            for i, db in enumerate(db_files, 1):
-                rel_path = os.path.relpath(db, os.path.join(mount_point, "data"))
-                app_name = rel_path.split('/')[0]
-                
-                self.log_and_print(f"\n[{i}/{len(db_files)}] 🔍 분석 중: {rel_path}")
-                
-                try:
-                    db_result = self.analyze_sqlite_db(db, app_name=app_name)
-                    if db_result and any(table.get('table') not in ['DB_ERROR', 'COPY_ERROR'] for table in db_result):
-                        db_summaries[db] = db_result
-                        successful_analyses += 1
-                        self.log_and_print(f"      ✅ 분석 완료: {len(db_result)}개 테이블")
-                    else:
-                        failed_analyses += 1
-                        self.log_and_print(f"      ⚠️  분석 실패 또는 빈 결과")
-                        
-                except Exception as db_error:
+            for db, db_result, db_error in self.iter_database_analyses(db_files, mount_point):
+                if db_error is not None:
                     failed_analyses += 1
                     self.log_and_print(f"      ❌ 분석 중 오류: {db_error}")
                     # 오류가 있어도 계속 진행
                     continue
+                
+                if db_result and any(table.get('table') not in ['DB_ERROR', 'COPY_ERROR'] for table in db_result):
+                    db_summaries[db] = db_result
+                    successful_analyses += 1
+                    self.log_and_print(f"      ✅ 분석 완료: {len(db_result)}개 테이블")
+                else:
+                    failed_analyses += 1
+                    self.log_and_print(f"      ⚠️  분석 실패 또는 빈 결과")
             
             forensic_end = datetime.now(timezone.utc)
             forensic_duration = (forensic_end - forensic_start).total_seconds()
@@ -2127,8 +6063,15 @@ class IntegratedDecryptionAndForensicsLogger:
                 'end_time': forensic_end.isoformat(),
                 'duration_seconds': forensic_duration,
                 'analyzed_databases': len(db_files),
+                'analysis_workers': self.analysis_workers,
+                'row_count_mode': 'exact' if self.exact_row_counts else 'estimated',
+                'deep_scan': self.deep_scan._asdict() if self.deep_scan else None,
+                'row_sampling': self.row_sampling,
+                'recover_deleted': self.recover_deleted,
                 'successful_analyses': successful_analyses,
                 'failed_analyses': failed_analyses,
+                'wal_snapshots': {os.path.relpath(db, os.path.join(mount_point, "data")): record
+                                  for db, record in self.wal_snapshots.items()},
                 'output_report': output_html
             }
             
@@ -2155,9 +6098,14 @@ class IntegratedDecryptionAndForensicsLogger:
             return False
         finally:
             # 정리 작업
-            self.umount_img(mount_point)
-            if os.path.exists(mount_point):
-                shutil.rmtree(mount_point, ignore_errors=True)
+            if self.image_fs:
+                self.image_fs.close()
+                self.image_fs = None
+            else:
+                self.umount_img(mount_point)
+                self.stop_privileged_helper()
+                if os.path.exists(mount_point):
+                    shutil.rmtree(mount_point, ignore_errors=True)
             
             if self.temp_dir and os.path.exists(self.temp_dir):
                 shutil.rmtree(self.temp_dir, ignore_errors=True)
@@ -2247,10 +6195,142 @@ class IntegratedDecryptionAndForensicsLogger:
         else:
             self.log_and_print("\n❌ 복호화 단계에서 실패했습니다.")
 
+class AnalysisWorkerLogger(IntegratedDecryptionAndForensicsLogger):
+    """DB 분석 작업 프로세스용 로거 - 로그를 바로 쓰지 않고 모아 두었다가 결과와 함께 주 프로세스로 돌려줌"""
+    
+    def __init__(self, config):
+        super().__init__(artifact_store=None, privileged_helper=config['privileged_helper'],
+                         app_classifier=config['app_classifier'], sqlite_profile=config['sqlite_profile'],
+                         exact_row_counts=config['exact_row_counts'], deep_scan=config['deep_scan'],
+                         row_sampling=config['row_sampling'], recover_deleted=config['recover_deleted'])
+        self.log_records = []
+        self.database_index = config['database_index']
+        # 작업자 전용 임시 디렉토리 (주 프로세스 임시 디렉토리 아래라 분석 후 함께 정리됨)
+        self.temp_dir = tempfile.mkdtemp(prefix=f"worker_{os.getpid()}_", dir=config['temp_dir'])
+        # 이미지 리더와 특권 헬퍼는 프로세스 간에 공유할 수 없으므로 작업자마다 새로 엶
+        if config['image_path']:
+            self.open_image_filesystem(config['image_path'])
+        elif config['start_helper']:
+            self.start_privileged_helper()
+    
+    def log_and_print(self, message, file_only=False, timestamp=None):
+        self.log_records.append((timestamp or datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC'), message, file_only))
+    
+    def analyze(self, db_path, app_name):
+        """DB 하나 분석 → 결과, 오류, 모아 둔 로그, WAL 스냅샷 기록"""
+        self.wal_snapshots = {}
+        try:
+            summary, error = self.analyze_sqlite_db(db_path, app_name=app_name), None
+        except Exception as e:
+            summary, error = None, str(e)
+        logs, self.log_records = self.log_records, []
+        return {"summary": summary, "error": error, "logs": logs, "wal_snapshot": self.wal_snapshots.get(db_path)}
+
+
+_analysis_worker = None  # 작업 프로세스마다 하나씩 만드는 AnalysisWorkerLogger
+
+
+def _init_analysis_worker(config):
+    global _analysis_worker
+    _analysis_worker = AnalysisWorkerLogger(config)
+
+
+def _analyze_database_task(task):
+    return _analysis_worker.analyze(*task)
+
+
+def parse_arguments(argv=None):
+    """명령행 인자 파싱"""
+    parser = argparse.ArgumentParser(description="통합 Android FBE 복호화 및 WearOS 포렌식 분석")
+    parser.add_argument('--hash-mode', choices=['linear', 'segmented'], default='linear',
+                        help="해시 모드: linear (SHA-256/SHA-1/MD5 전체 해시) 또는 segmented (병렬 Merkle 해시)")
+    parser.add_argument('--segment-size-mb', type=int, default=HASH_SEGMENT_SIZE // (1024 * 1024),
+                        help="segmented 모드의 세그먼트 크기 (MB)")
+    parser.add_argument('--hash-workers', type=int, default=None,
+                        help="segmented 모드의 작업자 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument('--stall-timeout', type=int, default=DECRYPTION_STALL_TIMEOUT,
+                        help="복호화 진행이 없을 때 중단까지 대기 시간 (초, 0이면 무제한)")
+    parser.add_argument('--hash-guest-image', action='store_true',
+                        help="qcow2 원본의 게스트 디스크 내용 해시도 계산 (raw 변환본 해시와 동일)")
+    parser.add_argument('--decrypt-workers', type=int, default=1,
+                        help="복호화 작업자 프로세스 수 (2 이상이면 블록 구간을 나눠 병렬 처리)")
+    parser.add_argument('--shard-size-mb', type=int, default=DECRYPT_SHARD_SIZE // (1024 * 1024),
+                        help="병렬 복호화 시 작업 구간 크기 (MB)")
+    parser.add_argument('--shard-retries', type=int, default=DECRYPT_SHARD_RETRIES,
+                        help="병렬 복호화 시 실패한 구간 재시도 횟수")
+    parser.add_argument('--resume', dest='resumable', action='store_true', default=False,
+                        help="복호화 체크포인트 사용 (기본: 꺼짐) - 구간 단위로 복호화하며 완료 구간마다 디스크에 동기화해 "
+                             "중단 후 이어서 복호화 가능")
+    parser.add_argument('--no-resume', dest='resumable', action='store_false',
+                        help="복호화 체크포인트를 사용하지 않음 (기본값, --resume 취소용)")
+    parser.add_argument('--artifact-store', default=ARTIFACT_STORE_DIR,
+                        help="복호화 결과 저장소 디렉토리 (같은 입력이면 복호화를 건너뜀)")
+    parser.add_argument('--no-artifact-cache', dest='artifact_store', action='store_const', const=None,
+                        help="복호화 결과 저장소를 사용하지 않음")
+    parser.add_argument('--verify-artifact', action='store_true',
+                        help="저장된 복호화 결과를 재사용하기 전에 이미지 전체를 다시 해시해 검증 (기본: 파일 식별 정보만 비교)")
+    parser.add_argument('--selective', action='store_true',
+                        help="우선순위 앱의 databases/, shared_prefs/ 만 복호화 (빠른 초동 분석용, 나머지 파일 내용 제외)")
+    parser.add_argument('--discovery-workers', type=int, default=DB_DISCOVERY_WORKERS,
+                        help="DB 검색 스레드 수")
+    parser.add_argument('--app-rules', default=None,
+                        help="앱 카테고리/중요 테이블 규칙 JSON 파일 (기본: 내장 규칙)")
+    parser.add_argument('--analysis-workers', type=int, default=DB_ANALYSIS_WORKERS,
+                        help="DB 분석 프로세스 수 (2 이상이면 병렬 분석, 결과는 우선순위 순서로 합침)")
+    parser.add_argument('--exact-row-counts', action='store_true',
+                        help="모든 테이블 행 수를 COUNT(*)로 정확히 계산 (법정 제출용 보고서, 기본은 저비용 추정)")
+    parser.add_argument('--deep-scan', action='store_true',
+                        help="첫 몇 행이 아니라 테이블 전체 행을 스트리밍으로 탐지 (메모리 일정)")
+    parser.add_argument('--deep-scan-budget-mb', type=int, default=DEEP_SCAN_BYTE_BUDGET // (1024 * 1024),
+                        help="전체 스캔 시 테이블당 최대 스캔 크기 (MB)")
+    parser.add_argument('--deep-scan-budget-seconds', type=float, default=DEEP_SCAN_TIME_BUDGET,
+                        help="전체 스캔 시 테이블당 최대 스캔 시간 (초)")
+    parser.add_argument('--row-sampling', choices=ROW_SAMPLING_STRATEGIES, default='head',
+                        help="보고서 샘플 행 선택: head(처음), tail(최근), random(rowid 구간별 무작위), reservoir(전체 균등 표본)")
+    parser.add_argument('--recover-deleted', action='store_true',
+                        help="프리리스트/프리블록/미할당 영역에서 삭제된 행을 카빙해 보고서에 포함 (secure_delete로 지워진 DB는 복구 불가)")
+    parser.add_argument('--sqlite-profile', choices=['auto'] + list(SQLITE_TUNING_PROFILES), default='auto',
+                        help="분석용 SQLite 연결 튜닝 프로필 (auto: DB 크기로 선택)")
+    parser.add_argument('--no-privileged-helper', dest='privileged_helper', action='store_false',
+                        help="특권 헬퍼를 쓰지 않고 작업마다 sudo 실행 (마운트 방식 분석 시)")
+    return parser.parse_args(argv)
+
+
 def main():
     """통합 Android FBE 복호화 및 WearOS 포렌식 분석 메인 함수"""
     print("DEBUG: 메인 함수 시작")
-    logger = IntegratedDecryptionAndForensicsLogger()
+    args = parse_arguments()
+    app_classifier = None
+    if args.app_rules:
+        try:
+            app_classifier = AppClassifier.from_rules_file(args.app_rules)
+        except (OSError, ValueError) as e:
+            print(f"❌ 앱 분류 규칙 파일을 읽을 수 없습니다: {args.app_rules} - {e}")
+            sys.exit(2)
+    logger = IntegratedDecryptionAndForensicsLogger(
+        hash_mode=args.hash_mode,
+        segment_size=args.segment_size_mb * 1024 * 1024,
+        hash_workers=args.hash_workers,
+        stall_timeout=args.stall_timeout,
+        decrypt_workers=args.decrypt_workers,
+        shard_size=args.shard_size_mb * 1024 * 1024,
+        shard_retries=args.shard_retries,
+        resumable=args.resumable,
+        artifact_store=args.artifact_store,
+        verify_artifact=args.verify_artifact,
+        hash_guest_image=args.hash_guest_image,
+        selective=args.selective,
+        privileged_helper=args.privileged_helper,
+        discovery_workers=args.discovery_workers,
+        app_classifier=app_classifier,
+        sqlite_profile=args.sqlite_profile,
+        analysis_workers=args.analysis_workers,
+        exact_row_counts=args.exact_row_counts,
+        deep_scan=DeepScanBudget(args.deep_scan_budget_mb * 1024 * 1024, args.deep_scan_budget_seconds,
+                                 DEEP_SCAN_SAMPLE_ROWS) if args.deep_scan else None,
+        row_sampling=args.row_sampling,
+        recover_deleted=args.recover_deleted
+    )
     
     try:
         logger.log_and_print("통합 Android FBE 복호화 및 WearOS 포렌식 분석")
@@ -2297,74 +6377,78 @@ def main():
         print("DEBUG: 5단계 - 포렌식 분석")
         logger.log_and_print("\n4. WearOS 포렌식 분석 실행 중...")
         
-        # Linux 환경 체크 (sudo 명령 필요)
-        if platform.system() != 'Linux':
-            logger.log_and_print("⚠️  포렌식 분석은 Linux 환경에서만 지원됩니다.")
-            logger.log_and_print("현재 OS: " + platform.system())
-            logger.log_and_print("복호화는 완료되었으니 Linux 환경에서 별도로 포렌식 분석을 수행하세요.")
-            logger.finalize_log(success=True, forensic_success=False)
-            return
+        # 이미지를 직접 읽을 수 있으면 마운트/sudo 불필요
+        if logger.open_image_filesystem(decrypted_file):
+            logger.log_and_print("✅ 이미지 직접 읽기 가능 - 마운트 및 sudo 권한 확인을 건너뜁니다.")
+        else:
+            # Linux 환경 체크 (sudo 명령 필요)
+            if platform.system() != 'Linux':
+                logger.log_and_print("⚠️  포렌식 분석은 Linux 환경에서만 지원됩니다.")
+                logger.log_and_print("현재 OS: " + platform.system())
+                logger.log_and_print("복호화는 완료되었으니 Linux 환경에서 별도로 포렌식 분석을 수행하세요.")
+                logger.finalize_log(success=True, forensic_success=False)
+                return
         
-        logger.log_and_print("✅ Linux 환경 확인 완료")
+            logger.log_and_print("✅ Linux 환경 확인 완료")
         
-        # sudo 권한 확인 및 요청
-        logger.log_and_print("🔐 sudo 권한 확인 중...")
+            # sudo 권한 확인 및 요청
+            logger.log_and_print("🔐 sudo 권한 확인 중...")
         
-        # 먼저 sudo 명령 사용 가능 여부 확인
-        try:
-            # sudo 명령 존재 여부 확인
-            subprocess.run(['which', 'sudo'], capture_output=True, check=True, timeout=5)
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
-            logger.log_and_print("❌ sudo 명령을 찾을 수 없습니다.")
-            logger.log_and_print("포렌식 분석을 건너뜁니다.")
-            logger.finalize_log(success=True, forensic_success=False)
-            return
+            # 먼저 sudo 명령 사용 가능 여부 확인
+            try:
+                # sudo 명령 존재 여부 확인
+                subprocess.run(['which', 'sudo'], capture_output=True, check=True, timeout=5)
+            except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
+                logger.log_and_print("❌ sudo 명령을 찾을 수 없습니다.")
+                logger.log_and_print("포렌식 분석을 건너뜁니다.")
+                logger.finalize_log(success=True, forensic_success=False)
+                return
         
-        # sudo 권한 확인 (비밀번호 없이 사용 가능한지)
-        try:
-            result = subprocess.run(['sudo', '-n', 'true'], capture_output=True, timeout=5)
-            if result.returncode == 0:
-                logger.log_and_print("✅ sudo 권한이 확인되었습니다. 포렌식 분석을 진행합니다.")
-            else:
-                # sudo 권한이 필요한 경우 사용자에게 안내
-                logger.log_and_print("🔐 sudo 권한이 필요합니다.")
-                logger.log_and_print("포렌식 분석을 계속하려면 sudo 비밀번호를 입력하세요.")
+            # sudo 권한 확인 (비밀번호 없이 사용 가능한지)
+            try:
+                result = subprocess.run(['sudo', '-n', 'true'], capture_output=True, timeout=5)
+                if result.returncode == 0:
+                    logger.log_and_print("✅ sudo 권한이 확인되었습니다. 포렌식 분석을 진행합니다.")
+                else:
+                    # sudo 권한이 필요한 경우 사용자에게 안내
+                    logger.log_and_print("🔐 sudo 권한이 필요합니다.")
+                    logger.log_and_print("포렌식 분석을 계속하려면 sudo 비밀번호를 입력하세요.")
                 
-                # 사용자에게 계속할지 묻기
-                try:
-                    response = input("\n포렌식 분석을 계속하시겠습니까? (y/N): ").strip().lower()
-                    if response in ['y', 'yes', '예']:
-                        logger.log_and_print("✅ 포렌식 분석을 계속합니다...")
-                        # sudo 권한 테스트
-                        test_result = subprocess.run(['sudo', 'echo', 'sudo 권한 테스트 성공'], 
-                                                  capture_output=True, text=True, timeout=10)
-                        if test_result.returncode == 0:
-                            logger.log_and_print("✅ sudo 권한이 정상적으로 작동합니다.")
+                    # 사용자에게 계속할지 묻기
+                    try:
+                        response = input("\n포렌식 분석을 계속하시겠습니까? (y/N): ").strip().lower()
+                        if response in ['y', 'yes', '예']:
+                            logger.log_and_print("✅ 포렌식 분석을 계속합니다...")
+                            # sudo 권한 테스트
+                            test_result = subprocess.run(['sudo', 'echo', 'sudo 권한 테스트 성공'], 
+                                                      capture_output=True, text=True, timeout=10)
+                            if test_result.returncode == 0:
+                                logger.log_and_print("✅ sudo 권한이 정상적으로 작동합니다.")
+                            else:
+                                logger.log_and_print("❌ sudo 권한 테스트에 실패했습니다.")
+                                logger.log_and_print("복호화는 완료되었으니 sudo 권한으로 별도 분석을 수행하세요.")
+                                logger.finalize_log(success=True, forensic_success=False)
+                                return
                         else:
-                            logger.log_and_print("❌ sudo 권한 테스트에 실패했습니다.")
+                            logger.log_and_print("⚠️  포렌식 분석을 건너뜁니다.")
                             logger.log_and_print("복호화는 완료되었으니 sudo 권한으로 별도 분석을 수행하세요.")
                             logger.finalize_log(success=True, forensic_success=False)
                             return
-                    else:
-                        logger.log_and_print("⚠️  포렌식 분석을 건너뜁니다.")
-                        logger.log_and_print("복호화는 완료되었으니 sudo 권한으로 별도 분석을 수행하세요.")
+                    except (EOFError, KeyboardInterrupt):
+                        logger.log_and_print("\n⚠️  사용자 입력이 중단되었습니다. 포렌식 분석을 건너뜁니다.")
                         logger.finalize_log(success=True, forensic_success=False)
                         return
-                except (EOFError, KeyboardInterrupt):
-                    logger.log_and_print("\n⚠️  사용자 입력이 중단되었습니다. 포렌식 분석을 건너뜁니다.")
-                    logger.finalize_log(success=True, forensic_success=False)
-                    return
                     
-        except subprocess.TimeoutExpired:
-            logger.log_and_print("⚠️  sudo 권한 확인이 타임아웃되었습니다.")
-            logger.log_and_print("복호화는 완료되었으니 sudo 권한으로 별도 분석을 수행하세요.")
-            logger.finalize_log(success=True, forensic_success=False)
-            return
-        except Exception as e:
-            logger.log_and_print(f"⚠️  sudo 권한 확인 중 오류 발생: {e}")
-            logger.log_and_print("복호화는 완료되었으니 sudo 권한으로 별도 분석을 수행하세요.")
-            logger.finalize_log(success=True, forensic_success=False)
-            return
+            except subprocess.TimeoutExpired:
+                logger.log_and_print("⚠️  sudo 권한 확인이 타임아웃되었습니다.")
+                logger.log_and_print("복호화는 완료되었으니 sudo 권한으로 별도 분석을 수행하세요.")
+                logger.finalize_log(success=True, forensic_success=False)
+                return
+            except Exception as e:
+                logger.log_and_print(f"⚠️  sudo 권한 확인 중 오류 발생: {e}")
+                logger.log_and_print("복호화는 완료되었으니 sudo 권한으로 별도 분석을 수행하세요.")
+                logger.finalize_log(success=True, forensic_success=False)
+                return
         
         forensic_success = logger.run_forensic_analysis(decrypted_file)
         print("DEBUG: 5단계 완료")
@@ -2399,4 +6483,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if PRIVILEGED_HELPER_FLAG in sys.argv[1:]:
+        run_privileged_helper()
+    else:
+        main()